@@ -0,0 +1,296 @@
+"""
+Graph Aggregation for Code Archaeologist
+Collapses a repository graph into coarser levels of detail: classes, files and directories
+"""
+import posixpath
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import KuzuDB, EDGE_TYPES, FILE_PATH_COLUMNS, REL_TABLES
+from graph_index import grid_position, repository_path
+
+# Levels of detail, coarsest first; "function" is the stored graph itself
+LEVELS = ("dir", "file", "class", "function")
+AGGREGATE_LEVELS = LEVELS[:-1]
+
+# Node table whose nodes become aggregates of their own at the class level;
+# every other node collapses into its class or file
+AGGREGATE_LABELS = {"file": "File", "class": "Class", "function": "Function"}
+
+
+def aggregate_id(level: str, key: str) -> str:
+    """Id of the aggregate of a level for a node id (file and class levels) or directory key"""
+    return f"{level}:{key}"
+
+
+def finer_level(level: str) -> str:
+    """The level an aggregate of this level expands into"""
+    return LEVELS[LEVELS.index(level) + 1]
+
+
+def level_of(node_id: str) -> Optional[str]:
+    """Level of an aggregate id, or None if it is not one"""
+    level = node_id.partition(":")[0]
+    return level if level in AGGREGATE_LEVELS else None
+
+
+def class_owners(nodes: Dict[str, str], edges: Iterable[Tuple[str, str, str]],
+                 file_of_path: Optional[Dict[str, str]] = None,
+                 paths: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Node id each node collapses into at the class level.
+
+    Files and classes are their own owners. A function belongs to the class
+    that DEFINES it, otherwise to the file that contains it (by
+    CONTAINS_FUNCTION, then by file path); functions with neither stay alone.
+
+    Args:
+        nodes: Node table per node id
+        edges: (relation, source id, target id) per relationship
+        file_of_path: File node id per file path
+        paths: File path per node id
+
+    Returns:
+        Owner node id per node id
+    """
+    defined_by, contained_by = {}, {}
+    for relation, source, target in edges:
+        if relation == "DEFINES" and source in nodes:
+            defined_by[target] = source
+        elif relation == "CONTAINS_FUNCTION" and source in nodes:
+            contained_by[target] = source
+
+    file_of_path, paths = file_of_path or {}, paths or {}
+    owners = {}
+    for node_id, label in nodes.items():
+        if label != "Function":
+            owners[node_id] = node_id
+        else:
+            owners[node_id] = (defined_by.get(node_id) or contained_by.get(node_id)
+                               or file_of_path.get(paths.get(node_id, "")) or node_id)
+    return owners
+
+
+def compute_aggregates(repo_id: str, nodes: Iterable[Dict], edges: Iterable[Tuple[str, str, str]],
+                       positions: Optional[Dict[str, Tuple[float, float]]] = None
+                       ) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Collapse a repository graph into the dir, file and class levels.
+
+    At the class level methods collapse into their class and the remaining
+    functions into their file; at the file level everything collapses into
+    its file, and at the dir level into the directory of its file. Every
+    aggregate records how many stored nodes it stands for and sits at the
+    mean position of those nodes. Relationships between two different
+    aggregates of a level become one aggregated edge per type, carrying the
+    number of relationships it stands for.
+
+    Args:
+        repo_id: Repository id
+        nodes: Node dicts as from KuzuDB.iter_nodes, in display order
+        edges: (relation, source id, target id) per relationship
+        positions: Stored layout position per node id (nodes without one are placed on the grid)
+
+    Returns:
+        Aggregate dicts and aggregated edge dicts, with the columns of
+        KuzuDB.save_aggregates
+    """
+    positions = positions or {}
+    labels, names, paths, points = {}, {}, {}, {}
+    for index, node in enumerate(nodes):
+        node_id, label = node["id"], node["_label"]
+        labels[node_id] = label
+        paths[node_id] = repository_path(node[FILE_PATH_COLUMNS[label]] or "", repo_id)
+        names[node_id] = node.get("name") or posixpath.basename(paths[node_id]) or node_id
+        points[node_id] = positions.get(node_id) or grid_position(index)
+    edges = [edge for edge in edges if edge[1] in labels and edge[2] in labels]
+
+    file_of_path = {paths[node_id]: node_id for node_id, label in labels.items() if label == "File"}
+    owners = class_owners(labels, edges, file_of_path, paths)
+
+    # Aggregate of every node at each level
+    chains: Dict[str, Dict[str, str]] = {}
+    aggregates: Dict[str, Dict] = {}
+    for node_id in labels:
+        owner = owners[node_id]
+        path = paths[owner]
+        file_key = file_of_path.get(path, owner)
+        directory = posixpath.dirname(path) or "."
+        chain = {
+            "dir": aggregate_id("dir", f"{repo_id}:{directory}"),
+            "file": aggregate_id("file", file_key),
+            "class": aggregate_id("class", owner),
+        }
+        chains[node_id] = chain
+
+        described = {
+            "dir": ("directory", directory, directory, ""),
+            "file": ("file", posixpath.basename(path) or file_key, path, chain["dir"]),
+            "class": (labels[owner].lower(), names[owner], path, chain["file"]),
+        }
+        for level in AGGREGATE_LEVELS:
+            kind, name, aggregate_path, parent = described[level]
+            aggregate = aggregates.setdefault(chain[level], {
+                "id": chain[level], "level": level, "kind": kind, "name": name, "path": aggregate_path,
+                "parent": parent, "size": 0, "x": 0.0, "y": 0.0,
+            })
+            aggregate["size"] += 1
+            aggregate["x"] += points[node_id][0]
+            aggregate["y"] += points[node_id][1]
+
+    for aggregate in aggregates.values():
+        aggregate["x"] /= aggregate["size"]
+        aggregate["y"] /= aggregate["size"]
+
+    counts: Dict[Tuple[str, str, str, str], int] = {}
+    for relation, source, target in edges:
+        for level in AGGREGATE_LEVELS:
+            key = (level, EDGE_TYPES[relation], chains[source][level], chains[target][level])
+            if key[2] != key[3]:
+                counts[key] = counts.get(key, 0) + 1
+
+    aggregated_edges = [
+        {"id": f"{edge_type}:{source}->{target}", "level": level, "type": edge_type,
+         "source": source, "target": target, "relationships": count}
+        for (level, edge_type, source, target), count in sorted(counts.items())
+    ]
+    return sorted(aggregates.values(), key=lambda aggregate: aggregate["id"]), aggregated_edges
+
+
+def aggregate_repository(db: KuzuDB, repo_id: str) -> Optional[int]:
+    """
+    Compute and store the level-of-detail views of a repository.
+
+    Args:
+        db: Database holding the repository's subgraph and layout
+        repo_id: Repository id
+
+    Returns:
+        Number of stored aggregates, or None if aggregation failed
+    """
+    try:
+        nodes = db.iter_nodes(repo_id=repo_id)
+        edges = [(edge["relation"], edge["source"], edge["target"]) for edge in db.iter_edges(repo_id=repo_id)]
+        aggregates, aggregated_edges = compute_aggregates(repo_id, nodes, edges, db.get_positions(repo_id))
+        if not db.save_aggregates(repo_id, aggregates, aggregated_edges):
+            return None
+        print(f"✓ Aggregated repository {repo_id} into {len(aggregates)} nodes")
+        return len(aggregates)
+    except Exception as e:
+        print(f"⚠️  Aggregation of repository {repo_id} failed: {e}")
+        return None
+
+
+def expand_aggregate(db: KuzuDB, node_id: str) -> Optional[Tuple[str, List[Dict], List[Dict]]]:
+    """
+    Expand one aggregate into the nodes it collapses at the next finer level.
+
+    The returned edges connect the children to each other and to the
+    aggregates around them: an edge to a node outside the expanded
+    aggregate is redirected to that node's aggregate at the expanded
+    level, and parallel edges are merged, adding up their counts.
+
+    Args:
+        db: Database holding the stored views
+        node_id: Aggregate id
+
+    Returns:
+        The children's level, the children (aggregate dicts, or node dicts
+        as from KuzuDB.get_nodes_by_id at the function level) and edge
+        dicts with type, source, target, relationships and, between stored
+        nodes, relation; None if the aggregate does not exist
+    """
+    found = db.get_aggregates(ids=[node_id])
+    if not found:
+        return None
+    aggregate = found[0]
+    level = finer_level(aggregate["level"])
+
+    if level != "function":
+        children = db.get_aggregates(level=level, parent=node_id)
+        inside = {child["id"] for child in children}
+        edges = db.get_aggregate_edges(level=level, ids=list(inside))
+        outside = {edge[end] for edge in edges for end in ("source", "target") if edge[end] not in inside}
+        lifted = {other["id"]: other["parent"] for other in db.get_aggregates(ids=list(outside))}
+        return level, children, merge_edges(
+            (edge["type"], lifted.get(edge["source"], edge["source"]), lifted.get(edge["target"], edge["target"]),
+             edge["relationships"], None)
+            for edge in edges
+        )
+
+    # Class-level aggregates are named after the node that owns them
+    owner = node_id.partition(":")[2]
+    owner_label = AGGREGATE_LABELS[aggregate["kind"]]
+    members = {owner: owner_label}
+    outgoing = db.get_edges_from(owner_label, [owner])
+    if owner_label == "Class":
+        members.update((edge["target"], "Function") for edge in outgoing if edge["relation"] == "DEFINES")
+    elif owner_label == "File":
+        contained = [edge["target"] for edge in outgoing if edge["relation"] == "CONTAINS_FUNCTION"]
+        defined = {edge["target"] for edge in db.get_edges_to("Function", contained) if edge["relation"] == "DEFINES"}
+        members.update((function, "Function") for function in contained if function not in defined)
+
+    by_label: Dict[str, List[str]] = {}
+    for member, label in members.items():
+        by_label.setdefault(label, []).append(member)
+    # Every relationship once, keeping parallel ones (one CALLS per call site) so
+    # they are counted like compute_aggregates counts them; edges between two
+    # members come back from both queries and are only taken from the first
+    children, edges = [], []
+    for label, ids in by_label.items():
+        children.extend(db.get_nodes_by_id(label, ids))
+        edges.extend((edge["relation"], edge["source"], edge["target"]) for edge in db.get_edges_from(label, ids))
+        edges.extend((edge["relation"], edge["source"], edge["target"]) for edge in db.get_edges_to(label, ids)
+                     if edge["source"] not in members)
+
+    # Lift the far end of edges leaving the aggregate to its class-level aggregate
+    outside: Dict[str, str] = {}
+    for relation, source, target in edges:
+        for end, label in zip((source, target), REL_TABLES[relation]):
+            if end not in members:
+                outside[end] = label
+    outside_functions = [end for end, label in outside.items() if label == "Function"]
+    owner_edges, paths, file_of_path = [], {}, {}
+    if outside_functions:
+        owner_edges = [(edge["relation"], edge["source"], edge["target"])
+                       for edge in db.get_edges_to("Function", outside_functions)]
+        # Same fallback as compute_aggregates: a function without DEFINES or
+        # CONTAINS_FUNCTION belongs to the file at its path
+        paths = {node["id"]: node["file_path"] for node in db.get_nodes_by_id("Function", outside_functions)}
+        files = db.get_nodes_by_id("File", [f"file:{path}" for path in set(paths.values())])
+        file_of_path = {node["path"]: node["id"] for node in files}
+    # class_owners only follows edges from known nodes, so add the owners themselves
+    known = dict(outside)
+    known.update((source, REL_TABLES[relation][0]) for relation, source, _ in owner_edges if source not in known)
+    owners = class_owners(known, owner_edges, file_of_path, paths)
+
+    def end_id(end: str) -> str:
+        return end if end in members else aggregate_id("class", owners[end])
+
+    return level, children, merge_edges(
+        (EDGE_TYPES[relation], end_id(source), end_id(target), 1,
+         relation if source in members and target in members else None)
+        for relation, source, target in edges
+    )
+
+
+def merge_edges(edges: Iterable[Tuple[str, str, str, int, Optional[str]]]) -> List[Dict]:
+    """
+    Merge parallel edges, adding up their relationship counts.
+
+    Args:
+        edges: (type, source, target, relationships, relation or None) per edge
+
+    Returns:
+        Edge dicts sorted by type, source and target; self-loops are dropped
+    """
+    merged: Dict[Tuple[str, str, str, Optional[str]], int] = {}
+    for edge_type, source, target, count, relation in edges:
+        if source != target:
+            key = (edge_type, source, target, relation)
+            merged[key] = merged.get(key, 0) + count
+    return [
+        {"type": edge_type, "source": source, "target": target, "relationships": count, "relation": relation}
+        for (edge_type, source, target, relation), count in sorted(
+            merged.items(), key=lambda item: (*item[0][:3], item[0][3] or "")
+        )
+    ]
@@ -0,0 +1,104 @@
+"""
+Parsing throughput benchmark for Code Archaeologist
+Times IngestionService.parse_repository on a synthetic repository
+
+Usage (from the backend directory):
+    python benchmarks/parse_benchmark.py --files 2000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import KuzuDB
+from parser import TreeSitterParser
+from ingestion import IngestionService
+
+
+PYTHON_TEMPLATE = '''
+class Service{i}:
+    """Service number {i}"""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def fetch(self, key):
+        return normalize_{i}(self.client.get(key))
+    
+    def store(self, key, value):
+        self.client.set(key, normalize_{i}(value))
+
+
+def normalize_{i}(value):
+    """Normalize a value"""
+    return str(value).strip()
+
+
+def main_{i}():
+    service = Service{i}(None)
+    return normalize_{i}(service)
+'''
+
+JS_TEMPLATE = '''
+class Widget{i} {{
+    render() {{
+        return format{i}(this.props);
+    }}
+}}
+
+function format{i}(props) {{
+    // Format the props
+    return JSON.stringify(props);
+}}
+'''
+
+
+def build_repository(root: Path, file_count: int):
+    """Write a synthetic repository with a mix of Python and JavaScript files"""
+    for i in range(file_count):
+        package = root / f"pkg_{i % 20}"
+        package.mkdir(exist_ok=True)
+        if i % 3 == 0:
+            (package / f"widget_{i}.js").write_text(JS_TEMPLATE.format(i=i))
+        else:
+            (package / f"service_{i}.py").write_text(PYTHON_TEMPLATE.format(i=i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark repository parsing")
+    parser.add_argument("--files", type=int, default=1000, help="Number of synthetic files")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Worker counts to compare")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Files per worker task")
+    args = parser.parse_args()
+    
+    temp_dir = Path(tempfile.mkdtemp(prefix="parse_bench_"))
+    try:
+        repo = temp_dir / "repo"
+        repo.mkdir()
+        build_repository(repo, args.files)
+        
+        db = KuzuDB(str(temp_dir / "db"))
+        service = IngestionService(db, TreeSitterParser(), str(temp_dir / "repos"),
+                                   parse_chunk_size=args.chunk_size)
+        
+        print(f"Parsing {args.files} files on {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            files, classes, functions, edges, errors = service.parse_repository(repo, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"  workers={workers:<3} {elapsed:7.2f}s  {len(files) / elapsed:8.0f} files/s  "
+                  f"speedup {baseline / elapsed:4.2f}x  ({len(functions)} functions, {len(edges)} edges)")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
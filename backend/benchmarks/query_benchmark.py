@@ -0,0 +1,59 @@
+"""
+Tree-sitter extraction micro-benchmark for Code Archaeologist
+Times the single-pass extract_all walk per file, excluding parsing itself
+
+Usage (from the backend directory):
+    python benchmarks/query_benchmark.py --files 500
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parser import TreeSitterParser
+from benchmarks.parse_benchmark import PYTHON_TEMPLATE, JS_TEMPLATE
+
+
+def parse_trees(parser: TreeSitterParser, sources):
+    """Parse sources up front so only extraction is timed"""
+    return [
+        (file_path, parser.detect_language(file_path),
+         (parser.python_parser if file_path.suffix == '.py' else parser.js_parser).parse(source_code))
+        for file_path, source_code in sources
+    ]
+
+
+def time_single_pass(parser: TreeSitterParser, sources) -> float:
+    """Run the single-pass extract_all walk over all sources, returning seconds"""
+    trees = parse_trees(parser, sources)
+    start = time.perf_counter()
+    for file_path, language, tree in trees:
+        parser.extract_all(tree, file_path, language)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entity and edge extraction")
+    parser.add_argument("--files", type=int, default=500, help="Number of synthetic files")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs (best is reported)")
+    args = parser.parse_args()
+
+    sources = []
+    for i in range(args.files):
+        if i % 3 == 0:
+            sources.append((Path(f"pkg/widget_{i}.js"), JS_TEMPLATE.format(i=i).encode()))
+        else:
+            sources.append((Path(f"pkg/service_{i}.py"), PYTHON_TEMPLATE.format(i=i).encode()))
+
+    ts_parser = TreeSitterParser()
+    time_single_pass(ts_parser, sources[:10])  # warm up
+
+    print(f"Extracting {args.files} files")
+    elapsed = min(time_single_pass(ts_parser, sources) for _ in range(args.repeat))
+    print(f"  {'single-pass walk':<20} {elapsed:7.3f}s  {elapsed / args.files * 1e6:8.1f} us/file")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,17 @@
 KùzuDB Database Wrapper
 Handles graph database operations for Code Archaeologist
 """
+import csv
+import functools
+import importlib.util
+import os
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
 import kuzu
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Mapping, Tuple
 from pydantic import BaseModel
 
 
@@ -13,6 +21,7 @@ class FileNode(BaseModel):
     id: str
     path: str
     language: str
+    repo_id: str = ""
 
 
 class ClassNode(BaseModel):
@@ -21,6 +30,7 @@ class ClassNode(BaseModel):
     start_line: int
     end_line: int
     file_path: str
+    repo_id: str = ""
 
 
 class FunctionNode(BaseModel):
@@ -31,6 +41,7 @@ class FunctionNode(BaseModel):
     start_line: int
     end_line: int
     file_path: str
+    repo_id: str = ""
 
 
 class Edge(BaseModel):
@@ -40,25 +51,260 @@ class Edge(BaseModel):
     edge_type: str  # CONTAINS, DEFINES, CALLS
 
 
+# Column order of each node table, used when staging rows for COPY FROM
+NODE_TABLE_COLUMNS = {
+    "File": ["id", "path", "language", "repo_id"],
+    "Class": ["id", "name", "start_line", "end_line", "file_path", "repo_id"],
+    "Function": ["id", "name", "args", "docstring", "start_line", "end_line", "file_path", "repo_id"],
+}
+
+# Node table columns stored as INT64
+INT_COLUMNS = {"start_line", "end_line"}
+
+# Column holding the source file path of each node table
+FILE_PATH_COLUMNS = {"File": "path", "Class": "file_path", "Function": "file_path"}
+
+# Relationship tables keyed by Edge.edge_type, with their (FROM, TO) node tables
+REL_TABLES = {
+    "CONTAINS_CLASS": ("File", "Class"),
+    "CONTAINS_FUNCTION": ("File", "Function"),
+    "DEFINES": ("Class", "Function"),
+    "CALLS": ("Function", "Function"),
+}
+
+# Columns of the precomputed level-of-detail views (see aggregate.py), with their types
+AGGREGATE_COLUMNS = {
+    "id": "STRING", "repo_id": "STRING", "level": "STRING", "kind": "STRING", "name": "STRING",
+    "path": "STRING", "parent": "STRING", "size": "INT64", "x": "DOUBLE", "y": "DOUBLE",
+}
+AGGREGATE_EDGE_COLUMNS = {
+    "id": "STRING", "repo_id": "STRING", "level": "STRING", "type": "STRING",
+    "source": "STRING", "target": "STRING", "relationships": "INT64",
+}
+
+# Edge type reported to the frontend for each relationship table
+EDGE_TYPES = {
+    "CONTAINS_CLASS": "CONTAINS",
+    "CONTAINS_FUNCTION": "CONTAINS",
+    "DEFINES": "DEFINES",
+    "CALLS": "CALLS",
+}
+
+
+# Rows per record batch when exporting query results to Arrow
+ARROW_CHUNK_SIZE = 10000
+
+# Multipliers of the size suffixes accepted in KUZU_BUFFER_POOL_SIZE
+SIZE_UNITS = {"KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+
+
+class KuzuConfig(BaseModel):
+    """Settings of the kuzu.Database and its connections"""
+    buffer_pool_size: int = 0  # bytes; 0 lets Kùzu take 80% of system memory
+    max_num_threads: int = 0  # threads per query; 0 uses every core
+    read_only: bool = False  # open without write access (the schema must already exist)
+    pool_size: int = 4  # connections for concurrent read-only queries
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "KuzuConfig":
+        """
+        Build a configuration from environment variables.
+        
+        Reads KUZU_BUFFER_POOL_SIZE (bytes, or with a KB/MB/GB/TB suffix),
+        KUZU_MAX_THREADS, KUZU_READ_ONLY and KUZU_POOL_SIZE; unset variables
+        keep their defaults.
+        
+        Args:
+            environ: Variables to read (defaults to os.environ)
+            
+        Returns:
+            KuzuConfig
+            
+        Raises:
+            ValueError: If a variable cannot be parsed
+        """
+        environ = os.environ if environ is None else environ
+        settings = {}
+        if environ.get("KUZU_BUFFER_POOL_SIZE"):
+            settings["buffer_pool_size"] = parse_size(environ["KUZU_BUFFER_POOL_SIZE"])
+        if environ.get("KUZU_MAX_THREADS"):
+            settings["max_num_threads"] = int(environ["KUZU_MAX_THREADS"])
+        if environ.get("KUZU_READ_ONLY"):
+            settings["read_only"] = environ["KUZU_READ_ONLY"].strip().lower() in ("1", "true", "yes", "on")
+        if environ.get("KUZU_POOL_SIZE"):
+            settings["pool_size"] = int(environ["KUZU_POOL_SIZE"])
+        return cls(**settings)
+    
+    def effective(self) -> Dict[str, Any]:
+        """Settings with Kùzu's defaults for 0 values resolved, as reported by /health"""
+        buffer_pool_size = self.buffer_pool_size
+        if not buffer_pool_size:
+            try:
+                buffer_pool_size = int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.8)
+            except (ValueError, OSError, AttributeError):
+                buffer_pool_size = None
+        return {
+            "buffer_pool_size": buffer_pool_size,
+            "max_num_threads": self.max_num_threads or os.cpu_count(),
+            "read_only": self.read_only,
+            "pool_size": self.pool_size,
+        }
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a byte count such as "536870912", "512MB" or "4GB".
+    
+    Raises:
+        ValueError: If the value is not a size
+    """
+    text = value.strip().upper().replace(" ", "")
+    for suffix, multiplier in SIZE_UNITS.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * multiplier)
+    return int(text.rstrip("B"))
+
+
+@functools.lru_cache(maxsize=None)
+def arrow_available() -> bool:
+    """Whether pyarrow is installed, enabling the Arrow fast path of the columnar APIs"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _writes(method):
+    """Run a KuzuDB method on the write connection while holding the write lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._bump_generation()
+    return wrapper
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections to one kuzu.Database.
+    
+    Connections are created lazily up to `size` and handed to one thread at
+    a time, so queries on different connections run in parallel. When all
+    connections are checked out, callers wait for one to be returned.
+    """
+    
+    def __init__(self, database: kuzu.Database, size: int = 4, timeout: Optional[float] = None,
+                 num_threads: int = 0):
+        """
+        Initialize the pool.
+        
+        Args:
+            database: Database the connections are opened on
+            size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection (None waits indefinitely)
+            num_threads: Threads each connection may use per query (0 for Kùzu's default)
+        """
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1")
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.num_threads = num_threads
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the block.
+        
+        Raises:
+            TimeoutError: If no connection became free within the timeout
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+    
+    def _acquire(self) -> kuzu.Connection:
+        """Take an idle connection, open a new one, or wait for one to be returned"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            open_new = self._opened < self.size
+            if open_new:
+                self._opened += 1
+        if open_new:
+            try:
+                return kuzu.Connection(self.database, num_threads=self.num_threads)
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection became free within {self.timeout}s")
+
+
 class KuzuDB:
-    """Wrapper class for KùzuDB operations"""
+    """
+    Wrapper class for KùzuDB operations.
+    
+    Writes go through a single write connection and are serialized by a
+    lock, since Kùzu runs one write transaction at a time. Read-only queries
+    (execute_cypher, get_all_nodes, get_all_edges, ...) check out their own
+    connection from a pool and run in parallel with each other and with
+    writes; they see committed data only.
+    """
     
-    def __init__(self, db_path: str = "./data/code_graph"):
+    def __init__(self, db_path: str = "./data/code_graph", batch_size: int = 100,
+                 transaction_size: int = 20, config: Optional[KuzuConfig] = None):
         """
         Initialize KùzuDB connection and create schema if needed.
         
         Args:
             db_path: Path to the database directory
+            batch_size: Default number of rows per UNWIND statement in the *_batch methods
+            transaction_size: Number of batch statements grouped into one explicit transaction
+            config: Buffer pool, thread, read-only and pool settings (defaults to KuzuConfig())
         """
         # Create database directory if it doesn't exist
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
         # Initialize database
-        self.db = kuzu.Database(db_path)
-        self.conn = kuzu.Connection(self.db)
+        self.config = config or KuzuConfig()
+        self.db = kuzu.Database(
+            db_path,
+            buffer_pool_size=self.config.buffer_pool_size,
+            max_num_threads=self.config.max_num_threads,
+            read_only=self.config.read_only
+        )
+        self.conn = kuzu.Connection(self.db, num_threads=self.config.max_num_threads)
+        self.pool = ConnectionPool(self.db, self.config.pool_size, num_threads=self.config.max_num_threads)
+        self._write_lock = threading.RLock()
+        # Incremented after every write method, so readers can tell cached results are stale
+        self.generation = 0
+        # The same per repository, for writes attributed to one with repository_writes;
+        # unattributed writes may touch any repository and bump _unscoped_generation
+        self._repo_generations: Dict[str, int] = {}
+        self._unscoped_generation = 0
+        self._write_scope = threading.local()
         
-        # Initialize schema
-        self._init_schema()
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self._in_transaction = False
+        # Prepared UNWIND statements keyed by (table, rows per statement)
+        self._batch_statements: Dict[Tuple[str, int], Any] = {}
+        
+        # Initialize schema (a read-only database must already have one)
+        if not self.config.read_only:
+            self._init_schema()
     
     def _init_schema(self):
         """Create node and relationship tables if they don't exist"""
@@ -72,6 +318,7 @@ class KuzuDB:
                         id STRING,
                         path STRING,
                         language STRING,
+                        repo_id STRING,
                         PRIMARY KEY (id)
                     )
                 """)
@@ -87,6 +334,7 @@ class KuzuDB:
                         start_line INT64,
                         end_line INT64,
                         file_path STRING,
+                        repo_id STRING,
                         PRIMARY KEY (id)
                     )
                 """)
@@ -104,6 +352,7 @@ class KuzuDB:
                         start_line INT64,
                         end_line INT64,
                         file_path STRING,
+                        repo_id STRING,
                         PRIMARY KEY (id)
                     )
                 """)
@@ -140,12 +389,65 @@ class KuzuDB:
                     CREATE REL TABLE CALLS(FROM Function TO Function)
                 """)
             
+            # Create Repository node table (one per ingested repository; nodes
+            # reference it through their repo_id property)
+            try:
+                self.conn.execute("MATCH (r:Repository) RETURN r.id LIMIT 1")
+            except:
+                try:
+                    # Tables from before repositories had ids only cached last commits
+                    self.conn.execute("DROP TABLE Repository")
+                except:
+                    pass
+                self.conn.execute("""
+                    CREATE NODE TABLE Repository(
+                        id STRING,
+                        url STRING,
+                        name STRING,
+                        last_commit STRING,
+                        scope STRING,
+                        PRIMARY KEY (id)
+                    )
+                """)
+            
+            # Create Position node table (canvas coordinates of laid-out nodes, keyed
+            # by node id; written by layout.layout_repository)
+            try:
+                self.conn.execute("MATCH (p:Position) RETURN p.id LIMIT 1")
+            except:
+                self.conn.execute("""
+                    CREATE NODE TABLE Position(
+                        id STRING,
+                        repo_id STRING,
+                        x DOUBLE,
+                        y DOUBLE,
+                        PRIMARY KEY (id)
+                    )
+                """)
+            
+            # Create Aggregate and AggregateEdge node tables (level-of-detail views
+            # of each repository; written by aggregate.aggregate_repository)
+            for table, columns in (("Aggregate", AGGREGATE_COLUMNS), ("AggregateEdge", AGGREGATE_EDGE_COLUMNS)):
+                try:
+                    self.conn.execute(f"MATCH (a:{table}) RETURN a.id LIMIT 1")
+                except:
+                    definitions = ", ".join(f"{column} {kind}" for column, kind in columns.items())
+                    self.conn.execute(f"CREATE NODE TABLE {table}({definitions}, PRIMARY KEY (id))")
+            
+            # Add repo_id to node tables created before graphs were partitioned
+            for table in NODE_TABLE_COLUMNS:
+                try:
+                    self.conn.execute(f"MATCH (n:{table}) RETURN n.repo_id LIMIT 1")
+                except:
+                    self.conn.execute(f"ALTER TABLE {table} ADD repo_id STRING DEFAULT ''")
+            
             print("✓ Database schema initialized successfully")
             
         except Exception as e:
             print(f"Error initializing schema: {e}")
             raise
     
+    @_writes
     def insert_file(self, file_node: FileNode) -> bool:
         """
         Insert a File node into the database.
@@ -158,11 +460,12 @@ class KuzuDB:
         """
         try:
             self.conn.execute(
-                "CREATE (f:File {id: $id, path: $path, language: $language})",
+                "CREATE (f:File {id: $id, path: $path, language: $language, repo_id: $repo_id})",
                 {
                     "id": file_node.id,
                     "path": file_node.path,
-                    "language": file_node.language
+                    "language": file_node.language,
+                    "repo_id": file_node.repo_id
                 }
             )
             return True
@@ -170,6 +473,7 @@ class KuzuDB:
             print(f"Error inserting file node: {e}")
             return False
     
+    @_writes
     def insert_class(self, class_node: ClassNode) -> bool:
         """
         Insert a Class node into the database.
@@ -187,14 +491,16 @@ class KuzuDB:
                     name: $name,
                     start_line: $start_line,
                     end_line: $end_line,
-                    file_path: $file_path
+                    file_path: $file_path,
+                    repo_id: $repo_id
                 })""",
                 {
                     "id": class_node.id,
                     "name": class_node.name,
                     "start_line": class_node.start_line,
                     "end_line": class_node.end_line,
-                    "file_path": class_node.file_path
+                    "file_path": class_node.file_path,
+                    "repo_id": class_node.repo_id
                 }
             )
             return True
@@ -202,6 +508,7 @@ class KuzuDB:
             print(f"Error inserting class node: {e}")
             return False
     
+    @_writes
     def insert_function(self, function_node: FunctionNode) -> bool:
         """
         Insert a Function node into the database.
@@ -221,7 +528,8 @@ class KuzuDB:
                     docstring: $docstring,
                     start_line: $start_line,
                     end_line: $end_line,
-                    file_path: $file_path
+                    file_path: $file_path,
+                    repo_id: $repo_id
                 })""",
                 {
                     "id": function_node.id,
@@ -230,7 +538,8 @@ class KuzuDB:
                     "docstring": function_node.docstring or "",
                     "start_line": function_node.start_line,
                     "end_line": function_node.end_line,
-                    "file_path": function_node.file_path
+                    "file_path": function_node.file_path,
+                    "repo_id": function_node.repo_id
                 }
             )
             return True
@@ -238,6 +547,7 @@ class KuzuDB:
             print(f"Error inserting function node: {e}")
             return False
     
+    @_writes
     def insert_contains(self, source_id: str, target_id: str, target_type: str = "Function") -> bool:
         """
         Create a CONTAINS relationship between a File and a Class/Function.
@@ -268,6 +578,7 @@ class KuzuDB:
             print(f"Error creating CONTAINS relationship: {e}")
             return False
     
+    @_writes
     def insert_defines(self, source_id: str, target_id: str) -> bool:
         """
         Create a DEFINES relationship between a Class and a Function.
@@ -290,6 +601,7 @@ class KuzuDB:
             print(f"Error creating DEFINES relationship: {e}")
             return False
     
+    @_writes
     def insert_calls(self, source_id: str, target_id: str) -> bool:
         """
         Create a CALLS relationship between two Functions.
@@ -312,9 +624,931 @@ class KuzuDB:
             print(f"Error creating CALLS relationship: {e}")
             return False
     
+    def insert_edge(self, edge: Edge) -> bool:
+        """
+        Insert an Edge into the relationship table matching its edge_type.
+        
+        Args:
+            edge: Edge object with source, target, and edge_type
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if edge.edge_type == "CONTAINS_CLASS":
+            return self.insert_contains(edge.source, edge.target, "Class")
+        elif edge.edge_type == "CONTAINS_FUNCTION":
+            return self.insert_contains(edge.source, edge.target, "Function")
+        elif edge.edge_type == "DEFINES":
+            return self.insert_defines(edge.source, edge.target)
+        elif edge.edge_type == "CALLS":
+            return self.insert_calls(edge.source, edge.target)
+        return False
+    
+    def insert_files_batch(self, file_nodes: List[FileNode], batch_size: Optional[int] = None) -> List[int]:
+        """
+        Insert File nodes with one UNWIND statement per batch.
+        
+        Args:
+            file_nodes: FileNode objects to insert
+            batch_size: Rows per statement (defaults to self.batch_size)
+            
+        Returns:
+            Number of nodes created by each batch, after any row-by-row retries
+        """
+        return self._insert_nodes_batch("File", file_nodes, batch_size)
+    
+    def insert_classes_batch(self, class_nodes: List[ClassNode], batch_size: Optional[int] = None) -> List[int]:
+        """
+        Insert Class nodes with one UNWIND statement per batch.
+        
+        Args:
+            class_nodes: ClassNode objects to insert
+            batch_size: Rows per statement (defaults to self.batch_size)
+            
+        Returns:
+            Number of nodes created by each batch, after any row-by-row retries
+        """
+        return self._insert_nodes_batch("Class", class_nodes, batch_size)
+    
+    def insert_functions_batch(self, function_nodes: List[FunctionNode], batch_size: Optional[int] = None) -> List[int]:
+        """
+        Insert Function nodes with one UNWIND statement per batch.
+        
+        Args:
+            function_nodes: FunctionNode objects to insert
+            batch_size: Rows per statement (defaults to self.batch_size)
+            
+        Returns:
+            Number of nodes created by each batch, after any row-by-row retries
+        """
+        return self._insert_nodes_batch("Function", function_nodes, batch_size)
+    
+    def insert_edges_batch(self, edge_type: str, pairs: List[Tuple[str, str]],
+                           batch_size: Optional[int] = None) -> List[int]:
+        """
+        Create relationships of one type with one UNWIND statement per batch.
+        
+        Args:
+            edge_type: CONTAINS_CLASS, CONTAINS_FUNCTION, DEFINES or CALLS
+            pairs: (source_id, target_id) tuples
+            batch_size: Rows per statement (defaults to self.batch_size)
+            
+        Returns:
+            Number of relationships created by each batch. Pairs whose
+            endpoints do not exist are skipped and not counted.
+        """
+        if edge_type not in REL_TABLES:
+            raise ValueError(f"Unknown edge type: {edge_type}")
+        return self._run_batches(edge_type, list(self._chunks(pairs, batch_size)))
+    
+    def _insert_nodes_batch(self, table: str, nodes: List[BaseModel], batch_size: Optional[int] = None) -> List[int]:
+        """Insert nodes of one table with one UNWIND statement per batch"""
+        return self._run_batches(table, list(self._chunks(nodes, batch_size)))
+    
+    @_writes
+    def _run_batches(self, table: str, chunks: List[List[Any]]) -> List[int]:
+        """
+        Execute UNWIND batches, transaction_size statements per explicit transaction.
+        
+        When a transaction fails, each of its batches is replayed row by row so
+        a single bad row only loses itself. Inside an enclosing transaction()
+        the failure is re-raised instead, leaving the retry to the caller.
+        
+        Returns:
+            Number of rows created by each batch
+        """
+        counts = []
+        for group in self._chunks(chunks, self.transaction_size):
+            try:
+                with self.transaction():
+                    group_counts = [self._execute_batch(table, chunk) for chunk in group]
+                counts.extend(group_counts)
+            except Exception as e:
+                if self._in_transaction:
+                    raise
+                print(f"⚠️  {table} transaction failed, retrying row by row: {e}")
+                counts.extend(self._retry_rows(table, chunk) for chunk in group)
+        return counts
+    
+    def _retry_rows(self, table: str, chunk: List[Any]) -> int:
+        """Insert the rows of a failed batch one statement at a time"""
+        inserted = 0
+        for row in chunk:
+            try:
+                inserted += self._execute_batch(table, [row])
+            except Exception as e:
+                row_id = getattr(row, "id", row)
+                print(f"Error inserting {table} row {row_id}: {e}")
+        return inserted
+    
+    def _execute_batch(self, table: str, chunk: List[Any]) -> int:
+        """
+        Execute one UNWIND statement, reusing its prepared form for repeated batch sizes.
+        
+        Returns:
+            The number of rows created by the statement
+        """
+        key = (table, len(chunk))
+        statement = self._batch_statements.get(key)
+        if statement is None:
+            statement = self.conn.prepare(self._batch_query(table, len(chunk)))
+            # Only full batches repeat often enough to be worth keeping
+            if len(chunk) == self.batch_size:
+                self._batch_statements[key] = statement
+        result = self.conn.execute(statement, self._batch_params(table, chunk))
+        return result.get_next()[0] if result.has_next() else 0
+    
+    @staticmethod
+    def _batch_query(table: str, row_count: int) -> str:
+        """Build the UNWIND statement for a node or relationship table batch"""
+        if table in REL_TABLES:
+            src_table, dst_table = REL_TABLES[table]
+            items = ", ".join(f"{{s: $s{i}, t: $t{i}}}" for i in range(row_count))
+            return (
+                f"UNWIND [{items}] AS e "
+                f"MATCH (source:{src_table} {{id: e.s}}), (target:{dst_table} {{id: e.t}}) "
+                f"CREATE (source)-[:{table}]->(target) RETURN count(*)"
+            )
+        
+        columns = NODE_TABLE_COLUMNS[table]
+        items = []
+        for i in range(row_count):
+            fields = []
+            for j, column in enumerate(columns):
+                if column in INT_COLUMNS:
+                    # KùzuDB types parameters inside a list literal as STRING,
+                    # so integers are passed as text and cast back
+                    fields.append(f"{column}: to_int64($p{i}_{j})")
+                else:
+                    fields.append(f"{column}: $p{i}_{j}")
+            items.append("{" + ", ".join(fields) + "}")
+        assignments = ", ".join(f"{column}: row.{column}" for column in columns)
+        return (
+            f"UNWIND [{', '.join(items)}] AS row "
+            f"CREATE (n:{table} {{{assignments}}}) RETURN count(*)"
+        )
+    
+    @staticmethod
+    def _batch_params(table: str, chunk: List[Any]) -> Dict[str, Any]:
+        """Flatten a batch of rows into the parameters of _batch_query"""
+        params = {}
+        if table in REL_TABLES:
+            for i, (source_id, target_id) in enumerate(chunk):
+                params[f"s{i}"] = source_id
+                params[f"t{i}"] = target_id
+            return params
+        
+        for i, node in enumerate(chunk):
+            for j, column in enumerate(NODE_TABLE_COLUMNS[table]):
+                value = getattr(node, column)
+                if column in INT_COLUMNS:
+                    params[f"p{i}_{j}"] = str(value)
+                else:
+                    params[f"p{i}_{j}"] = "" if value is None else value
+        return params
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Run the enclosed statements in one explicit transaction.
+        
+        Commits on success and rolls back if the block raises. Nested uses
+        join the outermost transaction. Other threads' writes wait until it ends.
+        """
+        with self._write_lock:
+            if self._in_transaction:
+                yield
+                return
+            
+            self.conn.execute("BEGIN TRANSACTION")
+            self._in_transaction = True
+            try:
+                yield
+            except Exception:
+                # A failed statement already aborts the transaction in KùzuDB,
+                # in which case this ROLLBACK is a no-op
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+            finally:
+                self._in_transaction = False
+                # Writes inside the block only become visible to readers now
+                self._bump_generation()
+    
+    @contextmanager
+    def repository_writes(self, repo_id: str):
+        """
+        Attribute the writes of the calling thread to one repository.
+        
+        They then only change generation_of(repo_id) (and the whole graph's
+        generation), so caches of other repositories stay valid.
+        
+        Args:
+            repo_id: Repository id
+        """
+        previous = getattr(self._write_scope, "repo_id", None)
+        self._write_scope.repo_id = repo_id
+        try:
+            yield
+        finally:
+            self._write_scope.repo_id = previous
+    
+    def generation_of(self, repo_id: Optional[str] = None) -> int:
+        """
+        Write generation of one repository's data.
+        
+        Args:
+            repo_id: Repository id (None for the whole graph)
+            
+        Returns:
+            A counter that changes whenever data of the repository may have changed
+        """
+        if repo_id is None:
+            return self.generation
+        return self._unscoped_generation + self._repo_generations.get(repo_id, 0)
+    
+    def _bump_generation(self):
+        """Record a write in the whole graph's generation and in its repository's"""
+        self.generation += 1
+        repo_id = getattr(self._write_scope, "repo_id", None)
+        if repo_id is None:
+            self._unscoped_generation += 1
+        else:
+            self._repo_generations[repo_id] = self._repo_generations.get(repo_id, 0) + 1
+    
+    @_writes
+    def insert_subgraph(self, files: List[FileNode], classes: List[ClassNode],
+                        functions: List[FunctionNode], edges: List[Edge]) -> Tuple[int, int]:
+        """
+        Insert a self-contained set of nodes and edges in a single transaction.
+        
+        Used for groups of whole files, so a crash never leaves a file half
+        inserted. If the transaction fails it is rolled back and the rows are
+        re-inserted batch by batch, falling back to single rows. While a node
+        table an edge points into is still empty, nodes and edges are committed
+        as two transactions instead (see below).
+        
+        Args:
+            files: List of file nodes
+            classes: List of class nodes
+            functions: List of function nodes
+            edges: List of edges
+            
+        Returns:
+            Tuple of (nodes_inserted, edges_inserted)
+        """
+        def write_nodes() -> int:
+            nodes_inserted = sum(self.insert_files_batch(files))
+            nodes_inserted += sum(self.insert_classes_batch(classes))
+            nodes_inserted += sum(self.insert_functions_batch(functions))
+            return nodes_inserted
+        
+        def write_edges() -> int:
+            edges_inserted = 0
+            for edge_type in REL_TABLES:
+                pairs = [(edge.source, edge.target) for edge in edges if edge.edge_type == edge_type]
+                edges_inserted += sum(self.insert_edges_batch(edge_type, pairs))
+            return edges_inserted
+        
+        # Kùzu cannot create relationships inside the transaction that inserted the
+        # first nodes of a table, so the very first writes commit nodes before edges
+        edge_tables = {table for edge in edges for table in REL_TABLES.get(edge.edge_type, ())}
+        split = not self._in_transaction and any(self.count_rows(table) == 0 for table in edge_tables)
+        
+        committed_nodes = None
+        try:
+            if split:
+                with self.transaction():
+                    nodes_inserted = write_nodes()
+                committed_nodes = nodes_inserted
+                with self.transaction():
+                    return committed_nodes, write_edges()
+            with self.transaction():
+                return write_nodes(), write_edges()
+        except Exception as e:
+            print(f"⚠️  Subgraph transaction failed, retrying in smaller batches: {e}")
+            if committed_nodes is None:
+                committed_nodes = write_nodes()
+            return committed_nodes, write_edges()
+    
+    def _chunks(self, items: List[Any], batch_size: Optional[int] = None) -> Iterable[List[Any]]:
+        """Split items into consecutive batches"""
+        size = batch_size or self.batch_size
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+    
+    def count_rows(self, table: str) -> int:
+        """
+        Count the nodes in a node table or the relationships in a rel table.
+        
+        Args:
+            table: Node or relationship table name
+        
+        Returns:
+            Number of rows in the table
+        """
+        if table in REL_TABLES:
+            src, dst = REL_TABLES[table]
+            query = f"MATCH (:{src})-[r:{table}]->(:{dst}) RETURN count(r)"
+        else:
+            query = f"MATCH (n:{table}) RETURN count(n)"
+        # Runs on the write connection, so counts inside a transaction include
+        # its uncommitted rows; it writes nothing and leaves the generation alone
+        with self._write_lock:
+            result = self.conn.execute(query)
+            return result.get_next()[0] if result.has_next() else 0
+    
+    @_writes
+    def copy_from_rows(self, table: str, rows: Iterable[Iterable[Any]], staging_dir: Path) -> int:
+        """
+        Stage rows into a CSV file and load them with a single COPY FROM.
+        
+        KùzuDB only accepts COPY into a table that has never been copied into,
+        so callers must be ready to fall back to row inserts when this raises.
+        
+        Args:
+            table: Node or relationship table name
+            rows: Rows in table column order (FROM/TO ids for rel tables)
+            staging_dir: Directory for the temporary CSV file
+        
+        Returns:
+            Number of rows loaded
+        """
+        csv_path = Path(staging_dir) / f"{table}.csv"
+        row_count = 0
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL, escapechar='\\', doublequote=False)
+            for row in rows:
+                writer.writerow(row)
+                row_count += 1
+        
+        if row_count == 0:
+            return 0
+        
+        # Quoted values may contain newlines (docstrings), which the parallel
+        # CSV reader rejects
+        path_literal = str(csv_path.resolve()).replace("'", "\\'")
+        self.conn.execute(f"COPY {table} FROM '{path_literal}' (PARALLEL=FALSE)")
+        return row_count
+    
+    @_writes
+    def bulk_load(self, files: List[FileNode], classes: List[ClassNode],
+                  functions: List[FunctionNode], edges: List[Edge]) -> Tuple[int, int]:
+        """
+        Load parsed nodes and edges using COPY FROM wherever possible.
+        
+        Every table that is still empty is loaded with one COPY FROM a staged
+        CSV file. Tables that already hold data (or that reject COPY) fall
+        back to the batched UNWIND insert path, as do edges with an endpoint
+        outside this load.
+        
+        Args:
+            files: List of file nodes
+            classes: List of class nodes
+            functions: List of function nodes
+            edges: List of edges
+        
+        Returns:
+            Tuple of (nodes_inserted, edges_inserted)
+        """
+        nodes_inserted = 0
+        edges_inserted = 0
+        
+        node_lists = {"File": files, "Class": classes, "Function": functions}
+        known_ids = {table: set() for table in node_lists}
+        
+        with tempfile.TemporaryDirectory(prefix="kuzu_copy_") as staging_dir:
+            for table, nodes in node_lists.items():
+                # COPY aborts on duplicate primary keys, so keep the first occurrence
+                unique_nodes = []
+                for node in nodes:
+                    if node.id not in known_ids[table]:
+                        known_ids[table].add(node.id)
+                        unique_nodes.append(node)
+                
+                copied = self._try_copy(
+                    table,
+                    ([self._csv_value(getattr(node, column)) for column in NODE_TABLE_COLUMNS[table]]
+                     for node in unique_nodes),
+                    staging_dir,
+                    len(unique_nodes)
+                )
+                if copied is not None:
+                    nodes_inserted += copied
+                    continue
+                
+                nodes_inserted += sum(self._insert_nodes_batch(table, nodes))
+            
+            # COPY turns empty strings into NULL; the row path stores ""
+            if functions:
+                self.conn.execute("MATCH (f:Function) WHERE f.args IS NULL SET f.args = ''")
+                self.conn.execute("MATCH (f:Function) WHERE f.docstring IS NULL SET f.docstring = ''")
+            for table, nodes in node_lists.items():
+                if nodes:
+                    self.conn.execute(f"MATCH (n:{table}) WHERE n.repo_id IS NULL SET n.repo_id = ''")
+            
+            for edge_type, (src_table, dst_table) in REL_TABLES.items():
+                typed_edges = [edge for edge in edges if edge.edge_type == edge_type]
+                
+                # A rel COPY fails outright on a dangling endpoint, so only edges
+                # between nodes of this load are copied; the rest (e.g. calls into
+                # nodes stored by an earlier ingest) take the row path, which
+                # matches stored endpoints and skips missing ones
+                loadable, matched = [], []
+                for edge in typed_edges:
+                    if edge.source in known_ids[src_table] and edge.target in known_ids[dst_table]:
+                        loadable.append(edge)
+                    else:
+                        matched.append(edge)
+                copied = self._try_copy(
+                    edge_type,
+                    ([edge.source, edge.target] for edge in loadable),
+                    staging_dir,
+                    len(loadable)
+                )
+                if copied is None:
+                    matched = typed_edges
+                else:
+                    edges_inserted += copied
+                
+                if matched:
+                    edges_inserted += sum(self.insert_edges_batch(
+                        edge_type, [(edge.source, edge.target) for edge in matched]
+                    ))
+        
+        return nodes_inserted, edges_inserted
+    
+    def _try_copy(self, table: str, rows: Iterable[Iterable[Any]],
+                  staging_dir: str, row_count: int) -> Optional[int]:
+        """Copy rows into an empty table; return None when the row path must be used instead"""
+        if row_count == 0:
+            return 0
+        try:
+            if self.count_rows(table) > 0:
+                return None
+            return self.copy_from_rows(table, rows, Path(staging_dir))
+        except Exception as e:
+            print(f"⚠️  COPY into {table} failed, falling back to row inserts: {e}")
+            return None
+    
+    @staticmethod
+    def _csv_value(value: Any) -> Any:
+        """Normalize a model attribute for CSV staging"""
+        return "" if value is None else value
+    
+    def get_repository(self, repo_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the ingestion record of a repository.
+        
+        Args:
+            repo_id: Repository id (see repo_cache.repository_id)
+            
+        Returns:
+            Dict with id, url, name, last_commit and scope, or None if never ingested
+        """
+        try:
+            with self.pool.connection() as conn:
+                result = conn.execute(
+                    "MATCH (r:Repository {id: $id}) RETURN r.id, r.url, r.name, r.last_commit, r.scope",
+                    {"id": repo_id}
+                )
+                if not result.has_next():
+                    return None
+                return self._repository_dict(result.get_next())
+        except Exception as e:
+            print(f"Error retrieving repository {repo_id}: {e}")
+            return None
+    
+    def list_repositories(self) -> List[Dict[str, Any]]:
+        """
+        List ingested repositories with the size of their subgraphs.
+        
+        Returns:
+            List of repository dicts (see get_repository) with file, class and function counts
+        """
+        try:
+            with self.pool.connection() as conn:
+                result = conn.execute(
+                    "MATCH (r:Repository) RETURN r.id, r.url, r.name, r.last_commit, r.scope ORDER BY r.name, r.id"
+                )
+                repositories = []
+                while result.has_next():
+                    repositories.append(self._repository_dict(result.get_next()))
+            
+                for repository in repositories:
+                    for table, key in (("File", "files"), ("Class", "classes"), ("Function", "functions")):
+                        counts = conn.execute(
+                            f"MATCH (n:{table}) WHERE n.repo_id = $id RETURN count(n)", {"id": repository["id"]}
+                        )
+                        repository[key] = counts.get_next()[0] if counts.has_next() else 0
+                return repositories
+        except Exception as e:
+            print(f"Error listing repositories: {e}")
+            return []
+    
+    @staticmethod
+    def _repository_dict(row: List[Any]) -> Dict[str, Any]:
+        """Convert a (id, url, name, last_commit, scope) row to a dict"""
+        return {"id": row[0], "url": row[1], "name": row[2], "last_commit": row[3], "scope": row[4] or ""}
+    
+    @_writes
+    def upsert_repository(self, repo_id: str, url: str, name: str, last_commit: str, scope: str = "") -> bool:
+        """
+        Record the commit a repository was last ingested at.
+        
+        Args:
+            repo_id: Repository id (see repo_cache.repository_id)
+            url: Repository URL
+            name: Repository name
+            last_commit: Commit SHA the graph now reflects
+            scope: Which files were ingested ("" for the whole repository)
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self.conn.execute(
+                "MERGE (r:Repository {id: $id}) "
+                "SET r.url = $url, r.name = $name, r.last_commit = $last_commit, r.scope = $scope",
+                {"id": repo_id, "url": url, "name": name, "last_commit": last_commit, "scope": scope}
+            )
+            return True
+        except Exception as e:
+            print(f"Error recording repository {url}: {e}")
+            return False
+    
+    @_writes
+    def save_positions(self, repo_id: str, positions: Mapping[str, Tuple[float, float]]) -> bool:
+        """
+        Replace the stored canvas positions of a repository's nodes.
+        
+        Positions of nodes missing from `positions` are dropped, so a new
+        layout also cleans up after deleted files.
+        
+        Args:
+            repo_id: Repository id
+            positions: (x, y) per node id
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self.transaction():
+                self.conn.execute("MATCH (p:Position) WHERE p.repo_id = $repo_id DELETE p", {"repo_id": repo_id})
+                for chunk in self._chunks(list(positions.items())):
+                    params = {"repo_id": repo_id}
+                    items = []
+                    for i, (node_id, (x, y)) in enumerate(chunk):
+                        # Parameters inside a list literal are typed as STRING, see _batch_query
+                        params.update({f"i{i}": node_id, f"x{i}": repr(float(x)), f"y{i}": repr(float(y))})
+                        items.append(f"{{i: $i{i}, x: $x{i}, y: $y{i}}}")
+                    self.conn.execute(
+                        f"UNWIND [{', '.join(items)}] AS p "
+                        f"CREATE (:Position {{id: p.i, repo_id: $repo_id, x: to_double(p.x), y: to_double(p.y)}})",
+                        params
+                    )
+            return True
+        except Exception as e:
+            if self._in_transaction:
+                raise
+            print(f"Error saving positions of repository {repo_id}: {e}")
+            return False
+    
+    def get_positions(self, repo_id: Optional[str] = None,
+                      ids: Optional[List[str]] = None) -> Dict[str, Tuple[float, float]]:
+        """
+        Load stored canvas positions.
+        
+        Args:
+            repo_id: Only load this repository's positions
+            ids: Only load the positions of these nodes
+            
+        Returns:
+            (x, y) per node id
+        """
+        where, params = self._repo_filter(repo_id, "p")
+        positions = {}
+        with self.pool.connection() as conn:
+            for chunk in ([None] if ids is None else self._chunks(list(dict.fromkeys(ids)))):
+                chunk_where, chunk_params = where, dict(params)
+                if chunk is not None:
+                    chunk_params.update({f"p{i}": node_id for i, node_id in enumerate(chunk)})
+                    in_ids = "[" + ", ".join(f"$p{i}" for i in range(len(chunk))) + "]"
+                    chunk_where += f" {'AND' if where else 'WHERE'} p.id IN {in_ids}"
+                result = conn.execute(f"MATCH (p:Position){chunk_where} RETURN p.id, p.x, p.y", chunk_params)
+                while result.has_next():
+                    node_id, x, y = result.get_next()
+                    positions[node_id] = (x, y)
+        return positions
+    
+    @_writes
+    def save_aggregates(self, repo_id: str, aggregates: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the stored level-of-detail views of a repository.
+        
+        Args:
+            repo_id: Repository id
+            aggregates: Aggregate node dicts with the AGGREGATE_COLUMNS keys except repo_id
+            edges: Aggregated edge dicts with the AGGREGATE_EDGE_COLUMNS keys except repo_id
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self.transaction():
+                for table, columns, rows in (("Aggregate", AGGREGATE_COLUMNS, aggregates),
+                                             ("AggregateEdge", AGGREGATE_EDGE_COLUMNS, edges)):
+                    self.conn.execute(f"MATCH (a:{table}) WHERE a.repo_id = $repo_id DELETE a", {"repo_id": repo_id})
+                    for chunk in self._chunks(rows):
+                        params = {"repo_id": repo_id}
+                        items = []
+                        for i, row in enumerate(chunk):
+                            fields = []
+                            for column, kind in columns.items():
+                                if column == "repo_id":
+                                    continue
+                                # Parameters inside a list literal are typed as STRING, see _batch_query
+                                params[f"{column}{i}"] = str(row[column])
+                                if kind == "STRING":
+                                    fields.append(f"{column}: ${column}{i}")
+                                else:
+                                    fields.append(f"{column}: to_{kind.lower()}(${column}{i})")
+                            items.append("{" + ", ".join(fields) + "}")
+                        assignments = ", ".join(
+                            "repo_id: $repo_id" if column == "repo_id" else f"{column}: a.{column}"
+                            for column in columns
+                        )
+                        self.conn.execute(f"UNWIND [{', '.join(items)}] AS a CREATE (:{table} {{{assignments}}})",
+                                          params)
+            return True
+        except Exception as e:
+            if self._in_transaction:
+                raise
+            print(f"Error saving aggregates of repository {repo_id}: {e}")
+            return False
+    
+    def get_aggregates(self, repo_id: Optional[str] = None, level: Optional[str] = None,
+                       parent: Optional[str] = None, ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Load stored aggregate nodes.
+        
+        Args:
+            repo_id: Only load this repository's aggregates
+            level: Only load aggregates of this level
+            parent: Only load the aggregates collapsed into this one at the next coarser level
+            ids: Only load these aggregates
+            
+        Returns:
+            Aggregate dicts with the AGGREGATE_COLUMNS keys, sorted by id
+        """
+        conditions, params = [], {}
+        for column, value in (("repo_id", repo_id), ("level", level), ("parent", parent)):
+            if value is not None:
+                conditions.append(f"a.{column} = ${column}")
+                params[column] = value
+        
+        columns = list(AGGREGATE_COLUMNS)
+        aggregates = []
+        with self.pool.connection() as conn:
+            for chunk in ([None] if ids is None else self._chunks(list(dict.fromkeys(ids)))):
+                chunk_conditions, chunk_params = list(conditions), dict(params)
+                if chunk is not None:
+                    chunk_params.update({f"p{i}": aggregate_id for i, aggregate_id in enumerate(chunk)})
+                    chunk_conditions.append("a.id IN [" + ", ".join(f"$p{i}" for i in range(len(chunk))) + "]")
+                where = f" WHERE {' AND '.join(chunk_conditions)}" if chunk_conditions else ""
+                result = conn.execute(
+                    f"MATCH (a:Aggregate){where} RETURN {', '.join(f'a.{column}' for column in columns)} "
+                    f"ORDER BY a.id",
+                    chunk_params
+                )
+                while result.has_next():
+                    aggregates.append(dict(zip(columns, result.get_next())))
+        return aggregates
+    
+    def get_aggregate_edges(self, repo_id: Optional[str] = None, level: Optional[str] = None,
+                            ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Load stored aggregated edges.
+        
+        Args:
+            repo_id: Only load this repository's edges
+            level: Only load edges of this level
+            ids: Only load edges with one of these aggregates as source or target
+            
+        Returns:
+            Edge dicts with the AGGREGATE_EDGE_COLUMNS keys, sorted by id
+        """
+        conditions, params = [], {}
+        for column, value in (("repo_id", repo_id), ("level", level)):
+            if value is not None:
+                conditions.append(f"e.{column} = ${column}")
+                params[column] = value
+        
+        columns = list(AGGREGATE_EDGE_COLUMNS)
+        edges = {}
+        with self.pool.connection() as conn:
+            for chunk in ([None] if ids is None else self._chunks(list(dict.fromkeys(ids)))):
+                chunk_conditions, chunk_params = list(conditions), dict(params)
+                if chunk is not None:
+                    chunk_params.update({f"p{i}": aggregate_id for i, aggregate_id in enumerate(chunk)})
+                    in_ids = "[" + ", ".join(f"$p{i}" for i in range(len(chunk))) + "]"
+                    chunk_conditions.append(f"(e.source IN {in_ids} OR e.target IN {in_ids})")
+                where = f" WHERE {' AND '.join(chunk_conditions)}" if chunk_conditions else ""
+                result = conn.execute(
+                    f"MATCH (e:AggregateEdge){where} RETURN {', '.join(f'e.{column}' for column in columns)}",
+                    chunk_params
+                )
+                while result.has_next():
+                    edge = dict(zip(columns, result.get_next()))
+                    # An edge between two chunks is found once per chunk
+                    edges[edge["id"]] = edge
+        return [edges[edge_id] for edge_id in sorted(edges)]
+    
+    @_writes
+    def delete_repository_subgraph(self, repo_id: str) -> bool:
+        """
+        Delete every file, class and function of a repository with their edges.
+        
+        The Repository record itself is kept; use delete_repository to remove both.
+        Runs in the caller's transaction when there is one.
+        
+        Args:
+            repo_id: Repository id
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self.transaction():
+                for table in ("Class", "Function", "File"):
+                    self.conn.execute(f"MATCH (n:{table}) WHERE n.repo_id = $id DETACH DELETE n", {"id": repo_id})
+            return True
+        except Exception as e:
+            if self._in_transaction:
+                raise
+            print(f"Error deleting repository {repo_id}: {e}")
+            return False
+    
+    @_writes
+    def delete_repository(self, repo_id: str) -> bool:
+        """
+        Delete a repository's subgraph and its Repository record in one transaction.
+        
+        Args:
+            repo_id: Repository id
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with self.transaction():
+                self.delete_repository_subgraph(repo_id)
+                for table in ("Position", "Aggregate", "AggregateEdge"):
+                    self.conn.execute(f"MATCH (n:{table}) WHERE n.repo_id = $id DELETE n", {"id": repo_id})
+                self.conn.execute("MATCH (r:Repository {id: $id}) DELETE r", {"id": repo_id})
+            return True
+        except Exception as e:
+            print(f"Error deleting repository {repo_id}: {e}")
+            return False
+    
+    @_writes
+    def replace_repository_subgraph(self, repo_id: str, files: List[FileNode], classes: List[ClassNode],
+                                    functions: List[FunctionNode], edges: List[Edge]) -> Tuple[int, int]:
+        """
+        Atomically swap a repository's subgraph for a freshly parsed one.
+        
+        The old nodes are deleted and the new ones inserted in one transaction,
+        so readers see either the previous or the new graph, never a mix. If
+        the transaction fails it is rolled back and the old graph stays in place.
+        
+        Args:
+            repo_id: Repository id
+            files: List of file nodes
+            classes: List of class nodes
+            functions: List of function nodes
+            edges: List of edges
+        
+        Returns:
+            Tuple of (nodes_inserted, edges_inserted)
+        
+        Raises:
+            Exception: If the transaction failed and was rolled back
+        """
+        # See insert_subgraph: edges cannot go into a transaction that creates
+        # the first rows of their node tables, so those loads are not atomic
+        edge_tables = {table for edge in edges for table in REL_TABLES.get(edge.edge_type, ())}
+        if any(self.count_rows(table) == 0 for table in edge_tables):
+            self.delete_repository_subgraph(repo_id)
+            return self.insert_subgraph(files, classes, functions, edges)
+        
+        with self.transaction():
+            self.delete_repository_subgraph(repo_id)
+            nodes_inserted = sum(self.insert_files_batch(files))
+            nodes_inserted += sum(self.insert_classes_batch(classes))
+            nodes_inserted += sum(self.insert_functions_batch(functions))
+            edges_inserted = 0
+            for edge_type in REL_TABLES:
+                pairs = [(edge.source, edge.target) for edge in edges if edge.edge_type == edge_type]
+                edges_inserted += sum(self.insert_edges_batch(edge_type, pairs))
+        return nodes_inserted, edges_inserted
+    
+    def get_file_paths(self, prefix: str = "", repo_id: Optional[str] = None) -> List[str]:
+        """
+        List the paths of stored files.
+        
+        Args:
+            prefix: Only return paths starting with this prefix
+            repo_id: Only return files of this repository
+            
+        Returns:
+            List of file paths
+        """
+        try:
+            with self.pool.connection() as conn:
+                query = "MATCH (f:File) WHERE f.path STARTS WITH $prefix"
+                params = {"prefix": prefix}
+                if repo_id is not None:
+                    query += " AND f.repo_id = $repo_id"
+                    params["repo_id"] = repo_id
+                result = conn.execute(query + " RETURN f.path", params)
+                paths = []
+                while result.has_next():
+                    paths.append(result.get_next()[0])
+                return paths
+        except Exception as e:
+            print(f"Error listing files: {e}")
+            return []
+    
+    def delete_file_subgraph(self, path: str) -> Optional[Tuple[int, int]]:
+        """
+        Delete a file together with its classes, functions and all their edges.
+        
+        Args:
+            path: File path as stored on FileNode.path
+            
+        Returns:
+            Tuple of (nodes_removed, edges_removed), or None if the delete failed
+        """
+        return self.delete_files_subgraph([path])
+    
+    @_writes
+    def delete_files_subgraph(self, paths: Iterable[str]) -> Optional[Tuple[int, int]]:
+        """
+        Delete files together with their classes, functions and all their edges.
+        
+        All paths are removed in one transaction, so either every subgraph is
+        gone or, on failure, none is. Nodes are matched on their file path
+        column with one IN filter per batch_size paths rather than one scan
+        per file. Inside an enclosing transaction() a failure is re-raised.
+        
+        Args:
+            paths: File paths as stored on FileNode.path
+            
+        Returns:
+            Tuple of (nodes_removed, edges_removed), or None if the delete failed
+        """
+        paths = list(dict.fromkeys(paths))
+        nodes_removed = 0
+        edges_removed = 0
+        
+        try:
+            with self.transaction():
+                for chunk in self._chunks(paths):
+                    params = {f"p{i}": path for i, path in enumerate(chunk)}
+                    in_paths = "[" + ", ".join(f"${name}" for name in params) + "]"
+                    
+                    # Count edges before their endpoints go; each edge is counted
+                    # once even when both ends are deleted
+                    for rel_table, (from_table, to_table) in REL_TABLES.items():
+                        edges_removed += self._count(
+                            f"MATCH (a:{from_table})-[r:{rel_table}]->(b:{to_table}) "
+                            f"WHERE a.{FILE_PATH_COLUMNS[from_table]} IN {in_paths} "
+                            f"OR b.{FILE_PATH_COLUMNS[to_table]} IN {in_paths} RETURN count(r)",
+                            params
+                        )
+                    
+                    for table in ("Class", "Function", "File"):
+                        match = f"MATCH (n:{table}) WHERE n.{FILE_PATH_COLUMNS[table]} IN {in_paths}"
+                        nodes_removed += self._count(f"{match} RETURN count(n)", params)
+                        self.conn.execute(f"{match} DETACH DELETE n", params)
+            return nodes_removed, edges_removed
+        except Exception as e:
+            if self._in_transaction:
+                raise
+            print(f"Error deleting {len(paths)} file subgraphs: {e}")
+            return None
+    
+    def _count(self, query: str, params: Dict[str, Any]) -> int:
+        """Run a query returning a single count"""
+        result = self.conn.execute(query, params)
+        return result.get_next()[0] if result.has_next() else 0
+    
     def execute_cypher(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict]:
         """
-        Execute a Cypher query and return results.
+        Execute a read-only Cypher query and return results.
+        
+        Runs on a connection from the pool, in parallel with other queries.
         
         Args:
             query: Cypher query string
@@ -324,133 +1558,353 @@ class KuzuDB:
             List of result dictionaries
         """
         try:
-            if parameters:
-                result = self.conn.execute(query, parameters)
-            else:
-                result = self.conn.execute(query)
+            with self.pool.connection() as conn:
+                if parameters:
+                    result = conn.execute(query, parameters)
+                else:
+                    result = conn.execute(query)
             
-            # Convert result to list of dictionaries
-            results = []
-            while result.has_next():
-                row = result.get_next()
-                results.append(row)
+                # Convert result to list of dictionaries
+                results = []
+                while result.has_next():
+                    row = result.get_next()
+                    results.append(row)
             
-            return results
+                return results
         except Exception as e:
             print(f"Error executing Cypher query: {e}")
             raise
     
-    def get_all_nodes(self) -> List[Dict]:
+    def query_arrow(self, query: str, parameters: Optional[Dict[str, Any]] = None,
+                    chunk_size: int = ARROW_CHUNK_SIZE):
+        """
+        Execute a read-only Cypher query and return the result as a pyarrow.Table.
+        
+        Columns are exported by Kùzu in bulk, without building a Python object
+        per row.
+        
+        Args:
+            query: Cypher query string
+            parameters: Optional query parameters
+            chunk_size: Rows per record batch
+            
+        Returns:
+            pyarrow.Table with one column per RETURN item
+            
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        with self.pool.connection() as conn:
+            return conn.execute(query, parameters or {}).get_as_arrow(chunk_size)
+    
+    def query_df(self, query: str, parameters: Optional[Dict[str, Any]] = None):
+        """
+        Execute a read-only Cypher query and return the result as a pandas.DataFrame.
+        
+        Args:
+            query: Cypher query string
+            parameters: Optional query parameters
+            
+        Returns:
+            pandas.DataFrame with one column per RETURN item
+            
+        Raises:
+            ImportError: If pandas is not installed
+        """
+        with self.pool.connection() as conn:
+            return conn.execute(query, parameters or {}).get_as_df()
+    
+    def query_columns(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+        """
+        Execute a read-only Cypher query and return its result column by column.
+        
+        Uses the Arrow export when pyarrow is installed and reads rows otherwise.
+        
+        Args:
+            query: Cypher query string
+            parameters: Optional query parameters
+            
+        Returns:
+            Dict mapping each RETURN column name to its values
+        """
+        if arrow_available():
+            return self.query_arrow(query, parameters).to_pydict()
+        
+        with self.pool.connection() as conn:
+            result = conn.execute(query, parameters or {})
+            names = result.get_column_names()
+            columns = {name: [] for name in names}
+            while result.has_next():
+                for name, value in zip(names, result.get_next()):
+                    columns[name].append(value)
+            return columns
+    
+    def iter_nodes(self, labels: Optional[Iterable[str]] = None, batch_size: int = 1000,
+                   repo_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream nodes with their properties, fetching batch_size at a time.
+        
+        Each batch is a separate keyset query (id > last id, ordered by id)
+        on a pooled connection that is returned before the batch is yielded,
+        so memory is bounded by one batch and slow consumers never hold a
+        connection.
+        
+        Args:
+            labels: Node tables to read, in order (defaults to File, Class, Function)
+            batch_size: Nodes fetched per query
+            repo_id: Only return nodes of this repository
+            
+        Yields:
+            Node property dicts with the node table in '_label'
+            
+        Raises:
+            ValueError: If a label is not a node table
+        """
+        labels = list(labels) if labels is not None else list(NODE_TABLE_COLUMNS)
+        for label in labels:
+            if label not in NODE_TABLE_COLUMNS:
+                raise ValueError(f"Unknown node label: {label}")
+        
+        for label in labels:
+            columns = NODE_TABLE_COLUMNS[label]
+            filters, params = ["n.id > $after"], {}
+            if repo_id is not None:
+                filters.append("n.repo_id = $repo_id")
+                params["repo_id"] = repo_id
+            query = (
+                f"MATCH (n:{label}) WHERE {' AND '.join(filters)} "
+                f"RETURN {', '.join(f'n.{column}' for column in columns)} ORDER BY n.id LIMIT {int(batch_size)}"
+            )
+            
+            after = ""
+            while True:
+                with self.pool.connection() as conn:
+                    result = conn.execute(query, {**params, "after": after})
+                    batch = []
+                    while result.has_next():
+                        node = dict(zip(columns, result.get_next()))
+                        node["_label"] = label
+                        batch.append(node)
+                yield from batch
+                if len(batch) < batch_size:
+                    break
+                after = batch[-1]["id"]
+    
+    def iter_edges(self, types: Optional[Iterable[str]] = None, batch_size: int = 1000,
+                   repo_id: Optional[str] = None) -> Iterator[Dict[str, str]]:
+        """
+        Stream relationships, fetching batch_size at a time.
+        
+        Batches are keyset queries ordered by (source id, target id); see
+        iter_nodes. The key is not unique, since a function calling another
+        at several call sites has one CALLS relationship per call, so each
+        batch resumes at the last key and skips the relationships with that
+        key already yielded.
+        
+        Args:
+            types: Relationship tables to read, in order (defaults to all of REL_TABLES)
+            batch_size: Edges fetched per query
+            repo_id: Only return edges of this repository
+            
+        Yields:
+            Dicts with source, target, type (as shown in the frontend, see
+            EDGE_TYPES) and relation (the relationship table)
+            
+        Raises:
+            ValueError: If a type is not a relationship table
+        """
+        types = list(types) if types is not None else list(REL_TABLES)
+        for rel_table in types:
+            if rel_table not in REL_TABLES:
+                raise ValueError(f"Unknown edge type: {rel_table}")
+        
+        for rel_table in types:
+            from_table, to_table = REL_TABLES[rel_table]
+            filters, params = ["(a.id > $after_source OR (a.id = $after_source AND b.id >= $after_target))"], {}
+            if repo_id is not None:
+                # Edges never cross repositories, so filtering the source node is enough
+                filters.append("a.repo_id = $repo_id")
+                params["repo_id"] = repo_id
+            query = (
+                f"MATCH (a:{from_table})-[:{rel_table}]->(b:{to_table}) WHERE {' AND '.join(filters)} "
+                f"RETURN a.id, b.id ORDER BY a.id, b.id"
+            )
+            
+            after, skip = ("", ""), 0
+            while True:
+                with self.pool.connection() as conn:
+                    result = conn.execute(f"{query} SKIP {skip} LIMIT {int(batch_size)}",
+                                          {**params, "after_source": after[0], "after_target": after[1]})
+                    batch = []
+                    while result.has_next():
+                        source, target = result.get_next()
+                        batch.append({"source": source, "target": target, "type": EDGE_TYPES[rel_table],
+                                      "relation": rel_table})
+                yield from batch
+                if len(batch) < batch_size:
+                    break
+                last = (batch[-1]["source"], batch[-1]["target"])
+                repeats = 0
+                for edge in reversed(batch):
+                    if (edge["source"], edge["target"]) != last:
+                        break
+                    repeats += 1
+                # A batch ending on the key it started at consists of that key only
+                after, skip = last, repeats + (skip if last == after else 0)
+    
+    def get_nodes_by_id(self, label: str, ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch nodes of one table by id.
+        
+        Args:
+            label: Node table
+            ids: Node ids; unknown ids are skipped
+        
+        Returns:
+            Node property dicts with the node table in '_label', as from iter_nodes
+        
+        Raises:
+            ValueError: If label is not a node table
+        """
+        if label not in NODE_TABLE_COLUMNS:
+            raise ValueError(f"Unknown node label: {label}")
+        
+        columns = NODE_TABLE_COLUMNS[label]
+        nodes = []
+        with self.pool.connection() as conn:
+            for chunk in self._chunks(list(dict.fromkeys(ids))):
+                params = {f"p{i}": node_id for i, node_id in enumerate(chunk)}
+                in_ids = "[" + ", ".join(f"${name}" for name in params) + "]"
+                result = conn.execute(
+                    f"MATCH (n:{label}) WHERE n.id IN {in_ids} "
+                    f"RETURN {', '.join(f'n.{column}' for column in columns)}",
+                    params
+                )
+                while result.has_next():
+                    node = dict(zip(columns, result.get_next()))
+                    node["_label"] = label
+                    nodes.append(node)
+        return nodes
+    
+    def get_edges_from(self, label: str, ids: List[str]) -> List[Dict[str, str]]:
+        """
+        Fetch the relationships leaving some nodes of one table.
+        
+        Args:
+            label: Node table of the source nodes
+            ids: Source node ids
+        
+        Returns:
+            Edge dicts as from iter_edges
+        
+        Raises:
+            ValueError: If label is not a node table
+        """
+        if label not in NODE_TABLE_COLUMNS:
+            raise ValueError(f"Unknown node label: {label}")
+        
+        edges = []
+        with self.pool.connection() as conn:
+            for chunk in self._chunks(list(dict.fromkeys(ids))):
+                params = {f"p{i}": node_id for i, node_id in enumerate(chunk)}
+                in_ids = "[" + ", ".join(f"${name}" for name in params) + "]"
+                for rel_table, (from_table, to_table) in REL_TABLES.items():
+                    if from_table != label:
+                        continue
+                    result = conn.execute(
+                        f"MATCH (a:{from_table})-[:{rel_table}]->(b:{to_table}) WHERE a.id IN {in_ids} "
+                        f"RETURN a.id, b.id",
+                        params
+                    )
+                    while result.has_next():
+                        source, target = result.get_next()
+                        edges.append({"source": source, "target": target, "type": EDGE_TYPES[rel_table],
+                                      "relation": rel_table})
+        return edges
+    
+    def get_edges_to(self, label: str, ids: List[str]) -> List[Dict[str, str]]:
+        """
+        Fetch the relationships entering some nodes of one table.
+        
+        Args:
+            label: Node table of the target nodes
+            ids: Target node ids
+        
+        Returns:
+            Edge dicts as from iter_edges
+        
+        Raises:
+            ValueError: If label is not a node table
+        """
+        if label not in NODE_TABLE_COLUMNS:
+            raise ValueError(f"Unknown node label: {label}")
+        
+        edges = []
+        with self.pool.connection() as conn:
+            for chunk in self._chunks(list(dict.fromkeys(ids))):
+                params = {f"p{i}": node_id for i, node_id in enumerate(chunk)}
+                in_ids = "[" + ", ".join(f"${name}" for name in params) + "]"
+                for rel_table, (from_table, to_table) in REL_TABLES.items():
+                    if to_table != label:
+                        continue
+                    result = conn.execute(
+                        f"MATCH (a:{from_table})-[:{rel_table}]->(b:{to_table}) WHERE b.id IN {in_ids} "
+                        f"RETURN a.id, b.id",
+                        params
+                    )
+                    while result.has_next():
+                        source, target = result.get_next()
+                        edges.append({"source": source, "target": target, "type": EDGE_TYPES[rel_table],
+                                      "relation": rel_table})
+        return edges
+    
+    def get_all_nodes(self, repo_id: Optional[str] = None) -> List[Dict]:
         """
         Retrieve all nodes from the database.
         
+        Loads the whole graph into memory; prefer iter_nodes for large graphs.
+        
+        Args:
+            repo_id: Only return nodes of this repository
+        
         Returns:
             List of all nodes with their properties
         """
         try:
-            all_nodes = []
-            
-            # Get all File nodes
-            files_result = self.conn.execute("MATCH (f:File) RETURN f")
-            while files_result.has_next():
-                row = files_result.get_next()
-                node = row[0] if isinstance(row, (list, tuple)) else row
-                # Convert node to dict with _label
-                node_dict = dict(node) if hasattr(node, '__iter__') and not isinstance(node, str) else {}
-                node_dict['_label'] = 'File'
-                all_nodes.append(node_dict)
-            
-            # Get all Class nodes
-            classes_result = self.conn.execute("MATCH (c:Class) RETURN c")
-            while classes_result.has_next():
-                row = classes_result.get_next()
-                node = row[0] if isinstance(row, (list, tuple)) else row
-                node_dict = dict(node) if hasattr(node, '__iter__') and not isinstance(node, str) else {}
-                node_dict['_label'] = 'Class'
-                all_nodes.append(node_dict)
-            
-            # Get all Function nodes
-            functions_result = self.conn.execute("MATCH (fn:Function) RETURN fn")
-            while functions_result.has_next():
-                row = functions_result.get_next()
-                node = row[0] if isinstance(row, (list, tuple)) else row
-                node_dict = dict(node) if hasattr(node, '__iter__') and not isinstance(node, str) else {}
-                node_dict['_label'] = 'Function'
-                all_nodes.append(node_dict)
-            
-            return all_nodes
+            return list(self.iter_nodes(repo_id=repo_id))
         except Exception as e:
             print(f"Error retrieving nodes: {e}")
             return []
     
-    def get_all_edges(self) -> List[Dict]:
+    def get_all_edges(self, repo_id: Optional[str] = None) -> List[Dict]:
         """
         Retrieve all relationships from the database.
         
+        Loads every edge into memory; prefer iter_edges for large graphs.
+        
+        Args:
+            repo_id: Only return edges of this repository
+        
         Returns:
             List of all edges with their properties
         """
         try:
-            result = []
-            
-            # Get all CONTAINS_CLASS relationships
-            contains_class = self.conn.execute(
-                "MATCH (a:File)-[r:CONTAINS_CLASS]->(b:Class) RETURN a.id AS source, b.id AS target, 'CONTAINS' AS type"
-            )
-            while contains_class.has_next():
-                row = contains_class.get_next()
-                # Convert to dict
-                edge_dict = {
-                    '_src': row[0] if isinstance(row, (list, tuple)) else row,
-                    '_dst': row[1] if isinstance(row, (list, tuple)) else row,
-                    '_label': row[2] if isinstance(row, (list, tuple)) else 'CONTAINS'
-                }
-                result.append(edge_dict)
-            
-            # Get all CONTAINS_FUNCTION relationships
-            contains_func = self.conn.execute(
-                "MATCH (a:File)-[r:CONTAINS_FUNCTION]->(b:Function) RETURN a.id AS source, b.id AS target, 'CONTAINS' AS type"
-            )
-            while contains_func.has_next():
-                row = contains_func.get_next()
-                edge_dict = {
-                    '_src': row[0] if isinstance(row, (list, tuple)) else row,
-                    '_dst': row[1] if isinstance(row, (list, tuple)) else row,
-                    '_label': row[2] if isinstance(row, (list, tuple)) else 'CONTAINS'
-                }
-                result.append(edge_dict)
-            
-            # Get all DEFINES relationships
-            defines = self.conn.execute(
-                "MATCH (a:Class)-[r:DEFINES]->(b:Function) RETURN a.id AS source, b.id AS target, 'DEFINES' AS type"
-            )
-            while defines.has_next():
-                row = defines.get_next()
-                edge_dict = {
-                    '_src': row[0] if isinstance(row, (list, tuple)) else row,
-                    '_dst': row[1] if isinstance(row, (list, tuple)) else row,
-                    '_label': row[2] if isinstance(row, (list, tuple)) else 'DEFINES'
-                }
-                result.append(edge_dict)
-            
-            # Get all CALLS relationships
-            calls = self.conn.execute(
-                "MATCH (a:Function)-[r:CALLS]->(b:Function) RETURN a.id AS source, b.id AS target, 'CALLS' AS type"
-            )
-            while calls.has_next():
-                row = calls.get_next()
-                edge_dict = {
-                    '_src': row[0] if isinstance(row, (list, tuple)) else row,
-                    '_dst': row[1] if isinstance(row, (list, tuple)) else row,
-                    '_label': row[2] if isinstance(row, (list, tuple)) else 'CALLS'
-                }
-                result.append(edge_dict)
-            
-            return result
+            return [
+                {'_src': edge["source"], '_dst': edge["target"], '_label': edge["type"]}
+                for edge in self.iter_edges(repo_id=repo_id)
+            ]
         except Exception as e:
             print(f"Error retrieving edges: {e}")
             return []
     
+    @staticmethod
+    def _repo_filter(repo_id: Optional[str], variable: str) -> Tuple[str, Dict[str, Any]]:
+        """WHERE clause and parameters restricting a node variable to one repository"""
+        if repo_id is None:
+            return "", {}
+        return f" WHERE {variable}.repo_id = $repo_id", {"repo_id": repo_id}
+    
+    @_writes
     def clear_database(self):
         """Clear all data from the database (useful for testing)"""
         try:
@@ -0,0 +1,183 @@
+"""
+Git Blob Source for Code Archaeologist
+Streams file contents of a commit straight from a git object database, without a working tree
+"""
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+# (repository-relative path, blob SHA) of a file in a commit
+BlobEntry = Tuple[str, str]
+
+# ls-tree modes of regular files (symlinks are 120000, submodules 160000)
+_FILE_MODES = {'100644', '100755'}
+
+
+class GitBlobSource:
+    """
+    Reads the files of one commit directly from a (bare) repository.
+
+    Files are listed with `git ls-tree -r` and their contents streamed
+    through a single `git cat-file --batch` process, so ingesting a commit
+    needs no checkout on disk and several repositories or commits can be
+    read concurrently from the same mirrors. Blobs missing from a partial
+    (blobless) clone are fetched from the promisor remote in one batch
+    before streaming instead of one round trip per file.
+
+    Yielded paths are rooted at `root`, so nodes get the same ids they would
+    have had if the commit were checked out there.
+    """
+
+    def __init__(self, git_dir: Path, commit: str = 'HEAD', root: Optional[Path] = None, timeout: int = 300):
+        """
+        Initialize the source.
+
+        Args:
+            git_dir: Repository (bare mirror or working tree) to read from
+            commit: Commit-ish to read
+            root: Directory the yielded paths are rooted at (defaults to git_dir)
+            timeout: Seconds allowed for listing files or fetching missing blobs
+
+        Raises:
+            RuntimeError: If the commit cannot be resolved
+        """
+        self.git_dir = Path(git_dir)
+        self.root = Path(root) if root is not None else self.git_dir
+        self.timeout = timeout
+        self.commit = self._git(['rev-parse', '--verify', f"{commit}^{{commit}}"]).decode().strip()
+
+    def list_files(self, paths: Optional[List[str]] = None,
+                   include: Optional[Callable[[str], bool]] = None) -> List[BlobEntry]:
+        """
+        List the regular files of the commit.
+
+        Args:
+            paths: Only list files at or below these repository paths
+            include: Predicate on the relative path selecting files to keep
+
+        Returns:
+            List of (relative_path, blob_sha) in tree order
+        """
+        output = self._git(['--literal-pathspecs', 'ls-tree', '-r', '-z', '--full-tree', self.commit, '--']
+                           + [path.strip('/') for path in paths or []])
+
+        entries = []
+        for record in output.split(b'\0'):
+            if not record:
+                continue
+            # "<mode> SP <type> SP <object> TAB <path>"
+            info, _, raw_path = record.partition(b'\t')
+            mode, object_type, sha = info.decode().split()
+            if object_type != 'blob' or mode not in _FILE_MODES:
+                continue
+            path = os.fsdecode(raw_path)
+            if include is None or include(path):
+                entries.append((path, sha))
+        return entries
+
+    def iter_sources(self, entries: Iterable[BlobEntry]) -> Iterator[Tuple[Path, bytes]]:
+        """
+        Stream the contents of listed files.
+
+        Args:
+            entries: (relative_path, blob_sha) pairs from list_files
+
+        Yields:
+            (root / relative_path, content) in input order; blobs that cannot
+            be read are skipped with a warning
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        self.prefetch([sha for _, sha in entries])
+
+        process = subprocess.Popen(
+            ['git', '-C', str(self.git_dir), 'cat-file', '--batch'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        # Feed requests from a separate thread so a full stdout pipe can never block stdin
+        writer = threading.Thread(target=self._write_requests, args=(process.stdin, entries), daemon=True)
+        writer.start()
+
+        try:
+            for path, sha in entries:
+                header = process.stdout.readline()
+                if not header:
+                    raise RuntimeError("git cat-file exited unexpectedly")
+                fields = header.split()
+                if len(fields) != 3:
+                    # "<sha> missing" (e.g. the promisor remote was unreachable)
+                    print(f"⚠️  Blob {sha} for {path} is missing, skipping")
+                    continue
+                size = int(fields[2])
+                content = process.stdout.read(size)
+                process.stdout.read(1)  # trailing newline
+                if fields[1] != b'blob' or len(content) != size:
+                    raise RuntimeError(f"Unexpected git cat-file output for {path}")
+                yield self.root / path, content
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            writer.join()
+
+    def prefetch(self, shas: List[str]):
+        """
+        Fetch blobs a partial clone does not have yet, in a single request.
+
+        Args:
+            shas: Blobs that are about to be read
+        """
+        if not self._is_partial_clone():
+            return
+
+        # Only list the commit's own tree: walking the history would cost O(history) per ingest
+        output = self._git(['rev-list', '--objects', '--missing=print', '--no-object-names', '--no-walk',
+                            f"{self.commit}^{{tree}}"])
+        missing = {line[1:] for line in output.decode().splitlines() if line.startswith('?')}
+        wanted = [sha for sha in dict.fromkeys(shas) if sha in missing]
+        if not wanted:
+            return
+
+        self._git(
+            ['-c', 'fetch.negotiationAlgorithm=noop', 'fetch', '--quiet', '--no-tags', '--no-write-fetch-head',
+             '--recurse-submodules=no', '--filter=blob:none', '--stdin', 'origin'],
+            input=('\n'.join(wanted) + '\n').encode()
+        )
+
+    # ========== Helpers ==========
+
+    def _git(self, args: List[str], input: Optional[bytes] = None) -> bytes:
+        """Run git against the repository, raising RuntimeError with its stderr on failure"""
+        result = subprocess.run(
+            ['git', '-C', str(self.git_dir)] + args,
+            input=input,
+            capture_output=True,
+            timeout=self.timeout
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors='replace').strip() or f"git {args[0]} failed")
+        return result.stdout
+
+    def _is_partial_clone(self) -> bool:
+        """Check whether the repository lazily fetches objects from a promisor remote"""
+        try:
+            return self._git(['config', '--get', 'remote.origin.promisor']).decode().strip() == 'true'
+        except RuntimeError:
+            return False
+
+    def _write_requests(self, stdin, entries: List[BlobEntry]):
+        """Send one object name per line to cat-file, then close its input"""
+        try:
+            for _, sha in entries:
+                stdin.write(f"{sha}\n".encode())
+            stdin.close()
+        except (BrokenPipeError, ValueError, OSError):
+            # The reader stopped early and closed the process
+            pass
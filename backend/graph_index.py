@@ -0,0 +1,320 @@
+"""
+Graph Layout Index for Code Archaeologist
+Keeps every node's canvas position in a spatial index so /graph can serve pages and viewports
+"""
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from database import KuzuDB, NODE_TABLE_COLUMNS, FILE_PATH_COLUMNS
+
+# Grid layout of the canvas: nodes per row and distance between neighbours
+GRID_COLUMNS = 10
+GRID_SPACING_X = 200
+GRID_SPACING_Y = 150
+
+# Side length of one spatial index cell, in canvas units
+CELL_SIZE = 1000.0
+
+# Display order of the node tables
+LABEL_ORDER = {label: rank for rank, label in enumerate(NODE_TABLE_COLUMNS)}
+
+Viewport = Tuple[float, float, float, float]  # x0, y0, x1, y1
+
+
+def grid_position(index: int) -> Tuple[float, float]:
+    """Canvas position of the index-th node in display order, for nodes the layout engine has not placed"""
+    return float((index % GRID_COLUMNS) * GRID_SPACING_X), float((index // GRID_COLUMNS) * GRID_SPACING_Y)
+
+
+def repository_path(path: str, repo_id: str) -> str:
+    """Path of a file relative to its repository checkout (unchanged for unpartitioned nodes)"""
+    marker = f"/{repo_id}/"
+    if repo_id and marker in path:
+        return path.split(marker, 1)[1]
+    return path
+
+
+def parse_viewport(value: str) -> Viewport:
+    """
+    Parse an "x0,y0,x1,y1" rectangle.
+
+    Args:
+        value: Four comma-separated numbers; the corners may be given in any order
+
+    Returns:
+        (x0, y0, x1, y1) with x0 <= x1 and y0 <= y1
+
+    Raises:
+        ValueError: If value is not four finite numbers
+    """
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError(f"Viewport must be x0,y0,x1,y1: {value}")
+    x0, y0, x1, y1 = (float(part) for part in parts)
+    if not all(math.isfinite(coordinate) for coordinate in (x0, y0, x1, y1)):
+        raise ValueError(f"Viewport coordinates must be finite: {value}")
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+class SpatialIndex:
+    """
+    Uniform grid over 2D points.
+
+    Points are bucketed into square cells of cell_size, so a rectangle query
+    only inspects the cells it overlaps and costs in proportion to the points
+    near the viewport rather than to the whole graph.
+    """
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        """
+        Initialize an empty index.
+
+        Args:
+            cell_size: Side length of one cell in canvas units
+        """
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._points: Dict[int, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def insert(self, key: int, x: float, y: float):
+        """Add (or move) the point identified by key"""
+        if key in self._points:
+            self.remove(key)
+        self._points[key] = (x, y)
+        self._cells.setdefault(self._cell(x, y), []).append(key)
+
+    def remove(self, key: int):
+        """Drop a point; unknown keys are ignored"""
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        self._cells[cell].remove(key)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def query(self, viewport: Viewport) -> List[int]:
+        """
+        Find the points inside a rectangle (edges included).
+
+        Args:
+            viewport: (x0, y0, x1, y1) with x0 <= x1 and y0 <= y1
+
+        Returns:
+            Keys of the points in the rectangle, sorted
+        """
+        x0, y0, x1, y1 = viewport
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+
+        # A zoomed-out viewport can span far more cells than are occupied
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            cells = [cell for cell in self._cells if cx0 <= cell[0] <= cx1 and cy0 <= cell[1] <= cy1]
+        else:
+            cells = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+        keys = []
+        for cell in cells:
+            for key in self._cells.get(cell, ()):
+                x, y = self._points[key]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    keys.append(key)
+        return sorted(keys)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+
+class GraphIndex:
+    """
+    Display order, position and filter attributes of every node in one graph scope.
+
+    Nodes are numbered in the order KuzuDB.iter_nodes returns them (node
+    table, then id), which is also the order pages are served in. Cursors
+    are the (label, id) key of the last node served, so paging resumes at
+    the right place even if the index was rebuilt in between.
+    """
+
+    def __init__(self, nodes: Iterable[Tuple[str, str, str]],
+                 positions: Optional[Mapping[str, Tuple[float, float]]] = None):
+        """
+        Index nodes given in display order.
+
+        Args:
+            nodes: (label, id, file path relative to the repository) per node,
+                sorted by node table and id
+            positions: Stored layout positions per node id; nodes without one
+                are placed on the grid (see grid_position)
+        """
+        positions = positions or {}
+        self.labels: List[str] = []
+        self.ids: List[str] = []
+        self.paths: List[str] = []
+        self.positions: List[Tuple[float, float]] = []
+        self.spatial = SpatialIndex()
+        self._keys: List[Tuple[int, str]] = []
+
+        for index, (label, node_id, path) in enumerate(nodes):
+            self.labels.append(label)
+            self.ids.append(node_id)
+            self.paths.append(path or "")
+            self.positions.append(positions.get(node_id) or grid_position(index))
+            self.spatial.insert(index, *self.positions[index])
+            self._keys.append((LABEL_ORDER[label], node_id))
+
+    @classmethod
+    def build(cls, db: KuzuDB, repo_id: Optional[str] = None) -> "GraphIndex":
+        """
+        Index the nodes stored in the database, at their stored layout positions.
+
+        Args:
+            db: Database to read
+            repo_id: Only index this repository's nodes
+
+        Returns:
+            The index
+        """
+        return cls(
+            (
+                (
+                    node["_label"],
+                    node["id"],
+                    repository_path(node[FILE_PATH_COLUMNS[node["_label"]]] or "", node.get("repo_id") or "")
+                )
+                for node in db.iter_nodes(repo_id=repo_id)
+            ),
+            db.get_positions(repo_id)
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def find(self, label: str, node_id: str) -> Optional[int]:
+        """Position of a node in display order, or None if it is not indexed"""
+        key = (LABEL_ORDER.get(label, -1), node_id)
+        index = bisect.bisect_left(self._keys, key)
+        return index if index < len(self._keys) and self._keys[index] == key else None
+
+    def cursor(self, index: int) -> str:
+        """Opaque cursor resuming after the index-th node"""
+        return f"{self.labels[index]}:{self.ids[index]}"
+
+    def matches(self, index: int, labels: Optional[Sequence[str]] = None, path_prefix: str = "",
+                viewport: Optional[Viewport] = None) -> bool:
+        """Whether a node passes the label, path prefix and viewport filters"""
+        if labels and self.labels[index] not in labels:
+            return False
+        if path_prefix and not self.paths[index].startswith(path_prefix):
+            return False
+        if viewport:
+            x, y = self.positions[index]
+            x0, y0, x1, y1 = viewport
+            return x0 <= x <= x1 and y0 <= y <= y1
+        return True
+
+    def select(self, labels: Optional[Sequence[str]] = None, path_prefix: str = "",
+               viewport: Optional[Viewport] = None, cursor: Optional[str] = None,
+               limit: int = 500) -> Tuple[List[int], Optional[str]]:
+        """
+        Find one page of nodes matching the filters.
+
+        Args:
+            labels: Only include these node tables
+            path_prefix: Only include nodes whose file path, relative to the
+                repository, starts with this
+            viewport: Only include nodes positioned inside this rectangle
+            cursor: Resume after the node this cursor was issued for
+            limit: Maximum nodes returned
+
+        Returns:
+            Matching node positions in display order, and the cursor of the
+            next page (None on the last page)
+
+        Raises:
+            ValueError: If a label or the cursor is not valid
+        """
+        for label in labels or []:
+            if label not in LABEL_ORDER:
+                raise ValueError(f"Unknown node label: {label}")
+
+        start = 0
+        if cursor:
+            label, separator, node_id = cursor.partition(":")
+            if not separator or label not in LABEL_ORDER:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            start = bisect.bisect_right(self._keys, (LABEL_ORDER[label], node_id))
+
+        if viewport:
+            candidates = self.spatial.query(viewport)
+            candidates = candidates[bisect.bisect_left(candidates, start):]
+        else:
+            candidates = range(start, len(self.ids))
+
+        selected = []
+        for index in candidates:
+            if self.matches(index, labels, path_prefix):
+                if len(selected) == limit:
+                    return selected, self.cursor(selected[-1])
+                selected.append(index)
+        return selected, None
+
+
+class GraphIndexCache:
+    """
+    GraphIndex per repository scope, built on first use.
+
+    Every KuzuDB write bumps the generation of the repository it belongs to
+    (see KuzuDB.generation_of); an index built before the latest write to
+    its scope is rebuilt when next requested. Builds hold only their scope's
+    lock, so queries of other repositories are served meanwhile.
+    """
+
+    def __init__(self, db: KuzuDB):
+        """
+        Initialize the cache.
+
+        Args:
+            db: Database the indexes are built from
+        """
+        self.db = db
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Optional[str], threading.Lock] = {}
+        self._indexes: Dict[Optional[str], Tuple[int, GraphIndex]] = {}
+
+    def get(self, repo_id: Optional[str] = None) -> GraphIndex:
+        """
+        Index of one repository, or of the whole graph if repo_id is None.
+
+        Args:
+            repo_id: Repository scope
+
+        Returns:
+            An index reflecting the scope as of the last completed write
+        """
+        with self._lock:
+            build_lock = self._build_locks.setdefault(repo_id, threading.Lock())
+
+        # Concurrent requests for a stale scope wait for one build instead of each building
+        with build_lock:
+            # Read the generation before building, so a write that lands
+            # during the build invalidates the result
+            generation = self.db.generation_of(repo_id)
+            with self._lock:
+                entry = self._indexes.get(repo_id)
+            if entry is not None and entry[0] == generation:
+                return entry[1]
+
+            index = GraphIndex.build(self.db, repo_id)
+            with self._lock:
+                # Drop indexes of other scopes that went stale meanwhile
+                self._indexes = {
+                    scope: entry for scope, entry in self._indexes.items()
+                    if entry[0] == self.db.generation_of(scope)
+                }
+                self._indexes[repo_id] = (generation, index)
+            return index
@@ -5,13 +5,38 @@ Handles repository cloning, parsing, and database insertion
 import os
 import shutil
 import subprocess
+import threading
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Iterator, Iterable, Callable
 from urllib.parse import urlparse
 from pydantic import BaseModel
 
 from parser import TreeSitterParser
+from parse_cache import CacheStats
 from database import KuzuDB, FileNode, ClassNode, FunctionNode, Edge
+from repo_cache import GitMirrorCache, checkout_dir_name, repo_name_from_url, repository_id
+from git_source import GitBlobSource
+from progress import IngestionProgress, ProgressReporter
+from layout import layout_repository
+from aggregate import aggregate_repository
+from pipeline import IngestionPipeline, create_parse_pool, parse_chunk, parse_source_chunk, unpack_result
+
+
+# File extensions the parser understands
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.jsx', '.ts', '.tsx', '.mjs'}
+
+# Common non-code directories skipped during ingestion (hidden directories are skipped too)
+IGNORED_DIRS = {'node_modules', 'venv', '__pycache__', 'dist', 'build'}
+
+# How a repository is fetched and checked out:
+#   full     - complete history and working tree
+#   shallow  - only the latest commit (--depth 1)
+#   blobless - full history without blobs (--filter=blob:none); only supported
+#              source files are checked out, so only their blobs are fetched
+#   sparse   - blobless, further restricted to the requested subdirectories
+CLONE_STRATEGIES = ('full', 'shallow', 'blobless', 'sparse')
 
 
 class JobStatus(BaseModel):
@@ -22,12 +47,20 @@ class JobStatus(BaseModel):
     files_processed: int = 0
     nodes_created: int = 0
     edges_created: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
 
 
 class IngestionService:
     """Service for ingesting GitHub repositories into the knowledge graph"""
     
-    def __init__(self, db: KuzuDB, parser: TreeSitterParser, repo_dir: str = "./repos"):
+    def __init__(self, db: KuzuDB, parser: TreeSitterParser, repo_dir: str = "./repos",
+                 bulk_load: bool = True, files_per_transaction: int = 100,
+                 parse_workers: int = 1, parse_chunk_size: int = 64,
+                 streaming: bool = False, pipeline_queue_size: int = 64,
+                 mirror_cache: Optional[GitMirrorCache] = None, allow_local_repos: bool = False,
+                 clone_strategy: str = 'full', checkout: bool = True, layout: bool = True,
+                 aggregate: bool = True):
         """
         Initialize the ingestion service.
         
@@ -35,11 +68,40 @@ class IngestionService:
             db: KuzuDB database instance
             parser: TreeSitterParser instance
             repo_dir: Directory to store cloned repositories
+            bulk_load: Load empty tables with COPY FROM instead of batched inserts
+            files_per_transaction: Files written per transaction by the batched insert path
+            parse_workers: Number of parser processes; 1 parses serially in-process
+            parse_chunk_size: Files sent to a parser process per task
+            streaming: Stream files through IngestionPipeline instead of parsing everything first
+            pipeline_queue_size: Capacity of each queue between streaming pipeline stages
+            mirror_cache: Cache of bare git mirrors (defaults to one under repo_dir/mirrors)
+            allow_local_repos: Also accept file:// URLs and local repository paths
+            clone_strategy: Default clone strategy, one of CLONE_STRATEGIES
+            checkout: Materialize a working tree; when False, files are read
+                straight from the mirror's git objects
+            layout: Lay out the repository's graph after every successful ingest
+            aggregate: Precompute the repository's level-of-detail views after every successful ingest
         """
         self.db = db
         self.parser = parser
+        self.bulk_load = bulk_load
+        self.files_per_transaction = files_per_transaction
+        self.parse_workers = parse_workers
+        self.parse_chunk_size = parse_chunk_size
+        self.streaming = streaming
+        self.pipeline_queue_size = pipeline_queue_size
         self.repo_dir = Path(repo_dir)
         self.repo_dir.mkdir(exist_ok=True)
+        self.mirrors = mirror_cache or GitMirrorCache(str(self.repo_dir / "mirrors"))
+        self.allow_local_repos = allow_local_repos
+        self.clone_strategy = clone_strategy
+        self.checkout = checkout
+        self.layout = layout
+        self.aggregate = aggregate
+        
+        # Per-repository locks: [lock, number of holders and waiters], dropped when unused
+        self._repo_locks = {}
+        self._repo_locks_guard = threading.Lock()
     
     def validate_repo_url(self, repo_url: str) -> bool:
         """
@@ -54,6 +116,13 @@ class IngestionService:
         try:
             parsed = urlparse(repo_url)
             
+            # Local remotes (file:// URLs or repository directories) are opt-in
+            if self.allow_local_repos:
+                if parsed.scheme == 'file' and parsed.path:
+                    return True
+                if not parsed.scheme and repo_url and Path(repo_url).is_dir():
+                    return True
+            
             # Check if it's a valid URL
             if not parsed.scheme or not parsed.netloc:
                 return False
@@ -72,52 +141,204 @@ class IngestionService:
         except Exception:
             return False
     
-    def clone_repo(self, repo_url: str) -> Tuple[bool, Optional[Path], str]:
+    def clone_repo(self, repo_url: str, strategy: Optional[str] = None,
+                   sparse_paths: Optional[List[str]] = None) -> Tuple[bool, Optional[Path], str]:
         """
-        Clone a GitHub repository to local storage.
+        Fetch a repository into the mirror cache and check out its HEAD.
         
         Args:
             repo_url: GitHub repository URL
+            strategy: Clone strategy, one of CLONE_STRATEGIES (defaults to self.clone_strategy)
+            sparse_paths: Subdirectories to check out with the 'sparse' strategy
             
         Returns:
             Tuple of (success, repo_path, message)
         """
-        # Validate URL
-        if not self.validate_repo_url(repo_url):
-            return False, None, f"Invalid repository URL: {repo_url}"
+        strategy = strategy or self.clone_strategy
+        error = self.validate_clone_request(repo_url, strategy, sparse_paths)
+        if error:
+            return False, None, error
         
         try:
-            # Extract repo name from URL
-            parsed = urlparse(repo_url)
-            path_parts = parsed.path.strip('/').split('/')
-            repo_name = path_parts[-1].replace('.git', '')
-            
-            # Create local path
-            local_path = self.repo_dir / repo_name
+            # Each URL gets its own working tree, checked out from its mirror
+            local_path = self.repo_dir / checkout_dir_name(repo_url)
+            mode = self._mirror_mode(strategy)
+            self.mirrors.update(repo_url, mode)
+            commit = self.mirrors.checkout(
+                repo_url, local_path, mode=mode,
+                sparse_patterns=self._sparse_patterns(strategy, sparse_paths)
+            )
             
-            # Remove existing directory if it exists
-            if local_path.exists():
-                shutil.rmtree(local_path)
+            return True, local_path, f"Successfully checked out {commit[:12]} to {local_path} ({strategy})"
             
-            # Clone the repository
-            result = subprocess.run(
-                ['git', 'clone', repo_url, str(local_path)],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
+        except subprocess.TimeoutExpired:
+            return False, None, "Repository cloning timed out (5 minutes)"
+        except RuntimeError as e:
+            return False, None, f"Failed to clone repository: {str(e)}"
+        except Exception as e:
+            return False, None, f"Error cloning repository: {str(e)}"
+    
+    def fetch_repo(self, repo_url: str, strategy: Optional[str] = None,
+                   sparse_paths: Optional[List[str]] = None) -> Tuple[bool, Optional[GitBlobSource], str]:
+        """
+        Fetch a repository into the mirror cache without checking it out.
+        
+        Args:
+            repo_url: GitHub repository URL
+            strategy: Clone strategy, one of CLONE_STRATEGIES (defaults to self.clone_strategy)
+            sparse_paths: Subdirectories to ingest with the 'sparse' strategy
             
-            if result.returncode != 0:
-                error_msg = result.stderr or "Unknown error during cloning"
-                return False, None, f"Failed to clone repository: {error_msg}"
+        Returns:
+            Tuple of (success, source reading HEAD from the mirror, message).
+            The source yields paths under the directory a checkout would use.
+        """
+        strategy = strategy or self.clone_strategy
+        error = self.validate_clone_request(repo_url, strategy, sparse_paths)
+        if error:
+            return False, None, error
+        
+        try:
+            mode = self._mirror_mode(strategy)
+            mirror = self.mirrors.update(repo_url, mode)
+            source = GitBlobSource(mirror, 'HEAD', root=self.repo_dir / checkout_dir_name(repo_url),
+                                   timeout=self.mirrors.timeout)
             
-            return True, local_path, f"Successfully cloned repository to {local_path}"
+            return True, source, f"Successfully fetched {source.commit[:12]} into {mirror} ({strategy})"
             
         except subprocess.TimeoutExpired:
             return False, None, "Repository cloning timed out (5 minutes)"
+        except RuntimeError as e:
+            return False, None, f"Failed to clone repository: {str(e)}"
         except Exception as e:
             return False, None, f"Error cloning repository: {str(e)}"
     
+    def validate_clone_request(self, repo_url: str, strategy: Optional[str] = None,
+                               sparse_paths: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Check a repository URL and clone strategy before fetching.
+        
+        Args:
+            repo_url: GitHub repository URL
+            strategy: Clone strategy, one of CLONE_STRATEGIES (defaults to self.clone_strategy)
+            sparse_paths: Subdirectories to ingest with the 'sparse' strategy
+            
+        Returns:
+            Error message, or None if the request is valid
+        """
+        strategy = strategy or self.clone_strategy
+        # Validate URL
+        if not self.validate_repo_url(repo_url):
+            return f"Invalid repository URL: {repo_url}"
+        
+        if strategy not in CLONE_STRATEGIES:
+            return f"Invalid clone strategy: {strategy}"
+        if strategy == 'sparse':
+            if not sparse_paths:
+                return "The sparse clone strategy requires at least one path"
+            invalid = [path for path in sparse_paths if not self._is_valid_sparse_path(path)]
+            if invalid:
+                return f"Invalid sparse paths: {', '.join(invalid)}"
+        return None
+    
+    def _is_valid_sparse_path(self, path: str) -> bool:
+        """Sparse paths must be relative directories inside the repository"""
+        parts = Path(path.strip('/')).parts
+        return bool(parts) and not path.startswith('/') and '..' not in parts and \
+            not any(char in path for char in '*?[]!\\')
+    
+    def _sparse_patterns(self, strategy: str, sparse_paths: Optional[List[str]]) -> Optional[List[str]]:
+        """
+        Sparse-checkout patterns selecting the files ingestion will read.
+        
+        Returns:
+            Non-cone patterns, or None to check out everything
+        """
+        if strategy == 'blobless':
+            roots = ['']
+        elif strategy == 'sparse':
+            roots = [f"/{path.strip('/')}/**/" for path in sparse_paths]
+        else:
+            return None
+        
+        patterns = [f"{root}*{ext}" for root in roots for ext in sorted(SUPPORTED_EXTENSIONS)]
+        # Never materialize directories that ingestion skips anyway
+        patterns += ['!.*/'] + [f"!{name}/" for name in sorted(IGNORED_DIRS)]
+        return patterns
+    
+    def _mirror_mode(self, strategy: str) -> str:
+        """Mirror kind a clone strategy reads from; sparse checkouts use blobless mirrors"""
+        return 'blobless' if strategy == 'sparse' else strategy
+    
+    def _checkout_scope(self, strategy: str, sparse_paths: Optional[List[str]]) -> str:
+        """Identifies which files of a repository a checkout contains"""
+        if strategy != 'sparse':
+            return ''
+        return ','.join(sorted(path.strip('/') for path in sparse_paths))
+    
+    def get_head_commit(self, repo_path: Path) -> Optional[str]:
+        """
+        Get the commit SHA checked out in a repository.
+        
+        Args:
+            repo_path: Path to cloned repository
+            
+        Returns:
+            Commit SHA, or None if it cannot be determined
+        """
+        result = subprocess.run(
+            ['git', '-C', str(repo_path), 'rev-parse', 'HEAD'],
+            capture_output=True,
+            text=True
+        )
+        return result.stdout.strip() if result.returncode == 0 else None
+    
+    def diff_commits(self, repo_path: Path, old_commit: str, new_commit: str,
+                     paths: Optional[List[str]] = None, git_dir: Optional[Path] = None
+                     ) -> Optional[Tuple[List[Path], List[Path]]]:
+        """
+        Find the supported files changed between two commits.
+        
+        Args:
+            repo_path: Path to cloned repository
+            old_commit: Commit the graph currently reflects
+            new_commit: Commit being ingested
+            paths: Only consider changes under these repository paths
+            git_dir: Repository holding the commits, if repo_path is not a checkout
+            
+        Returns:
+            Tuple of (paths whose subgraphs must be deleted, paths to parse and insert),
+            or None if the diff cannot be computed (e.g. old_commit no longer exists)
+        """
+        result = subprocess.run(
+            ['git', '-C', str(git_dir or repo_path), 'diff', '--name-status', '-z', '-M', old_commit, new_commit,
+             '--'] + [path.strip('/') for path in paths or []],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            return None
+        
+        deleted, changed = [], []
+        fields = iter(result.stdout.split('\0'))
+        for status in fields:
+            if not status:
+                continue
+            path = next(fields)
+            if status[0] in 'RC':
+                # Renames and copies list the old path, then the new one
+                new_path = next(fields)
+                if status[0] == 'R' and self.is_supported_path(path):
+                    deleted.append(repo_path / path)
+                if self.is_supported_path(new_path):
+                    changed.append(repo_path / new_path)
+            elif self.is_supported_path(path):
+                if status[0] in 'DMT':
+                    deleted.append(repo_path / path)
+                if status[0] in 'AMT':
+                    changed.append(repo_path / path)
+        
+        return deleted, changed
+    
     def get_supported_files(self, repo_path: Path) -> List[Path]:
         """
         Get all supported files (Python and JavaScript) from repository.
@@ -128,61 +349,222 @@ class IngestionService:
         Returns:
             List of file paths
         """
-        supported_extensions = {'.py', '.js', '.jsx', '.ts', '.tsx', '.mjs'}
-        supported_files = []
+        return list(self.iter_supported_files(repo_path))
+    
+    def iter_supported_files(self, repo_path: Path) -> Iterator[Path]:
+        """
+        Lazily walk a repository, yielding supported files as they are found.
         
+        Args:
+            repo_path: Path to cloned repository
+            
+        Yields:
+            File paths
+        """
         # Walk through directory tree
         for root, dirs, files in os.walk(repo_path):
             # Skip hidden directories and common non-code directories
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'venv', '__pycache__', 'dist', 'build']]
+            dirs[:] = [d for d in dirs if not self._is_ignored_dir(d)]
             
             for file in files:
                 file_path = Path(root) / file
-                if file_path.suffix in supported_extensions:
-                    supported_files.append(file_path)
+                if file_path.suffix in SUPPORTED_EXTENSIONS:
+                    yield file_path
+    
+    def is_supported_path(self, relative_path: str) -> bool:
+        """
+        Check whether a repository-relative path would be ingested.
         
-        return supported_files
+        Args:
+            relative_path: Path relative to the repository root
+            
+        Returns:
+            True if the file has a supported extension and is not in a skipped directory
+        """
+        path = Path(relative_path)
+        return (path.suffix in SUPPORTED_EXTENSIONS and
+                not any(self._is_ignored_dir(part) for part in path.parts[:-1]))
     
-    def parse_repository(self, repo_path: Path) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge], List[str]]:
+    def _is_ignored_dir(self, name: str) -> bool:
+        """Hidden directories and common non-code directories are never ingested"""
+        return name.startswith('.') or name in IGNORED_DIRS
+    
+    def parse_repository(self, repo_path: Path, workers: Optional[int] = None,
+                         cache_stats: Optional[CacheStats] = None
+                         ) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge], List[str]]:
         """
         Parse all supported files in a repository.
         
         Args:
             repo_path: Path to cloned repository
+            workers: Number of parser processes (defaults to self.parse_workers)
+            cache_stats: Receives the parse cache hits and misses of these files
+            
+        Returns:
+            Tuple of (all_files, all_classes, all_functions, all_edges, errors)
+        """
+        # Get all supported files
+        return self.parse_files(self.get_supported_files(repo_path), workers, cache_stats=cache_stats)
+    
+    def parse_files(self, file_paths: List[Path], workers: Optional[int] = None,
+                    reporter: Optional[ProgressReporter] = None, cache_stats: Optional[CacheStats] = None
+                    ) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge], List[str]]:
+        """
+        Parse the given files, continuing past files that fail.
+        
+        Args:
+            file_paths: Files to parse
+            workers: Number of parser processes (defaults to self.parse_workers)
+            reporter: Receives a files_parsed update per file
+            cache_stats: Receives the parse cache hits and misses of these files
             
         Returns:
             Tuple of (all_files, all_classes, all_functions, all_edges, errors)
         """
+        workers = workers or self.parse_workers
+        cache_stats = cache_stats if cache_stats is not None else CacheStats()
+        if workers > 1 and len(file_paths) > self.parse_chunk_size:
+            results = self._parse_files_parallel(file_paths, workers, cache_stats)
+        else:
+            results = self._parse_files_serial(file_paths, cache_stats)
+        
+        return self._collect_results(results, reporter)
+    
+    def parse_sources(self, sources: Iterable[Tuple[Path, bytes]], workers: Optional[int] = None,
+                      reporter: Optional[ProgressReporter] = None, cache_stats: Optional[CacheStats] = None
+                      ) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge], List[str]]:
+        """
+        Parse already-loaded file contents, continuing past files that fail.
+        
+        Args:
+            sources: (file_path, source_code) pairs, e.g. from GitBlobSource.iter_sources
+            workers: Number of parser processes (defaults to self.parse_workers)
+            reporter: Receives a files_parsed update per file
+            cache_stats: Receives the parse cache hits and misses of these files
+            
+        Returns:
+            Tuple of (all_files, all_classes, all_functions, all_edges, errors)
+        """
+        workers = workers or self.parse_workers
+        cache_stats = cache_stats if cache_stats is not None else CacheStats()
+        if workers > 1:
+            results = self._parse_sources_parallel(sources, workers, cache_stats)
+        else:
+            results = self._parse_sources_serial(sources, cache_stats)
+        
+        return self._collect_results(results, reporter)
+    
+    def _collect_results(self, results: Iterable[Tuple[Path, Optional[tuple], Optional[str]]],
+                         reporter: Optional[ProgressReporter] = None
+                         ) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge], List[str]]:
+        """Concatenate per-file parse results, reporting files that failed"""
         all_files = []
         all_classes = []
         all_functions = []
         all_edges = []
         errors = []
         
-        # Get all supported files
-        supported_files = self.get_supported_files(repo_path)
-        
-        # Parse each file
-        for file_path in supported_files:
-            try:
-                files, classes, functions, edges = self.parser.parse_file(file_path)
-                
-                all_files.extend(files)
-                all_classes.extend(classes)
-                all_functions.extend(functions)
-                all_edges.extend(edges)
-                
-            except Exception as e:
-                error_msg = f"Error parsing {file_path}: {str(e)}"
+        for file_path, result, error in results:
+            if reporter:
+                reporter.add(files_parsed=1)
+            if error is not None:
+                error_msg = f"Error parsing {file_path}: {error}"
                 errors.append(error_msg)
                 print(f"⚠️  {error_msg}")
                 # Continue processing other files
                 continue
+            
+            files, classes, functions, edges = result
+            all_files.extend(files)
+            all_classes.extend(classes)
+            all_functions.extend(functions)
+            all_edges.extend(edges)
         
         return all_files, all_classes, all_functions, all_edges, errors
     
+    def _parse_files_serial(self, file_paths: List[Path], cache_stats: CacheStats
+                            ) -> Iterator[Tuple[Path, Optional[tuple], Optional[str]]]:
+        """Parse files one by one with this service's parser"""
+        for file_path in file_paths:
+            try:
+                yield file_path, self.parser.parse_file(file_path, cache_stats), None
+            except Exception as e:
+                yield file_path, None, str(e)
+    
+    def _parse_files_parallel(self, file_paths: List[Path], workers: int, cache_stats: CacheStats
+                              ) -> Iterator[Tuple[Path, Optional[tuple], Optional[str]]]:
+        """
+        Parse files across a process pool, yielding results in input order.
+        
+        Files are sent in chunks of parse_chunk_size to amortize IPC, and
+        results come back as packed tuples, so the output matches
+        _parse_files_serial exactly.
+        """
+        chunks = [
+            [str(path) for path in file_paths[start:start + self.parse_chunk_size]]
+            for start in range(0, len(file_paths), self.parse_chunk_size)
+        ]
+        
+        with create_parse_pool(workers, self.parser) as executor:
+            index = 0
+            for chunk_results, cache_counts in executor.map(parse_chunk, chunks):
+                cache_stats.add(*cache_counts)
+                for packed, error in chunk_results:
+                    file_path = file_paths[index]
+                    index += 1
+                    if error is not None:
+                        yield file_path, None, error
+                        continue
+                    yield file_path, unpack_result(packed), None
+    
+    def _parse_sources_serial(self, sources: Iterable[Tuple[Path, bytes]], cache_stats: CacheStats
+                              ) -> Iterator[Tuple[Path, Optional[tuple], Optional[str]]]:
+        """Parse loaded contents one by one with this service's parser"""
+        for file_path, source_code in sources:
+            try:
+                yield file_path, self.parser.parse_source(source_code, file_path, cache_stats), None
+            except Exception as e:
+                yield file_path, None, str(e)
+    
+    def _parse_sources_parallel(self, sources: Iterable[Tuple[Path, bytes]], workers: int, cache_stats: CacheStats
+                                ) -> Iterator[Tuple[Path, Optional[tuple], Optional[str]]]:
+        """
+        Parse loaded contents across a process pool in chunks, yielding results in input order.
+        
+        At most 2 * workers chunks are in flight, so only that many chunks of
+        contents are held in memory however many files sources yields.
+        """
+        in_flight = deque()
+        
+        def emit_oldest():
+            chunk_paths, future = in_flight.popleft()
+            chunk_results, cache_counts = future.result()
+            cache_stats.add(*cache_counts)
+            for file_path, (packed, error) in zip(chunk_paths, chunk_results):
+                if error is not None:
+                    yield Path(file_path), None, error
+                    continue
+                yield Path(file_path), unpack_result(packed), None
+        
+        with create_parse_pool(workers, self.parser) as executor:
+            chunk = []
+            for file_path, source_code in sources:
+                chunk.append((str(file_path), source_code))
+                if len(chunk) < self.parse_chunk_size:
+                    continue
+                in_flight.append(([path for path, _ in chunk], executor.submit(parse_source_chunk, chunk)))
+                chunk = []
+                if len(in_flight) >= 2 * workers:
+                    yield from emit_oldest()
+            
+            if chunk:
+                in_flight.append(([path for path, _ in chunk], executor.submit(parse_source_chunk, chunk)))
+            while in_flight:
+                yield from emit_oldest()
+    
     def insert_into_database(self, files: List[FileNode], classes: List[ClassNode], 
-                            functions: List[FunctionNode], edges: List[Edge]) -> Tuple[bool, str, int, int]:
+                            functions: List[FunctionNode], edges: List[Edge],
+                            reporter: Optional[ProgressReporter] = None) -> Tuple[bool, str, int, int]:
         """
         Insert parsed nodes and edges into database.
         
@@ -191,6 +573,7 @@ class IngestionService:
             classes: List of class nodes
             functions: List of function nodes
             edges: List of edges
+            reporter: Receives written nodes and edges per committed batch
             
         Returns:
             Tuple of (success, message, nodes_inserted, edges_inserted)
@@ -199,43 +582,26 @@ class IngestionService:
         edges_inserted = 0
         
         try:
-            # Insert file nodes
-            for file_node in files:
-                if self.db.insert_file(file_node):
-                    nodes_inserted += 1
-                else:
-                    print(f"⚠️  Failed to insert file: {file_node.id}")
-            
-            # Insert class nodes
-            for class_node in classes:
-                if self.db.insert_class(class_node):
-                    nodes_inserted += 1
-                else:
-                    print(f"⚠️  Failed to insert class: {class_node.id}")
-            
-            # Insert function nodes
-            for func_node in functions:
-                if self.db.insert_function(func_node):
-                    nodes_inserted += 1
-                else:
-                    print(f"⚠️  Failed to insert function: {func_node.id}")
-            
-            # Insert edges
-            for edge in edges:
-                success = False
-                if edge.edge_type == "CONTAINS_CLASS":
-                    success = self.db.insert_contains(edge.source, edge.target, "Class")
-                elif edge.edge_type == "CONTAINS_FUNCTION":
-                    success = self.db.insert_contains(edge.source, edge.target, "Function")
-                elif edge.edge_type == "DEFINES":
-                    success = self.db.insert_defines(edge.source, edge.target)
-                elif edge.edge_type == "CALLS":
-                    success = self.db.insert_calls(edge.source, edge.target)
-                
-                if success:
-                    edges_inserted += 1
-                else:
-                    print(f"⚠️  Failed to insert edge: {edge.edge_type} from {edge.source} to {edge.target}")
+            if self.bulk_load:
+                # COPY FROM into empty tables, batched inserts for the rest
+                nodes_inserted, edges_inserted = self.db.bulk_load(files, classes, functions, edges)
+                if reporter:
+                    reporter.add(nodes=nodes_inserted, edges=edges_inserted, batches=1)
+                message = f"Inserted {nodes_inserted} nodes and {edges_inserted} edges"
+                return True, message, nodes_inserted, edges_inserted
+            
+            # Insert whole files per transaction so a failure never leaves one half written
+            for group in self._group_by_file(files, classes, functions, edges):
+                group_nodes, group_edges = self.db.insert_subgraph(*group)
+                nodes_inserted += group_nodes
+                edges_inserted += group_edges
+                if reporter:
+                    reporter.add(nodes=group_nodes, edges=group_edges, batches=1)
+            
+            skipped_nodes = len(files) + len(classes) + len(functions) - nodes_inserted
+            skipped_edges = len(edges) - edges_inserted
+            if skipped_nodes or skipped_edges:
+                print(f"⚠️  Skipped {skipped_nodes} nodes and {skipped_edges} edges that failed to insert")
             
             message = f"Inserted {nodes_inserted} nodes and {edges_inserted} edges"
             return True, message, nodes_inserted, edges_inserted
@@ -243,18 +609,128 @@ class IngestionService:
         except Exception as e:
             return False, f"Database insertion error: {str(e)}", nodes_inserted, edges_inserted
     
-    def ingest_repository(self, repo_url: str) -> JobStatus:
+    def _group_by_file(self, files: List[FileNode], classes: List[ClassNode],
+                       functions: List[FunctionNode], edges: List[Edge]
+                       ) -> Iterator[Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge]]]:
+        """
+        Split parsed records into groups of files_per_transaction whole files.
+        
+        Yields:
+            Tuples of (files, classes, functions, edges) belonging to the same files
+        """
+        owner = {file_node.id: file_node.path for file_node in files}
+        owner.update((node.id, node.file_path) for node in classes)
+        owner.update((node.id, node.file_path) for node in functions)
+        
+        group_of = {}
+        for i, file_node in enumerate(files):
+            group_of.setdefault(file_node.path, i // self.files_per_transaction)
+        group_count = (len(files) + self.files_per_transaction - 1) // self.files_per_transaction
+        
+        # Records of files not in `files` go to the last group
+        def group_index(path: Optional[str]) -> int:
+            return group_of.get(path, max(group_count - 1, 0))
+        
+        groups = [([], [], [], []) for _ in range(max(group_count, 1))]
+        for file_node in files:
+            groups[group_index(file_node.path)][0].append(file_node)
+        for class_node in classes:
+            groups[group_index(class_node.file_path)][1].append(class_node)
+        for func_node in functions:
+            groups[group_index(func_node.file_path)][2].append(func_node)
+        for edge in edges:
+            groups[group_index(owner.get(edge.source))][3].append(edge)
+        
+        for group in groups:
+            if any(group):
+                yield group
+    
+    def ingest_repository(self, repo_url: str, clone_strategy: Optional[str] = None,
+                          sparse_paths: Optional[List[str]] = None,
+                          progress: Optional[Callable[[IngestionProgress], None]] = None,
+                          reload: bool = False) -> JobStatus:
         """
         Main ingestion method: clone, parse, and store repository.
         
+        Each repository is stored as its own partition of the graph (nodes
+        carry its repository_id). If the repository was ingested before with
+        the same checkout scope, only files changed since the recorded commit
+        are re-parsed; otherwise the whole repository is (re)built.
+        
         Args:
             repo_url: GitHub repository URL
+            clone_strategy: Clone strategy, one of CLONE_STRATEGIES (defaults to self.clone_strategy)
+            sparse_paths: Subdirectories to ingest with the 'sparse' strategy
+            progress: Receives rate-limited IngestionProgress snapshots while ingesting
+            reload: Rebuild the repository's subgraph from scratch instead of updating it incrementally
             
         Returns:
             JobStatus with results
         """
-        # Step 1: Clone repository
-        success, repo_path, message = self.clone_repo(repo_url)
+        reporter = ProgressReporter(progress)
+        
+        # Ingests of one repository share its checkout and graph, so run them one at a time;
+        # meanwhile ingests of other repositories must not evict the mirror this one reads
+        mode = self._mirror_mode(clone_strategy or self.clone_strategy)
+        with self.repository_lock(repo_url), self.db.repository_writes(repository_id(repo_url)), \
+                self.mirrors.in_use(repo_url, mode):
+            return self._ingest_repository(repo_url, clone_strategy, sparse_paths, reporter, reload)
+    
+    def delete_repository(self, repo_id: str) -> bool:
+        """
+        Remove a repository: its subgraph, its ingestion record and its checkout.
+        
+        Args:
+            repo_id: Repository id (see repo_cache.repository_id)
+            
+        Returns:
+            True if the repository existed and was deleted, False otherwise
+        """
+        record = self.db.get_repository(repo_id)
+        if record is None:
+            return False
+        
+        with self.repository_lock(record['url']), self.db.repository_writes(repo_id):
+            if not self.db.delete_repository(repo_id):
+                return False
+            checkout = self.repo_dir / repo_id
+            if checkout.exists():
+                shutil.rmtree(checkout, ignore_errors=True)
+        print(f"✓ Deleted repository {record['url']}")
+        return True
+    
+    @contextmanager
+    def repository_lock(self, repo_url: str):
+        """
+        Hold the lock of one repository; other repositories are not blocked.
+        
+        Args:
+            repo_url: Repository URL
+        """
+        with self._repo_locks_guard:
+            entry = self._repo_locks.setdefault(repo_url, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._repo_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._repo_locks[repo_url]
+    
+    def _ingest_repository(self, repo_url: str, clone_strategy: Optional[str], sparse_paths: Optional[List[str]],
+                           reporter: ProgressReporter, reload: bool = False) -> JobStatus:
+        """Clone, parse and store a repository while holding its lock"""
+        # Step 1: Clone repository (or only fetch it, reading files from git objects)
+        reporter.stage("cloning")
+        strategy = clone_strategy or self.clone_strategy
+        source = None
+        if self.checkout:
+            success, repo_path, message = self.clone_repo(repo_url, strategy, sparse_paths)
+        else:
+            success, source, message = self.fetch_repo(repo_url, strategy, sparse_paths)
+            repo_path = source.root if source else None
         if not success:
             return JobStatus(
                 status="error",
@@ -264,16 +740,97 @@ class IngestionService:
                 edges_created=0
             )
         
+        head_commit = source.commit if source else self.get_head_commit(repo_path)
+        paths = sparse_paths if strategy == 'sparse' else None
+        scope = self._checkout_scope(strategy, sparse_paths)
+        repo_id = repository_id(repo_url)
+        previous = self.db.get_repository(repo_id)
+        
+        stored_paths = self.db.get_file_paths(prefix=f"{repo_path}{os.sep}")
+        
+        result = None
+        if (not reload and head_commit and previous and previous.get('last_commit') and stored_paths
+                and previous.get('scope', '') == scope):
+            result = self.ingest_incremental(repo_path, previous['last_commit'], head_commit, paths, source,
+                                             reporter)
+        
+        if result is None:
+            # Drop files stored before the graph was partitioned by repository
+            partitioned = set(self.db.get_file_paths(repo_id=repo_id))
+            self.db.delete_files_subgraph(path for path in stored_paths if path not in partitioned)
+            if self.streaming:
+                self.db.delete_repository_subgraph(repo_id)
+                result = self.ingest_streaming(repo_path, source, paths, reporter)
+            else:
+                # Swap the old subgraph for the new one in one transaction
+                result = self.ingest_full(repo_path, source, paths, reporter, replace=bool(partitioned))
+        
+        if result.status == "success" and head_commit:
+            self.db.upsert_repository(repo_id, repo_url, repo_name_from_url(repo_url), head_commit, scope)
+        if result.status == "success" and self.layout:
+            # Keep the stored positions of unchanged files unless the graph was rebuilt on request
+            reporter.stage("layout")
+            layout_repository(self.db, repo_id, incremental=not reload)
+        if result.status == "success" and self.aggregate:
+            # Aggregates sit at the mean position of their nodes, so run after the layout
+            reporter.stage("aggregating")
+            aggregate_repository(self.db, repo_id)
+        reporter.stage("done")
+        return result
+    
+    def ingest_full(self, repo_path: Path, source: Optional[GitBlobSource] = None,
+                    paths: Optional[List[str]] = None, reporter: Optional[ProgressReporter] = None,
+                    replace: bool = False) -> JobStatus:
+        """
+        Parse every supported file of a repository, then store the result.
+        
+        Nodes are stored under the repository id repo_path.name, which is the
+        checkout directory name (see repo_cache.repository_id).
+        
+        Args:
+            repo_path: Path to cloned repository
+            source: Read files from git objects instead of the working tree at repo_path
+            paths: Only ingest files under these repository paths (with source)
+            reporter: Progress of parsing and writing
+            replace: Atomically replace the repository's stored subgraph instead of adding to it
+            
+        Returns:
+            JobStatus with results
+        """
+        reporter = reporter or ProgressReporter()
         try:
             # Step 2: Parse repository
-            files, classes, functions, edges, errors = self.parse_repository(repo_path)
-            
-            files_processed = len(self.get_supported_files(repo_path))
+            reporter.stage("parsing")
+            cache_stats = CacheStats()
+            if source is None:
+                file_paths = self.get_supported_files(repo_path)
+                reporter.discovered(len(file_paths), finished=True)
+                files, classes, functions, edges, errors = self.parse_files(file_paths, reporter=reporter,
+                                                                            cache_stats=cache_stats)
+                files_processed = len(file_paths)
+            else:
+                entries = source.list_files(paths, include=self.is_supported_path)
+                reporter.discovered(len(entries), finished=True)
+                files, classes, functions, edges, errors = self.parse_sources(source.iter_sources(entries),
+                                                                              reporter=reporter,
+                                                                              cache_stats=cache_stats)
+                files_processed = len(entries)
+            cache_hits, cache_misses = cache_stats.hits, cache_stats.misses
+            self._assign_repository(repo_path.name, files, classes, functions)
             
             # Step 3: Insert into database
-            success, db_message, nodes_inserted, edges_inserted = self.insert_into_database(
-                files, classes, functions, edges
-            )
+            reporter.stage("writing")
+            if replace:
+                nodes_inserted, edges_inserted = self.db.replace_repository_subgraph(
+                    repo_path.name, files, classes, functions, edges
+                )
+                reporter.add(nodes=nodes_inserted, edges=edges_inserted, batches=1)
+                success = True
+                db_message = f"Replaced the stored graph with {nodes_inserted} nodes and {edges_inserted} edges"
+            else:
+                success, db_message, nodes_inserted, edges_inserted = self.insert_into_database(
+                    files, classes, functions, edges, reporter
+                )
             
             if not success:
                 return JobStatus(
@@ -281,7 +838,9 @@ class IngestionService:
                     message=db_message,
                     files_processed=files_processed,
                     nodes_created=nodes_inserted,
-                    edges_created=edges_inserted
+                    edges_created=edges_inserted,
+                    cache_hits=cache_hits,
+                    cache_misses=cache_misses
                 )
             
             # Build final message
@@ -294,7 +853,9 @@ class IngestionService:
                 message=final_message,
                 files_processed=files_processed,
                 nodes_created=nodes_inserted,
-                edges_created=edges_inserted
+                edges_created=edges_inserted,
+                cache_hits=cache_hits,
+                cache_misses=cache_misses
             )
             
         except Exception as e:
@@ -305,7 +866,165 @@ class IngestionService:
                 nodes_created=0,
                 edges_created=0
             )
-        finally:
-            # Cleanup: optionally remove cloned repo
-            # For now, we keep it for debugging
-            pass
+    
+    def ingest_incremental(self, repo_path: Path, old_commit: str, new_commit: str,
+                           paths: Optional[List[str]] = None, source: Optional[GitBlobSource] = None,
+                           reporter: Optional[ProgressReporter] = None) -> Optional[JobStatus]:
+        """
+        Update the graph for files changed between two commits.
+        
+        Subgraphs of deleted, modified and renamed files are removed, then
+        added, modified and renamed files are parsed and inserted again.
+        
+        Args:
+            repo_path: Path to cloned repository, checked out at new_commit
+            old_commit: Commit the graph currently reflects
+            new_commit: Commit being ingested
+            paths: Only apply changes under these repository paths (sparse checkouts)
+            source: Read files from git objects instead of the working tree at repo_path
+            reporter: Progress of parsing and writing
+            
+        Returns:
+            JobStatus with results, or None if the change set cannot be computed
+            and a full ingest is needed
+        """
+        git_dir = source.git_dir if source else None
+        changes = self.diff_commits(repo_path, old_commit, new_commit, paths, git_dir)
+        if changes is None:
+            print(f"⚠️  Cannot diff {old_commit[:12]}..{new_commit[:12]}, falling back to full ingest")
+            return None
+        deleted, changed = changes
+        reporter = reporter or ProgressReporter()
+        
+        try:
+            if self.db.delete_files_subgraph(str(file_path) for file_path in deleted) is None:
+                return None
+            
+            reporter.stage("parsing")
+            reporter.discovered(len(changed), finished=True)
+            cache_stats = CacheStats()
+            if source is None:
+                files, classes, functions, edges, errors = self.parse_files(changed, reporter=reporter,
+                                                                            cache_stats=cache_stats)
+            else:
+                wanted = {path.relative_to(repo_path).as_posix() for path in changed}
+                entries = source.list_files(paths, include=wanted.__contains__)
+                files, classes, functions, edges, errors = self.parse_sources(source.iter_sources(entries),
+                                                                              reporter=reporter,
+                                                                              cache_stats=cache_stats)
+            cache_hits, cache_misses = cache_stats.hits, cache_stats.misses
+            self._assign_repository(repo_path.name, files, classes, functions)
+            
+            reporter.stage("writing")
+            success, db_message, nodes_inserted, edges_inserted = self.insert_into_database(
+                files, classes, functions, edges, reporter
+            )
+            if not success:
+                return JobStatus(
+                    status="error",
+                    message=db_message,
+                    files_processed=len(changed),
+                    nodes_created=nodes_inserted,
+                    edges_created=edges_inserted,
+                    cache_hits=cache_hits,
+                    cache_misses=cache_misses
+                )
+            
+            final_message = (
+                f"Incrementally updated repository from {old_commit[:12]} to {new_commit[:12]}. "
+                f"{db_message}. Re-parsed {len(changed)} files, removed {len(deleted)} file subgraphs."
+            )
+            if errors:
+                final_message += f" {len(errors)} files had parsing errors."
+            
+            return JobStatus(
+                status="success",
+                message=final_message,
+                files_processed=len(changed),
+                nodes_created=nodes_inserted,
+                edges_created=edges_inserted,
+                cache_hits=cache_hits,
+                cache_misses=cache_misses
+            )
+            
+        except Exception as e:
+            return JobStatus(
+                status="error",
+                message=f"Ingestion error: {str(e)}",
+                files_processed=0,
+                nodes_created=0,
+                edges_created=0
+            )
+    
+    def ingest_streaming(self, repo_path: Path, source: Optional[GitBlobSource] = None,
+                         paths: Optional[List[str]] = None, reporter: Optional[ProgressReporter] = None) -> JobStatus:
+        """
+        Parse and store a repository through the streaming pipeline.
+        
+        Files are written in transactions of files_per_transaction as soon as
+        they are parsed, so memory stays bounded regardless of repository size.
+        
+        Args:
+            repo_path: Path to cloned repository
+            source: Stream files from git objects instead of the working tree at repo_path
+            paths: Only ingest files under these repository paths (with source)
+            reporter: Progress of the pipeline stages
+            
+        Returns:
+            JobStatus with results
+        """
+        reporter = reporter or ProgressReporter()
+        pipeline = IngestionPipeline(
+            self.db,
+            self.parser,
+            queue_size=self.pipeline_queue_size,
+            files_per_batch=self.files_per_transaction,
+            parse_workers=self.parse_workers,
+            parse_chunk_size=self.parse_chunk_size,
+            reporter=reporter,
+            repo_id=repo_path.name
+        )
+        
+        reporter.stage("parsing")
+        try:
+            if source is None:
+                stats = pipeline.run(self.iter_supported_files(repo_path))
+            else:
+                entries = source.list_files(paths, include=self.is_supported_path)
+                stats = pipeline.run_sources(source.iter_sources(entries))
+        except Exception as e:
+            stats = pipeline.stats
+            return JobStatus(
+                status="error",
+                message=f"Ingestion error: {str(e)}",
+                files_processed=stats.files_parsed,
+                nodes_created=stats.nodes_created,
+                edges_created=stats.edges_created
+            )
+        
+        for error in stats.errors:
+            print(f"⚠️  {error}")
+        
+        final_message = (
+            f"Successfully ingested repository. Inserted {stats.nodes_created} nodes and "
+            f"{stats.edges_created} edges. Processed {stats.files_discovered} files."
+        )
+        if stats.errors:
+            final_message += f" {len(stats.errors)} files had parsing errors."
+        
+        return JobStatus(
+            status="success",
+            message=final_message,
+            files_processed=stats.files_discovered,
+            nodes_created=stats.nodes_created,
+            edges_created=stats.edges_created,
+            cache_hits=pipeline.cache_stats.hits,
+            cache_misses=pipeline.cache_stats.misses
+        )
+    
+    @staticmethod
+    def _assign_repository(repo_id: str, *node_lists: List) -> None:
+        """Mark parsed nodes as belonging to a repository"""
+        for nodes in node_lists:
+            for node in nodes:
+                node.repo_id = repo_id
@@ -0,0 +1,220 @@
+"""
+Ingestion Job Manager for Code Archaeologist
+Runs repository ingestion in the background so requests return immediately with a job id
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+from ingestion import IngestionService
+from repo_cache import normalize_repo_url
+from progress import IngestionProgress
+
+
+class Job(BaseModel):
+    """An ingestion job and its latest known state"""
+    job_id: str
+    repo_url: str
+    clone_strategy: Optional[str] = None
+    sparse_paths: List[str] = []
+    reload: bool = False  # rebuild the repository's subgraph instead of updating it
+    status: str = "queued"  # "queued" | "in_progress" | "success" | "error"
+    message: str = "Waiting for an ingestion worker"
+    files_processed: int = 0
+    nodes_created: int = 0
+    edges_created: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Optional[IngestionProgress] = None
+    version: int = 0  # incremented on every state or progress change
+    requests: int = 1  # submissions coalesced into this job
+
+
+class JobManager:
+    """
+    Queue of ingestion jobs executed by a dedicated worker pool.
+
+    Repository URLs are normalized on submission (normalize_repo_url), and
+    submissions are single-flight: while a job for the same repository URL,
+    clone strategy, sparse paths and reload flag is queued or running, further
+    submissions attach to it and get its id (and so its result) instead of
+    starting a duplicate ingest. Jobs are kept in memory; the most recent
+    max_history finished jobs stay available for polling. Readers always get
+    copies, so a job's state is never observed half-updated.
+    """
+
+    def __init__(self, ingestion_service: IngestionService, max_workers: int = 1, max_history: int = 1000):
+        """
+        Initialize the job manager.
+
+        Args:
+            ingestion_service: Service that performs the ingestion
+            max_workers: Number of jobs that run at the same time
+            max_history: Finished jobs retained for status queries
+        """
+        self.ingestion_service = ingestion_service
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[Tuple[str, str, Tuple[str, ...], bool], str] = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def submit(self, repo_url: str, clone_strategy: Optional[str] = None,
+               sparse_paths: Optional[List[str]] = None, reload: bool = False) -> Job:
+        """
+        Enqueue an ingestion job.
+
+        Args:
+            repo_url: Repository URL to ingest; the job records and ingests its normalized form
+            clone_strategy: Clone strategy passed to IngestionService.ingest_repository
+            sparse_paths: Subdirectories for the 'sparse' strategy
+            reload: Rebuild the repository's subgraph from scratch
+
+        Returns:
+            Snapshot of the queued job, or of the in-flight job it was coalesced into
+        """
+        # Normalize once, so the coalescing key, the repository lock and the
+        # repository id all derive from the same URL
+        repo_url = normalize_repo_url(repo_url)
+        clone_strategy = clone_strategy or self.ingestion_service.clone_strategy
+        key = self._request_key(repo_url, clone_strategy, sparse_paths, reload)
+
+        with self._lock:
+            in_flight = self._jobs.get(self._in_flight.get(key, ""))
+            if in_flight is not None:
+                in_flight.requests += 1
+                in_flight.version += 1
+                return in_flight.model_copy()
+
+            job = Job(
+                job_id=uuid.uuid4().hex,
+                repo_url=repo_url,
+                clone_strategy=clone_strategy,
+                sparse_paths=sparse_paths or [],
+                reload=reload,
+                created_at=time.time()
+            )
+            self._jobs[job.job_id] = job
+            self._in_flight[key] = job.job_id
+            snapshot = job.model_copy()
+
+        self._executor.submit(self._run, job.job_id)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Look up a job.
+
+        Args:
+            job_id: Id returned by submit
+
+        Returns:
+            Snapshot of the job, or None if unknown (or expired from history)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """
+        Block until a job has finished.
+
+        Args:
+            job_id: Id returned by submit
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            Snapshot of the job (still running if the timeout expired), or None if unknown
+        """
+        with self._finished:
+            self._finished.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].finished_at is not None,
+                timeout=timeout
+            )
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def list_jobs(self) -> List[Job]:
+        """
+        List known jobs, newest first.
+
+        Returns:
+            Snapshots of all jobs still in memory
+        """
+        with self._lock:
+            jobs = [job.model_copy() for job in self._jobs.values()]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting jobs and release the worker pool.
+
+        Args:
+            wait: Block until running and queued jobs have finished
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _run(self, job_id: str):
+        """Worker: run one job and record its outcome"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status = "in_progress"
+            job.message = "Ingesting repository"
+            job.started_at = time.time()
+            job.version += 1
+
+        def on_progress(progress: IngestionProgress):
+            with self._lock:
+                job.progress = progress
+                job.version += 1
+
+        try:
+            result = self.ingestion_service.ingest_repository(
+                job.repo_url, job.clone_strategy, job.sparse_paths, progress=on_progress, reload=job.reload
+            )
+            update = {
+                "status": result.status,
+                "message": result.message,
+                "files_processed": result.files_processed,
+                "nodes_created": result.nodes_created,
+                "edges_created": result.edges_created,
+                "cache_hits": result.cache_hits,
+                "cache_misses": result.cache_misses,
+            }
+        except Exception as e:
+            update = {"status": "error", "message": f"Ingestion error: {str(e)}"}
+
+        with self._lock:
+            for field, value in update.items():
+                setattr(job, field, value)
+            job.finished_at = time.time()
+            job.version += 1
+            self._in_flight.pop(self._request_key(job.repo_url, job.clone_strategy, job.sparse_paths, job.reload), None)
+            self._prune()
+            self._finished.notify_all()
+
+        if job.status == "success":
+            print(f"✓ Ingestion job {job_id} finished: {job.message}")
+        else:
+            print(f"⚠️  Ingestion job {job_id} failed: {job.message}")
+
+    def _request_key(self, repo_url: str, clone_strategy: Optional[str], sparse_paths: Optional[List[str]],
+                     reload: bool = False) -> Tuple[str, str, Tuple[str, ...], bool]:
+        """Identify submissions that would produce the same ingest"""
+        paths = tuple(sorted(path.strip('/') for path in sparse_paths or []))
+        return repo_url, clone_strategy or "", paths, reload
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond max_history (caller holds the lock)"""
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        excess = len(finished) - self.max_history
+        if excess > 0:
+            for job in sorted(finished, key=lambda job: job.finished_at)[:excess]:
+                del self._jobs[job.job_id]
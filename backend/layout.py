@@ -0,0 +1,483 @@
+"""
+Graph Layout Engine for Code Archaeologist
+Places nodes on the canvas: a layered tree per file, with files arranged by a force simulation over CALLS
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from database import KuzuDB
+
+# Size of a node on the canvas and the gaps around it, in canvas units
+NODE_WIDTH = 160.0
+NODE_HEIGHT = 60.0
+SIBLING_GAP = 40.0
+LAYER_GAP = 90.0
+
+# Children of one node wrap onto a new row once the row is ROW_ASPECT times
+# wider than the square of the same area, but not before MIN_ROW_WIDTH
+ROW_ASPECT = 1.5
+MIN_ROW_WIDTH = 4 * NODE_WIDTH + 3 * SIBLING_GAP
+
+# Minimum gap kept between the bounding boxes of two file blocks
+BLOCK_GAP = 120.0
+
+# Relationships that form the containment trees, in increasing precedence:
+# a method reached by both CONTAINS_FUNCTION and DEFINES hangs under its class
+TREE_RELATIONS = ("CONTAINS_CLASS", "CONTAINS_FUNCTION", "DEFINES")
+
+# Force simulation of the blocks
+FORCE_ITERATIONS = 200
+INCREMENTAL_ITERATIONS = 40  # when only new blocks move
+GRAVITY = 0.05  # pull towards the centroid, keeps unconnected blocks close
+BARNES_HUT_THETA = 0.8  # cell size / distance below which a quadtree cell is one mass
+MAX_TREE_DEPTH = 9
+
+# Packing of the simulated layout
+TARGET_DENSITY = 0.5  # share of the layout's disc covered by blocks
+OVERLAP_PASSES = 100
+OVERLAP_SLACK = 1.0  # canvas units boxes are pushed past touching
+OVERLAP_GROWTH = 1.02  # scale-up per sweep that still found overlaps
+PLACED_MOBILITY = 0.05  # share of an overlap push taken by a block placed in an earlier layout
+
+
+def barnes_hut_repulsion(points: np.ndarray, masses: np.ndarray, theta: float = BARNES_HUT_THETA,
+                         max_depth: int = MAX_TREE_DEPTH) -> np.ndarray:
+    """
+    Approximate the inverse-distance repulsion on every point from all others.
+
+    The quadtree is stored as one dense grid per level (cell mass and center
+    of mass from np.bincount). All points walk it together: at each level a
+    cell is accepted as a single mass when its size is below theta times its
+    distance, otherwise its non-empty children are visited at the next level.
+    Cells at the finest level are always accepted, minus the point itself.
+
+    Args:
+        points: (n, 2) positions
+        masses: (n,) weights
+        theta: Opening criterion; smaller is more accurate and slower
+        max_depth: Maximum number of subdivisions
+
+    Returns:
+        (n, 2) sum over other points j of masses[j] * (p - p_j) / |p - p_j|^2
+    """
+    n = len(points)
+    force = np.zeros((n, 2))
+    if n < 2:
+        return force
+
+    lower = points.min(axis=0)
+    extent = float((points.max(axis=0) - lower).max()) or 1.0
+    depth = int(min(max_depth, max(1, math.ceil(math.log2(n) / 2) + 1)))
+    side = 1 << depth
+    finest = np.minimum(((points - lower) / extent * side).astype(np.int64), side - 1)
+
+    levels = []
+    for level in range(depth + 1):
+        coords = finest >> (depth - level)
+        ids = (coords[:, 0] << level) + coords[:, 1]
+        cells = 1 << (2 * level)
+        mass = np.bincount(ids, weights=masses, minlength=cells)
+        center = np.stack([np.bincount(ids, weights=masses * points[:, axis], minlength=cells)
+                           for axis in range(2)], axis=1)
+        occupied = mass > 0
+        center[occupied] /= mass[occupied, None]
+        levels.append((ids, mass, center))
+
+    bodies = np.arange(n)
+    cells = np.zeros(n, dtype=np.int64)
+    for level, (ids, mass, center) in enumerate(levels):
+        own = ids[bodies] == cells
+        if level == depth:
+            own_mass = np.where(own, masses[bodies], 0.0)
+            others = mass[cells] - own_mass
+            keep = others > 1e-12
+            others_center = (mass[cells, None] * center[cells] - own_mass[:, None] * points[bodies])
+            others_center = others_center[keep] / others[keep, None]
+            _accumulate(force, bodies[keep], points[bodies[keep]] - others_center, others[keep])
+            break
+
+        delta = points[bodies] - center[cells]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        accept = ~own & (extent / (1 << level) < theta * distance)
+        _accumulate(force, bodies[accept], delta[accept], mass[cells[accept]])
+
+        # Open the remaining cells
+        bodies, cells = bodies[~accept], cells[~accept]
+        x, y = cells >> level, cells & ((1 << level) - 1)
+        bodies = np.tile(bodies, 4)
+        cells = np.concatenate([((2 * x + dx) << (level + 1)) + 2 * y + dy for dx in (0, 1) for dy in (0, 1)])
+        occupied = levels[level + 1][1][cells] > 0
+        bodies, cells = bodies[occupied], cells[occupied]
+
+    return force
+
+
+def _accumulate(force: np.ndarray, bodies: np.ndarray, delta: np.ndarray, mass: np.ndarray):
+    """Add mass * delta / |delta|^2 to the force of each body"""
+    distance2 = np.maximum((delta ** 2).sum(axis=1), 1e-9)
+    scale = mass / distance2
+    for axis in range(2):
+        force[:, axis] += np.bincount(bodies, weights=delta[:, axis] * scale, minlength=len(force))
+
+
+def force_layout(positions: np.ndarray, masses: np.ndarray, edges: np.ndarray, weights: np.ndarray,
+                 distance: float, iterations: int = FORCE_ITERATIONS,
+                 temperature: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Fruchterman-Reingold force simulation with Barnes-Hut repulsion.
+
+    Args:
+        positions: (n, 2) starting positions
+        masses: (n,) repulsion weights
+        edges: (m, 2) index pairs pulled together
+        weights: (m,) attraction weights
+        distance: Ideal distance between two connected unit masses
+        iterations: Simulation steps; the step limit cools linearly to zero
+        temperature: (n,) initial step limit per point (defaults to distance * sqrt(n) / 10)
+
+    Returns:
+        (n, 2) final positions
+    """
+    positions = positions.astype(float).copy()
+    n = len(positions)
+    if n < 2 or iterations < 1:
+        return positions
+    if temperature is None:
+        temperature = np.full(n, distance * math.sqrt(n) / 10)
+
+    source, target = edges[:, 0], edges[:, 1]
+    for step in range(iterations):
+        displacement = distance ** 2 * barnes_hut_repulsion(positions, masses)
+
+        delta = positions[source] - positions[target]
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        pull = delta * (weights * length / distance)[:, None]
+        for axis in range(2):
+            displacement[:, axis] -= np.bincount(source, weights=pull[:, axis], minlength=n)
+            displacement[:, axis] += np.bincount(target, weights=pull[:, axis], minlength=n)
+
+        displacement -= GRAVITY * distance * masses[:, None] * (positions - positions.mean(axis=0))
+
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 1e-9)
+        limit = temperature * (1 - step / iterations)
+        positions += displacement * (np.minimum(length, limit) / length)[:, None]
+    return positions
+
+
+def overlapping_pairs(centers: np.ndarray, half: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find all pairs of overlapping boxes with a sort-and-sweep along x.
+
+    Args:
+        centers: (n, 2) box centers
+        half: (n, 2) half widths and heights
+
+    Returns:
+        Index arrays (a, b) of the overlapping pairs
+    """
+    n = len(centers)
+    left = centers[:, 0] - half[:, 0]
+    order = np.argsort(left, kind="stable")
+    # Boxes starting before a box's right edge (and after its left edge) overlap it along x
+    end = np.searchsorted(left[order], centers[order, 0] + half[order, 0], side="left")
+    counts = np.maximum(end - np.arange(n) - 1, 0)
+    first = np.repeat(np.arange(n), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    a, b = order[first], order[first + 1 + offsets]
+    overlap_y = np.abs(centers[a, 1] - centers[b, 1]) < half[a, 1] + half[b, 1]
+    return a[overlap_y], b[overlap_y]
+
+
+def fit_density(centers: np.ndarray, sizes: np.ndarray, density: float = TARGET_DENSITY) -> np.ndarray:
+    """
+    Scale a layout about its centroid so its blocks cover a given share of the canvas.
+
+    Uniform scaling keeps the arrangement found by the force simulation while
+    fixing how loosely it is packed, which depends on the graph; the
+    remaining local collisions are left to remove_overlaps.
+
+    Args:
+        centers: (n, 2) block centers
+        sizes: (n, 2) block widths and heights
+        density: Target share of the disc around the layout covered by blocks and their gaps
+
+    Returns:
+        (n, 2) scaled centers
+    """
+    middle = centers.mean(axis=0)
+    spread = math.sqrt(((centers - middle) ** 2).sum(axis=1).mean())
+    if spread == 0:
+        return centers
+    area = ((sizes[:, 0] + BLOCK_GAP) * (sizes[:, 1] + BLOCK_GAP)).sum()
+    # A uniformly filled disc of radius R has an RMS distance from its center of R / sqrt(2)
+    radius = math.sqrt(area / (math.pi * density))
+    return middle + (centers - middle) * (radius / math.sqrt(2) / spread)
+
+
+def remove_overlaps(centers: np.ndarray, sizes: np.ndarray, mobility: Optional[np.ndarray] = None,
+                    grow: bool = True, gap: float = BLOCK_GAP, passes: int = OVERLAP_PASSES) -> np.ndarray:
+    """
+    Push overlapping boxes apart along the axis of least overlap.
+
+    Candidate pairs are found vectorized; each pair is then resolved in turn
+    against the already adjusted centers, which settles where summing all
+    pushes at once would oscillate.
+
+    Args:
+        centers: (n, 2) box centers
+        sizes: (n, 2) box widths and heights
+        mobility: (n,) relative share of a push each box takes (defaults to equal shares)
+        grow: Scale the layout up by OVERLAP_GROWTH whenever a sweep leaves
+            overlaps, so crowded regions clear quickly
+        gap: Clearance kept between boxes
+        passes: Maximum number of sweeps
+
+    Returns:
+        (n, 2) adjusted centers
+    """
+    half = sizes / 2 + gap / 2
+    mobility = np.ones(len(centers)) if mobility is None else mobility
+    # Pairs are resolved one by one, on plain floats to avoid per-element numpy overhead
+    xy, extents, shares = centers.tolist(), half.tolist(), mobility.tolist()
+    for _ in range(passes):
+        pairs = overlapping_pairs(np.array(xy), half)
+        if not len(pairs[0]):
+            break
+        for a, b in zip(pairs[0].tolist(), pairs[1].tolist()):
+            pa, pb = xy[a], xy[b]
+            overlaps = [extents[a][axis] + extents[b][axis] - abs(pb[axis] - pa[axis]) for axis in (0, 1)]
+            if overlaps[0] <= 0 or overlaps[1] <= 0:
+                continue
+            axis = 0 if overlaps[0] < overlaps[1] else 1
+            # Push a little past touching, so neighbours nudging the pair back
+            # by a rounding error do not make it overlap again; coincident
+            # centers are separated in index order
+            push = (overlaps[axis] + OVERLAP_SLACK) * (1.0 if pb[axis] >= pa[axis] else -1.0)
+            share = shares[b] / (shares[a] + shares[b])
+            pa[axis] -= push * (1 - share)
+            pb[axis] += push * share
+        if grow:
+            points = np.array(xy)
+            middle = points.mean(axis=0)
+            xy = (middle + (points - middle) * OVERLAP_GROWTH).tolist()
+    return np.array(xy)
+
+
+def tree_layout(root: str, children: Dict[str, List[str]]) -> Tuple[Dict[str, Tuple[float, float]], float, float]:
+    """
+    Layered layout of one containment tree.
+
+    Each level sits LAYER_GAP below its parent; siblings are packed left to
+    right, wrapping onto further rows so that blocks stay roughly square
+    (see ROW_ASPECT), and every parent
+    is centered above its children.
+
+    Args:
+        root: Id of the tree's root
+        children: Child ids per node id, in display order
+
+    Returns:
+        Top-left corner of every node relative to the tree's bounding box,
+        and the box's width and height
+    """
+    order, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(children.get(node, ()))
+
+    boxes: Dict[str, Tuple[float, float, List[Tuple[str, float, float]]]] = {}
+    for node in reversed(order):
+        kids = children.get(node, [])
+        if not kids:
+            boxes[node] = (NODE_WIDTH, NODE_HEIGHT, [])
+            continue
+
+        area = sum((boxes[kid][0] + SIBLING_GAP) * (boxes[kid][1] + LAYER_GAP) for kid in kids)
+        max_width = max(MIN_ROW_WIDTH, ROW_ASPECT * math.sqrt(area))
+        rows: List[List[str]] = [[]]
+        row_width = 0.0
+        for kid in kids:
+            extra = boxes[kid][0] + (SIBLING_GAP if rows[-1] else 0.0)
+            if rows[-1] and row_width + extra > max_width:
+                rows.append([])
+                row_width, extra = 0.0, boxes[kid][0]
+            rows[-1].append(kid)
+            row_width += extra
+
+        widths = [sum(boxes[kid][0] for kid in row) + SIBLING_GAP * (len(row) - 1) for row in rows]
+        width = max(NODE_WIDTH, *widths)
+        placements = []
+        y = NODE_HEIGHT + LAYER_GAP
+        for row, row_width in zip(rows, widths):
+            x = (width - row_width) / 2
+            for kid in row:
+                placements.append((kid, x, y))
+                x += boxes[kid][0] + SIBLING_GAP
+            y += max(boxes[kid][1] for kid in row) + LAYER_GAP
+        boxes[node] = (width, y - LAYER_GAP, placements)
+
+    positions = {}
+    stack = [(root, 0.0, 0.0)]
+    while stack:
+        node, left, top = stack.pop()
+        width, _, placements = boxes[node]
+        positions[node] = (left + (width - NODE_WIDTH) / 2, top)
+        stack.extend((kid, left + x, top + y) for kid, x, y in placements)
+    return positions, boxes[root][0], boxes[root][1]
+
+
+def compute_layout(nodes: Iterable[str], edges: Iterable[Tuple[str, str, str]],
+                   previous: Optional[Dict[str, Tuple[float, float]]] = None) -> Dict[str, Tuple[float, float]]:
+    """
+    Lay out a repository graph.
+
+    Every node without a containment parent (normally a file) becomes the
+    root of a block laid out by tree_layout. Blocks are then positioned by
+    force_layout, attracted to each other by the CALLS edges between them,
+    and finally pushed apart until their bounding boxes no longer overlap.
+
+    With previous positions the layout is incremental: blocks that were
+    placed before start where they were and may only move a little, while
+    new blocks start next to the blocks they call or are called by.
+
+    Args:
+        nodes: Node ids, in display order
+        edges: (relation, source id, target id) per relationship
+        previous: Earlier positions per node id
+
+    Returns:
+        Top-left canvas position per node id
+    """
+    nodes = list(nodes)
+    parent: Dict[str, str] = {}
+    parent_rank: Dict[str, int] = {}
+    calls = []
+    for relation, source, target in edges:
+        if relation in TREE_RELATIONS:
+            rank = TREE_RELATIONS.index(relation)
+            if rank >= parent_rank.get(target, -1):
+                parent[target], parent_rank[target] = source, rank
+        elif relation == "CALLS":
+            calls.append((source, target))
+
+    known = set(nodes)
+    children: Dict[str, List[str]] = {}
+    roots = []
+    for node in nodes:
+        if parent.get(node) in known:
+            children.setdefault(parent[node], []).append(node)
+        else:
+            roots.append(node)
+    if not roots:
+        return {}
+
+    block_of, local, sizes = {}, [], []
+    for index, root in enumerate(roots):
+        positions, width, height = tree_layout(root, children)
+        for node, (x, y) in positions.items():
+            block_of[node] = index
+            positions[node] = (x - width / 2, y - height / 2)
+        local.append(positions)
+        sizes.append((width, height))
+    sizes = np.array(sizes)
+
+    pairs = np.array([(block_of[a], block_of[b]) for a, b in calls
+                      if a in block_of and b in block_of and block_of[a] != block_of[b]], dtype=np.int64)
+    if len(pairs):
+        pairs.sort(axis=1)
+        pairs, counts = np.unique(pairs, axis=0, return_counts=True)
+        # Damp heavy call bundles so busy files do not collapse onto each other
+        weights = np.log1p(counts)
+    else:
+        pairs, weights = np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+
+    area = sizes[:, 0] * sizes[:, 1]
+    masses = area / area.mean()
+    distance = float(np.hypot(sizes[:, 0], sizes[:, 1]).mean())
+
+    centers, placed = _initial_centers(roots, local, pairs, distance, previous or {})
+    if placed.any():
+        # Only new blocks move; placed ones just make room for them below
+        temperature = np.where(placed, 0.0, distance)
+        centers = force_layout(centers, masses, pairs, weights, distance, INCREMENTAL_ITERATIONS, temperature)
+    else:
+        centers = force_layout(centers, masses, pairs, weights, distance)
+        centers = fit_density(centers, sizes)
+    centers = remove_overlaps(centers, sizes, np.where(placed, PLACED_MOBILITY, 1.0), grow=not placed.any())
+
+    return {
+        node: (float(centers[index][0] + x), float(centers[index][1] + y))
+        for index, positions in enumerate(local)
+        for node, (x, y) in positions.items()
+    }
+
+
+def _initial_centers(roots: List[str], local: List[Dict[str, Tuple[float, float]]], pairs: np.ndarray,
+                     distance: float, previous: Dict[str, Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Starting block centers: previous positions where known, a sunflower spiral otherwise.
+
+    Returns:
+        (n, 2) centers and a mask of the blocks that were placed before
+    """
+    n = len(roots)
+    centers = np.zeros((n, 2))
+    placed = np.zeros(n, dtype=bool)
+    for index, root in enumerate(roots):
+        if root in previous:
+            centers[index] = np.subtract(previous[root], local[index][root])
+            placed[index] = True
+
+    # Golden-angle spiral, continued outside the already placed blocks
+    offset = placed.sum()
+    angle = np.arange(n - offset) * math.pi * (3 - math.sqrt(5))
+    radius = distance * np.sqrt(np.arange(offset, n) + 0.5)
+    spiral = np.stack([radius * np.cos(angle), radius * np.sin(angle)], axis=1)
+    if placed.any():
+        spiral += centers[placed].mean(axis=0)
+    centers[~placed] = spiral
+
+    # New blocks connected to placed ones start beside them
+    if placed.any() and len(pairs):
+        for a, b in ((0, 1), (1, 0)):
+            links = pairs[placed[pairs[:, a]] & ~placed[pairs[:, b]]]
+            if len(links):
+                targets = links[:, b]
+                total = np.zeros((n, 2))
+                for axis in range(2):
+                    total[:, axis] = np.bincount(targets, weights=centers[links[:, a], axis], minlength=n)
+                count = np.bincount(targets, minlength=n)
+                near = np.nonzero(count > 0)[0]
+                # Spread blocks that share a neighbour around it instead of stacking them
+                spread = np.stack([np.cos(near), np.sin(near)], axis=1) * distance
+                centers[near] = total[near] / count[near, None] + spread
+    return centers, placed
+
+
+def layout_repository(db: KuzuDB, repo_id: str, incremental: bool = True) -> Optional[int]:
+    """
+    Compute and store the canvas positions of a repository's nodes.
+
+    Args:
+        db: Database holding the repository's subgraph
+        repo_id: Repository id
+        incremental: Start from the stored positions so the layout stays stable
+
+    Returns:
+        Number of positioned nodes, or None if the layout failed
+    """
+    try:
+        nodes = [node["id"] for node in db.iter_nodes(repo_id=repo_id)]
+        edges = [(edge["relation"], edge["source"], edge["target"]) for edge in db.iter_edges(repo_id=repo_id)]
+        previous = db.get_positions(repo_id) if incremental else None
+        positions = compute_layout(nodes, edges, previous)
+        if not db.save_positions(repo_id, positions):
+            return None
+        print(f"✓ Laid out {len(positions)} nodes of repository {repo_id}")
+        return len(positions)
+    except Exception as e:
+        print(f"⚠️  Layout of repository {repo_id} failed: {e}")
+        return None
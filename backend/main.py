@@ -1,16 +1,27 @@
 """
 Code Archaeologist - Main FastAPI Application
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Literal, Tuple
 import asyncio
+import json
+from functools import partial
+from itertools import islice
+import os
+import time
 from pathlib import Path
 
-from database import KuzuDB
+from database import KuzuDB, KuzuConfig, REL_TABLES
+from graph_index import GraphIndexCache, Viewport, grid_position, parse_viewport, LABEL_ORDER
+from aggregate import expand_aggregate, level_of
 from parser import TreeSitterParser
+from parse_cache import ParseCache
 from ingestion import IngestionService, JobStatus as IngestionJobStatus
+from jobs import JobManager, Job
+from progress import IngestionProgress
 from rag_service import RAGService
 
 from contextlib import asynccontextmanager
@@ -19,19 +30,39 @@ from contextlib import asynccontextmanager
 db: Optional[KuzuDB] = None
 parser: Optional[TreeSitterParser] = None
 ingestion_service: Optional[IngestionService] = None
+job_manager: Optional[JobManager] = None
 rag_service: Optional[RAGService] = None
+graph_indexes: Optional[GraphIndexCache] = None
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """Read a boolean environment variable (1/true/yes/on), or default if it is unset"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown"""
-    global db, parser, ingestion_service, rag_service
+    global db, parser, ingestion_service, job_manager, rag_service, graph_indexes
     
     # Startup
     db_path = Path("./data/code_graph")
-    db = KuzuDB(str(db_path))
-    parser = TreeSitterParser()
-    ingestion_service = IngestionService(db, parser, "./repos")
+    db = KuzuDB(str(db_path), config=KuzuConfig.from_env())
+    graph_indexes = GraphIndexCache(db)
+    parser = TreeSitterParser(cache=ParseCache("./data/parse_cache"))
+    ingestion_service = IngestionService(
+        db, parser, "./repos",
+        # Stream files through the bounded pipeline unless INGEST_STREAMING is off
+        streaming=env_flag("INGEST_STREAMING", True),
+        # Parser processes per ingest; defaults to one per CPU
+        parse_workers=int(os.environ.get("PARSE_WORKERS") or os.cpu_count() or 1),
+        # Read files straight from the mirror's git objects unless INGEST_CHECKOUT is on
+        checkout=env_flag("INGEST_CHECKOUT", False)
+    )
+    job_manager = JobManager(ingestion_service, max_workers=int(os.environ.get("INGEST_WORKERS", "1")))
     
     # Try to initialize RAG service with Ollama, fall back to mock mode if unavailable
     try:
@@ -45,6 +76,8 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    if job_manager:
+        job_manager.shutdown(wait=False)
     if db:
         db.close()
     print("✓ Services shut down successfully")
@@ -69,27 +102,48 @@ app.add_middleware(
 )
 
 
+# Seconds between job state checks of an event stream, and between keep-alive comments
+SSE_POLL_INTERVAL = 0.25
+SSE_KEEPALIVE_INTERVAL = 15.0
+
+# Nodes or edges read and encoded per chunk of the streamed /graph response
+GRAPH_BATCH_SIZE = 1000
+
+# Default and maximum nodes per page of a paginated or viewport /graph request
+GRAPH_PAGE_SIZE = 500
+GRAPH_MAX_PAGE_SIZE = 5000
+
+
 # ========== Request/Response Models ==========
 
 class IngestRequest(BaseModel):
     """Request model for repository ingestion"""
     repo_url: str
+    clone_strategy: Optional[Literal["full", "shallow", "blobless", "sparse"]] = None
+    sparse_paths: List[str] = []  # Subdirectories to ingest with the "sparse" strategy
 
 
 class JobStatus(BaseModel):
     """Status of an ingestion job"""
-    status: str  # "success" | "error" | "in_progress"
+    status: str  # "queued" | "in_progress" | "success" | "error"
     message: str
     job_id: Optional[str] = None
+    repo_url: Optional[str] = None
     files_processed: int = 0
     nodes_created: int = 0
     edges_created: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Optional[IngestionProgress] = None
 
 
 class GraphNode(BaseModel):
     """Node in the graph visualization"""
     id: str
-    type: str  # "file" | "class" | "function"
+    type: str  # "file" | "class" | "function", or "directory" for aggregates
     data: Dict
     position: Dict[str, float]
 
@@ -100,6 +154,7 @@ class GraphEdge(BaseModel):
     source: str
     target: str
     type: str  # "CONTAINS" | "DEFINES" | "CALLS"
+    count: Optional[int] = None  # relationships an aggregated edge stands for
 
 
 class GraphData(BaseModel):
@@ -108,9 +163,27 @@ class GraphData(BaseModel):
     edges: List[GraphEdge]
 
 
+class GraphPage(GraphData):
+    """One page of a filtered or viewport graph query"""
+    next_cursor: Optional[str] = None  # pass as `cursor` to fetch the next page; None on the last page
+
+
+class Repository(BaseModel):
+    """An ingested repository and the size of its subgraph"""
+    id: str
+    url: str
+    name: str
+    last_commit: str
+    scope: str = ""  # comma-separated sparse paths, "" for the whole repository
+    files: int = 0
+    classes: int = 0
+    functions: int = 0
+
+
 class ChatRequest(BaseModel):
     """Request model for chat queries"""
     prompt: str
+    repo_id: Optional[str] = None  # only query this repository
 
 
 class ChatResponse(BaseModel):
@@ -145,117 +218,546 @@ async def health():
         "database": "connected" if db else "disconnected",
         "parser": "ready" if parser else "not ready",
         "ingestion": "ready" if ingestion_service else "not ready",
-        "rag": "ready" if rag_service else "not ready"
+        "rag": "ready" if rag_service else "not ready",
+        "database_config": db.config.effective() if db else None
     }
 
 
-@app.post("/ingest", response_model=JobStatus)
+@app.post("/ingest", response_model=JobStatus, status_code=202)
 async def ingest_repository(request: IngestRequest):
     """
-    Ingest a GitHub repository into the knowledge graph.
+    Queue a GitHub repository for ingestion into the knowledge graph.
+    
+    The request is validated immediately; cloning, parsing and insertion
+    run on the job manager's workers. Poll GET /jobs/{job_id} for the result.
     
     Args:
-        request: IngestRequest with repo_url
+        request: IngestRequest with repo_url and optional clone strategy
         
     Returns:
-        JobStatus with ingestion results
+        JobStatus of the queued job
         
     Raises:
-        HTTPException: If ingestion fails
+        HTTPException: If the request is invalid
     """
     if not ingestion_service:
         raise HTTPException(status_code=500, detail="Ingestion service not initialized")
     
+    error = ingestion_service.validate_clone_request(request.repo_url, request.clone_strategy, request.sparse_paths)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
+    if not job_manager:
+        raise HTTPException(status_code=500, detail="Job manager not initialized")
+    
     try:
-        # Run ingestion in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            ingestion_service.ingest_repository,
-            request.repo_url
-        )
+        job = job_manager.submit(request.repo_url, request.clone_strategy, request.sparse_paths)
+        return to_job_status(job)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ingestion error: {str(e)}")
+
+
+@app.get("/jobs", response_model=List[JobStatus])
+async def list_jobs():
+    """
+    List ingestion jobs, newest first.
+    
+    Returns:
+        JobStatus of every job still held by the job manager
+    """
+    if not job_manager:
+        raise HTTPException(status_code=500, detail="Job manager not initialized")
+    
+    return [to_job_status(job) for job in job_manager.list_jobs()]
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """
+    Get the status of an ingestion job.
+    
+    Args:
+        job_id: Id returned by POST /ingest
         
-        # Convert IngestionJobStatus to JobStatus
-        job_status = JobStatus(
-            status=result.status,
-            message=result.message,
-            job_id=result.job_id,
-            files_processed=result.files_processed,
-            nodes_created=result.nodes_created,
-            edges_created=result.edges_created
-        )
+    Returns:
+        JobStatus with progress or results
+        
+    Raises:
+        HTTPException: If the job is unknown
+    """
+    if not job_manager:
+        raise HTTPException(status_code=500, detail="Job manager not initialized")
+    
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return to_job_status(job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream an ingestion job's progress as Server-Sent Events.
+    
+    Emits a "progress" event with the JobStatus whenever the job changes
+    and a final "done" event once it has finished, then closes the stream.
+    
+    Args:
+        job_id: Id returned by POST /ingest
         
-        if result.status == "error":
-            raise HTTPException(status_code=400, detail=result.message)
+    Returns:
+        text/event-stream response
         
-        return job_status
+    Raises:
+        HTTPException: If the job is unknown
+    """
+    if not job_manager:
+        raise HTTPException(status_code=500, detail="Job manager not initialized")
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    return StreamingResponse(
+        stream_job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def stream_job_events(job_id: str, poll_interval: float = SSE_POLL_INTERVAL):
+    """Yield SSE frames for a job until it finishes (or expires from history)"""
+    last_version = -1
+    last_sent = time.monotonic()
+    while True:
+        job = job_manager.get(job_id)
+        if job is None:
+            return
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ingestion error: {str(e)}")
+        if job.version != last_version:
+            last_version = job.version
+            last_sent = time.monotonic()
+            event = "done" if job.finished_at is not None else "progress"
+            yield f"event: {event}\ndata: {json.dumps(to_job_status(job).model_dump())}\n\n"
+            if event == "done":
+                return
+        elif time.monotonic() - last_sent > SSE_KEEPALIVE_INTERVAL:
+            # Comment frame so idle proxies keep the connection open
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        
+        await asyncio.sleep(poll_interval)
+
+
+def to_job_status(job: Job) -> JobStatus:
+    """Convert a job manager Job to the API's JobStatus"""
+    return JobStatus(
+        status=job.status,
+        message=job.message,
+        job_id=job.job_id,
+        repo_url=job.repo_url,
+        files_processed=job.files_processed,
+        nodes_created=job.nodes_created,
+        edges_created=job.edges_created,
+        cache_hits=job.cache_hits,
+        cache_misses=job.cache_misses,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        progress=job.progress
+    )
+
+
+@app.get("/repositories", response_model=List[Repository])
+async def list_repositories():
+    """
+    List ingested repositories.
+    
+    Returns:
+        Repository records with their file, class and function counts
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    
+    return [Repository(**repository) for repository in db.list_repositories()]
+
+
+@app.delete("/repositories/{repo_id}")
+async def delete_repository(repo_id: str):
+    """
+    Remove a repository's subgraph, record and checkout.
+    
+    Args:
+        repo_id: Repository id from GET /repositories
+        
+    Returns:
+        Confirmation with the deleted repository id
+        
+    Raises:
+        HTTPException: If the repository is unknown or cannot be deleted
+    """
+    if not ingestion_service:
+        raise HTTPException(status_code=500, detail="Ingestion service not initialized")
+    
+    if db.get_repository(repo_id) is None:
+        raise HTTPException(status_code=404, detail=f"Repository not found: {repo_id}")
+    
+    loop = asyncio.get_event_loop()
+    if not await loop.run_in_executor(None, ingestion_service.delete_repository, repo_id):
+        raise HTTPException(status_code=500, detail=f"Failed to delete repository: {repo_id}")
+    return {"status": "deleted", "repo_id": repo_id}
 
 
-@app.get("/graph", response_model=GraphData)
-async def get_graph():
+@app.post("/repositories/{repo_id}/reload", response_model=JobStatus, status_code=202)
+async def reload_repository(repo_id: str):
     """
-    Retrieve the complete knowledge graph for visualization.
+    Queue a full rebuild of a repository's subgraph from its latest commit.
+    
+    The new subgraph replaces the old one atomically, so queries keep seeing
+    the previous graph until the reload has finished.
     
+    Args:
+        repo_id: Repository id from GET /repositories
+        
     Returns:
-        GraphData with nodes and edges formatted for React Flow
+        JobStatus of the queued job
         
     Raises:
-        HTTPException: If graph retrieval fails
+        HTTPException: If the repository is unknown
+    """
+    if not job_manager:
+        raise HTTPException(status_code=500, detail="Job manager not initialized")
+    
+    repository = db.get_repository(repo_id)
+    if repository is None:
+        raise HTTPException(status_code=404, detail=f"Repository not found: {repo_id}")
+    
+    # Reload with the checkout scope of the last ingest
+    if repository["scope"]:
+        job = job_manager.submit(repository["url"], "sparse", repository["scope"].split(","), reload=True)
+    else:
+        job = job_manager.submit(repository["url"], reload=True)
+    return to_job_status(job)
+
+
+@app.get("/graph", responses={200: {"model": GraphPage}})
+async def get_graph(
+    repo_id: Optional[str] = None,
+    label: Optional[List[str]] = Query(None),
+    path_prefix: Optional[str] = None,
+    viewport: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=GRAPH_MAX_PAGE_SIZE),
+    level: Literal["dir", "file", "class", "function"] = "function"
+):
+    """
+    Retrieve the knowledge graph for visualization.
+    
+    Without filters, the complete GraphData JSON document is streamed in
+    chunks of GRAPH_BATCH_SIZE nodes or edges as they are read, so memory
+    per request stays bounded regardless of graph size.
+    
+    With any of label, path_prefix, viewport, cursor or limit, one page of
+    at most limit (default GRAPH_PAGE_SIZE) matching nodes is returned, in
+    a stable order, along with the cursor of the next page. Each page also
+    carries the edges leaving its nodes whose targets match the same
+    filters, so a client that fetches every page gets every matching edge
+    once.
+    
+    With a level coarser than function, the precomputed aggregated view of
+    that level is returned instead: functions collapsed into their classes
+    and files (class), everything collapsed into files (file) or into
+    directories (dir). Aggregate nodes carry the number of nodes they stand
+    for in data.size, and aggregated edges the number of relationships in
+    count. Use /graph/expand to open one aggregate.
+    
+    Args:
+        repo_id: Only return this repository's subgraph
+        label: Only return these node types (File, Class, Function; repeatable, case-insensitive)
+        path_prefix: Only return nodes of files whose path relative to the repository starts with this
+        viewport: "x0,y0,x1,y1" rectangle of the canvas; only return nodes positioned inside it
+        cursor: next_cursor of the previous page
+        limit: Maximum nodes in the page
+        level: Level of detail; cannot be combined with the filters above unless it is function
+    
+    Returns:
+        Streamed GraphData, or a GraphPage, or the GraphData of an aggregated
+        view, with nodes and edges formatted for React Flow
+        
+    Raises:
+        HTTPException: If the database is not initialized, or a filter is invalid
     """
     if not db:
         raise HTTPException(status_code=500, detail="Database not initialized")
     
+    filtered = any(value is not None for value in (label, path_prefix, viewport, cursor, limit))
+    if level != "function":
+        if filtered:
+            raise HTTPException(status_code=400, detail=f"Filters and paging are not supported at level {level}")
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, aggregate_graph, repo_id, level)
+    
+    if not filtered:
+        return StreamingResponse(stream_graph(repo_id), media_type="application/json")
+    
+    labels_by_name = {name.lower(): name for name in LABEL_ORDER}
+    try:
+        labels = [labels_by_name[name.lower()] for name in label] if label else None
+        bounds = parse_viewport(viewport) if viewport else None
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown node label: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    loop = asyncio.get_event_loop()
     try:
-        # Get all nodes and edges from database
-        all_nodes = db.get_all_nodes()
-        all_edges = db.get_all_edges()
+        return await loop.run_in_executor(
+            None,
+            partial(query_graph, repo_id, labels, path_prefix or "", bounds, cursor, limit or GRAPH_PAGE_SIZE)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def query_graph(repo_id: Optional[str], labels: Optional[List[str]], path_prefix: str,
+                viewport: Optional[Viewport], cursor: Optional[str], limit: int) -> GraphPage:
+    """
+    Build one page of a filtered graph query from the cached GraphIndex.
+    
+    The index picks the page's nodes; only their properties and outgoing
+    edges are read from the database.
+    
+    Args:
+        repo_id: Repository scope (None for the whole graph)
+        labels: Node tables to include (None for all)
+        path_prefix: Repository-relative file path prefix nodes must have
+        viewport: (x0, y0, x1, y1) rectangle nodes must be positioned in
+        cursor: Resume after the node this cursor was issued for
+        limit: Maximum nodes in the page
         
-        # Format nodes for React Flow
-        graph_nodes = []
-        for i, node in enumerate(all_nodes):
-            node_type = node.get('_label', 'unknown').lower()
-            node_id = node.get('id', f'node_{i}')
-            
-            # Calculate position (simple grid layout)
-            x = (i % 10) * 200
-            y = (i // 10) * 150
-            
-            # Create node data
-            graph_node = GraphNode(
-                id=node_id,
-                type=node_type,
-                data={
-                    "label": node.get('name', node.get('path', node_id)),
-                    **{k: v for k, v in node.items() if k not in ['_label', 'id']}
-                },
-                position={"x": x, "y": y}
-            )
-            graph_nodes.append(graph_node)
+    Returns:
+        GraphPage
         
-        # Format edges for React Flow
-        graph_edges = []
-        for i, edge in enumerate(all_edges):
-            edge_type = edge.get('_label', 'UNKNOWN')
-            source_id = edge.get('_src', f'unknown_src_{i}')
-            target_id = edge.get('_dst', f'unknown_dst_{i}')
-            
-            graph_edge = GraphEdge(
-                id=f"edge_{i}",
-                source=source_id,
-                target=target_id,
-                type=edge_type
-            )
-            graph_edges.append(graph_edge)
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    index = graph_indexes.get(repo_id)
+    selected, next_cursor = index.select(labels, path_prefix, viewport, cursor, limit)
+    
+    ids_by_label: Dict[str, List[str]] = {}
+    for position in selected:
+        ids_by_label.setdefault(index.labels[position], []).append(index.ids[position])
+    
+    properties = {}
+    edges = []
+    for node_label, ids in ids_by_label.items():
+        for node in db.get_nodes_by_id(node_label, ids):
+            properties[(node_label, node["id"])] = node
+        edges.extend(db.get_edges_from(node_label, ids))
+    
+    nodes = [
+        to_graph_node(properties[(index.labels[position], index.ids[position])], index.positions[position])
+        for position in selected
+        if (index.labels[position], index.ids[position]) in properties
+    ]
+    
+    # Keep edges whose target is part of the same query, on this page or another
+    kept = []
+    for edge in edges:
+        target = index.find(REL_TABLES[edge["relation"]][1], edge["target"])
+        if target is not None and index.matches(target, labels, path_prefix, viewport):
+            kept.append(to_graph_edge(edge))
+    
+    # All edges of a source are on its page, so numbering parallel edges here keeps their ids stable
+    kept.sort(key=lambda edge: (edge["source"], edge["id"]))
+    return GraphPage(nodes=nodes, edges=list(unique_edge_ids(kept)), next_cursor=next_cursor)
+
+
+def aggregate_graph(repo_id: Optional[str], level: str) -> GraphData:
+    """
+    Read the stored aggregated view of one level.
+    
+    Args:
+        repo_id: Repository scope (None for the whole graph)
+        level: "dir", "file" or "class"
         
-        return GraphData(nodes=graph_nodes, edges=graph_edges)
+    Returns:
+        GraphData of the level's aggregates and aggregated edges
+    """
+    return GraphData(
+        nodes=[to_aggregate_node(aggregate) for aggregate in db.get_aggregates(repo_id, level)],
+        edges=list(unique_edge_ids(to_aggregate_edge(edge) for edge in db.get_aggregate_edges(repo_id, level)))
+    )
+
+
+@app.get("/graph/expand", response_model=GraphData)
+async def expand_graph_node(node_id: str):
+    """
+    Expand one aggregate node of a /graph?level= view.
+    
+    Returns the nodes the aggregate collapses at the next finer level, with
+    the edges between them and the edges linking them to the other
+    aggregates of the aggregate's own level, so the client can swap the
+    aggregate for its children in place.
+    
+    Args:
+        node_id: Id of an aggregate node
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Graph retrieval error: {str(e)}")
+    Returns:
+        GraphData of the children and their edges
+        
+    Raises:
+        HTTPException: If node_id is not a stored aggregate
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    if level_of(node_id) is None:
+        raise HTTPException(status_code=404, detail=f"Aggregate not found: {node_id}")
+    
+    loop = asyncio.get_event_loop()
+    expanded = await loop.run_in_executor(None, expand_aggregate, db, node_id)
+    if expanded is None:
+        raise HTTPException(status_code=404, detail=f"Aggregate not found: {node_id}")
+    
+    level, children, edges = expanded
+    if level != "function":
+        nodes = [to_aggregate_node(child) for child in children]
+    else:
+        nodes = []
+        for child in children:
+            index = graph_indexes.get(child.get("repo_id") or None)
+            position = index.find(child["_label"], child["id"])
+            nodes.append(to_graph_node(child, index.positions[position] if position is not None else (0.0, 0.0)))
+    
+    return GraphData(
+        nodes=nodes,
+        edges=list(unique_edge_ids(
+            {**to_graph_edge(edge), "count": edge["relationships"]} if edge["relation"] else to_aggregate_edge(edge)
+            for edge in edges
+        ))
+    )
+
+
+def stream_graph(repo_id: Optional[str] = None, batch_size: int = GRAPH_BATCH_SIZE) -> Iterator[str]:
+    """
+    Encode the graph as a GraphData JSON document, one batch at a time.
+    
+    Runs in Starlette's thread pool; every batch is one keyset query on a
+    pooled connection. Nodes are placed at their stored layout positions
+    (see layout.layout_repository), or on the grid if they have none.
+    
+    Args:
+        repo_id: Only return this repository's subgraph
+        batch_size: Nodes or edges encoded per chunk
+        
+    Yields:
+        Consecutive pieces of the JSON document
+    """
+    nodes = db.iter_nodes(batch_size=batch_size, repo_id=repo_id)
+    edges = db.iter_edges(batch_size=batch_size, repo_id=repo_id)
+    
+    yield '{"nodes": ['
+    yield from json_array_chunks(positioned_nodes(nodes, batch_size), batch_size)
+    yield '], "edges": ['
+    yield from json_array_chunks(unique_edge_ids(to_graph_edge(edge) for edge in edges), batch_size)
+    yield ']}'
+
+
+def positioned_nodes(nodes: Iterator[Dict], batch_size: int) -> Iterator[Dict]:
+    """Format streamed nodes as GraphNode dicts, reading the stored positions of batch_size nodes at a time"""
+    index = 0
+    while True:
+        batch = list(islice(nodes, batch_size))
+        if not batch:
+            return
+        positions = db.get_positions(ids=[node["id"] for node in batch])
+        for node in batch:
+            yield to_graph_node(node, positions.get(node["id"]) or grid_position(index))
+            index += 1
+
+
+def to_graph_node(node: Dict, position: Tuple[float, float]) -> Dict:
+    """Format a node from KuzuDB.iter_nodes, placed at an (x, y) canvas position, as a GraphNode dict"""
+    properties = {k: v for k, v in node.items() if k not in ['_label', 'id']}
+    return {
+        "id": node['id'],
+        "type": node['_label'].lower(),
+        "data": {"label": properties.get('name') or properties.get('path') or node['id'], **properties},
+        "position": {"x": position[0], "y": position[1]}
+    }
+
+
+def to_graph_edge(edge: Dict) -> Dict:
+    """
+    Format an edge from KuzuDB.iter_edges as a GraphEdge dict with an id that is stable across requests.
+    
+    Parallel edges (one CALLS edge per call site) share this id; pass the
+    formatted edges through unique_edge_ids to tell them apart.
+    """
+    return {
+        "id": f"{edge['relation']}:{edge['source']}->{edge['target']}",
+        "source": edge["source"],
+        "target": edge["target"],
+        "type": edge["type"]
+    }
+
+
+def to_aggregate_node(aggregate: Dict) -> Dict:
+    """Format an aggregate from KuzuDB.get_aggregates as a GraphNode dict"""
+    return {
+        "id": aggregate["id"],
+        "type": aggregate["kind"],
+        "data": {"label": aggregate["name"], "path": aggregate["path"], "level": aggregate["level"],
+                 "size": aggregate["size"], "repo_id": aggregate.get("repo_id")},
+        "position": {"x": aggregate["x"], "y": aggregate["y"]}
+    }
+
+
+def to_aggregate_edge(edge: Dict) -> Dict:
+    """Format an aggregated edge, carrying the number of relationships it stands for, as a GraphEdge dict"""
+    return {
+        "id": f"{edge['type']}:{edge['source']}->{edge['target']}",
+        "source": edge["source"],
+        "target": edge["target"],
+        "type": edge["type"],
+        "count": edge["relationships"]
+    }
+
+
+def unique_edge_ids(edges: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Suffix the ids of parallel edges with their occurrence: "#1", "#2", ...
+    
+    Parallel edges are indistinguishable, so the numbering is stable as long
+    as the edges arrive grouped by source, as KuzuDB.iter_edges orders them.
+    
+    Args:
+        edges: GraphEdge dicts, grouped by source
+        
+    Yields:
+        The same dicts, with unique ids
+    """
+    source, seen = None, {}
+    for edge in edges:
+        if edge["source"] != source:
+            source, seen = edge["source"], {}
+        occurrence = seen.get(edge["id"], 0)
+        seen[edge["id"]] = occurrence + 1
+        if occurrence:
+            edge["id"] = f"{edge['id']}#{occurrence}"
+        yield edge
+
+
+def json_array_chunks(items: Iterable[Dict], batch_size: int) -> Iterator[str]:
+    """Encode items as the comma-separated body of a JSON array, batch_size items per chunk"""
+    batch = []
+    separator = ""
+    for item in items:
+        batch.append(json.dumps(item))
+        if len(batch) >= batch_size:
+            yield separator + ",".join(batch)
+            batch = []
+            separator = ","
+    if batch:
+        yield separator + ",".join(batch)
 
 
 @app.post("/chat", response_model=ChatResponse)
@@ -264,7 +766,7 @@ async def chat(request: ChatRequest):
     Process a natural language query about the codebase using RAG.
     
     Args:
-        request: ChatRequest with prompt
+        request: ChatRequest with prompt and optional repository
         
     Returns:
         ChatResponse with response text and referenced node IDs
@@ -280,8 +782,7 @@ async def chat(request: ChatRequest):
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
             None,
-            rag_service.process_query,
-            request.prompt
+            partial(rag_service.process_query, request.prompt, repo_id=request.repo_id)
         )
         
         return ChatResponse(
@@ -0,0 +1,229 @@
+"""
+Parse Result Cache for Code Archaeologist
+Content-addressed on-disk cache of extracted entities, so unchanged files skip tree-sitter
+"""
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import List, Tuple, Optional
+from pydantic import BaseModel
+
+from database import FileNode, ClassNode, FunctionNode, Edge
+
+
+ParseResult = Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge]]
+
+# Edge endpoint reference to the file node itself (entities are referenced by index)
+_FILE_REF = -1
+
+
+class CacheStats(BaseModel):
+    """Hits and misses of the lookups made on behalf of one caller, e.g. one ingestion job"""
+    hits: int = 0
+    misses: int = 0
+
+    def add(self, hits: int, misses: int):
+        """Add counts reported elsewhere, e.g. by a parse pool worker"""
+        self.hits += hits
+        self.misses += misses
+
+
+class ParseCache:
+    """
+    Persistent cache of parse results keyed by (sha256(content), language, parser version).
+
+    Records are path independent: classes and functions are stored by field
+    value, edges by the index of their endpoints, and ids are rebuilt for the
+    requesting path on load. This lets forks and vendored copies of a file
+    share one entry. Entries are marshalled tuples compressed with zlib.
+    Least recently used entries (by mtime, refreshed on every hit) are evicted
+    once the cache grows past max_bytes. The cache is shared by concurrent
+    jobs, so it keeps no hit counters of its own: callers pass a CacheStats
+    to get.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding cache entries
+            max_bytes: Disk budget; least recently used entries are evicted beyond it
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+
+    def key(self, source_code: bytes, language: str, parser_version: str) -> str:
+        """Build the cache key for a file's content"""
+        digest = hashlib.sha256(source_code)
+        digest.update(f"\0{language}\0{parser_version}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, file_path: Path, stats: Optional[CacheStats] = None) -> Optional[ParseResult]:
+        """
+        Load a cached result, rebuilding its ids for file_path.
+
+        Args:
+            key: Key from ParseCache.key
+            file_path: Path of the file being parsed
+            stats: Counts the lookup as a hit or a miss
+
+        Returns:
+            Tuple of (file_nodes, class_nodes, function_nodes, edges), or None on a miss
+        """
+        entry = self._entry_path(key)
+        try:
+            with open(entry, 'rb') as f:
+                record = marshal.loads(zlib.decompress(f.read()))
+            result = self._decode(record, file_path)
+            os.utime(entry)  # mark as recently used
+        except FileNotFoundError:
+            if stats is not None:
+                stats.misses += 1
+            return None
+        except Exception as e:
+            print(f"⚠️  Discarding corrupt parse cache entry {key}: {e}")
+            self._remove(entry)
+            if stats is not None:
+                stats.misses += 1
+            return None
+
+        if stats is not None:
+            stats.hits += 1
+        return result
+
+    def put(self, key: str, result: ParseResult):
+        """Store a parse result, evicting old entries if over budget"""
+        data = zlib.compress(marshal.dumps(self._encode(result)))
+        entry = self._entry_path(key)
+        entry.parent.mkdir(exist_ok=True)
+
+        try:
+            # Write then rename so concurrent readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, entry)
+        except OSError as e:
+            print(f"⚠️  Could not write parse cache entry {key}: {e}")
+            return
+
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_bytes: Optional[int] = None):
+        """
+        Remove least recently used entries until the cache fits.
+
+        Args:
+            target_bytes: Size to shrink to (defaults to 90% of max_bytes)
+        """
+        target_bytes = int(self.max_bytes * 0.9) if target_bytes is None else target_bytes
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if self._size <= target_bytes:
+                break
+            self._remove(entry)
+            self._size -= size
+
+    def size(self) -> int:
+        """Approximate bytes used by cache entries"""
+        return self._size
+
+    def _entries(self):
+        """Iterate over all entry files"""
+        return self.cache_dir.glob('*/*.bin')
+
+    def _entry_path(self, key: str) -> Path:
+        """Entries are sharded by the first two hex digits of their key"""
+        return self.cache_dir / key[:2] / f"{key}.bin"
+
+    def _remove(self, entry: Path):
+        """Delete an entry, ignoring one that is already gone"""
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+
+    # ========== Record Encoding ==========
+
+    def _encode(self, result: ParseResult) -> tuple:
+        """Convert a parse result into a path-independent tuple record"""
+        files, classes, functions, edges = result
+        language = files[0].language if files else ''
+
+        refs = {file_node.id: _FILE_REF for file_node in files}
+        refs.update((cls.id, i) for i, cls in enumerate(classes))
+        refs.update((func.id, len(classes) + i) for i, func in enumerate(functions))
+
+        return (
+            language,
+            tuple((cls.name, cls.start_line, cls.end_line) for cls in classes),
+            tuple(
+                (func.name, func.args, func.docstring, func.start_line, func.end_line)
+                for func in functions
+            ),
+            tuple(
+                (edge.edge_type, refs[edge.source], refs[edge.target])
+                for edge in edges
+                if edge.source in refs and edge.target in refs
+            ),
+        )
+
+    def _decode(self, record: tuple, file_path: Path) -> ParseResult:
+        """Rebuild models from a record, deriving ids from file_path like the parser does"""
+        language, class_rows, function_rows, edge_rows = record
+        path_str = str(file_path)
+        file_id = f"file:{file_path}"
+
+        files = [FileNode(id=file_id, path=path_str, language=language)] if language else []
+        classes = [
+            ClassNode(
+                id=f"class:{file_path}:{name}:{start_line - 1}",
+                name=name,
+                start_line=start_line,
+                end_line=end_line,
+                file_path=path_str
+            )
+            for name, start_line, end_line in class_rows
+        ]
+        functions = [
+            FunctionNode(
+                id=f"func:{file_path}:{name}:{start_line - 1}",
+                name=name,
+                args=args,
+                docstring=docstring,
+                start_line=start_line,
+                end_line=end_line,
+                file_path=path_str
+            )
+            for name, args, docstring, start_line, end_line in function_rows
+        ]
+
+        ids = [cls.id for cls in classes] + [func.id for func in functions]
+        edges = []
+        for edge_type, source_ref, target_ref in edge_rows:
+            source = file_id if source_ref == _FILE_REF else ids[source_ref]
+            target = file_id if target_ref == _FILE_REF else ids[target_ref]
+            edges.append(Edge(
+                id=f"{source}->{edge_type}->{target}",
+                source=source,
+                target=target,
+                edge_type=edge_type
+            ))
+
+        return files, classes, functions, edges
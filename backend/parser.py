@@ -8,13 +8,38 @@ from tree_sitter import Language, Parser, Node, Tree
 import tree_sitter_python as tspython
 import tree_sitter_javascript as tsjavascript
 from database import FileNode, ClassNode, FunctionNode, Edge
+from parse_cache import CacheStats, ParseCache
+
+# Bump whenever extraction output changes, so stale parse cache entries are ignored
+PARSER_VERSION = "3"
+
+
+# AST node types extracted as classes and functions by TreeSitterParser.extract_all
+CLASS_TYPES = {
+    'python': {'class_definition'},
+    'javascript': {'class_declaration'},
+}
+FUNCTION_TYPES = {
+    'python': {'function_definition'},
+    'javascript': {'function_declaration', 'method_definition'},
+}
+
+# Wrapper nodes that keep a definition top-level (decorators, ES module exports)
+TOP_LEVEL_WRAPPERS = {'decorated_definition', 'export_statement'}
 
 
 class TreeSitterParser:
     """Parser for extracting code structure using tree-sitter."""
     
-    def __init__(self):
-        """Initialize parsers for Python and JavaScript."""
+    def __init__(self, cache: Optional[ParseCache] = None):
+        """
+        Initialize parsers for Python and JavaScript.
+        
+        Args:
+            cache: Optional ParseCache consulted before parsing file contents
+        """
+        self.cache = cache
+        
         # Initialize Python parser
         self.python_lang = Language(tspython.language(), 'python')
         self.python_parser = Parser()
@@ -38,22 +63,55 @@ class TreeSitterParser:
             return 'javascript'
         return None
     
-    def parse_file(self, file_path: Path) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge]]:
+    def parse_file(self, file_path: Path, cache_stats: Optional[CacheStats] = None
+                   ) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge]]:
         """
         Parse a single file and extract all nodes and edges.
         
+        Args:
+            file_path: File to read and parse
+            cache_stats: Counts the parse cache lookup
+            
         Returns:
             Tuple of (file_nodes, class_nodes, function_nodes, edges)
         """
-        language = self.detect_language(file_path)
-        if not language:
+        if not self.detect_language(file_path):
             return [], [], [], []
         
         try:
             # Read file content
             with open(file_path, 'rb') as f:
                 source_code = f.read()
+        except Exception as e:
+            print(f"Error parsing {file_path}: {e}")
+            return [], [], [], []
+        
+        return self.parse_source(source_code, file_path, cache_stats)
+    
+    def parse_source(self, source_code: bytes, file_path: Path, cache_stats: Optional[CacheStats] = None
+                     ) -> Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge]]:
+        """
+        Parse already-read source code and extract all nodes and edges.
+        
+        Args:
+            source_code: Raw file contents
+            file_path: Path the source was read from (used for ids and language detection)
+            cache_stats: Counts the parse cache lookup
             
+        Returns:
+            Tuple of (file_nodes, class_nodes, function_nodes, edges)
+        """
+        language = self.detect_language(file_path)
+        if not language:
+            return [], [], [], []
+        
+        if self.cache is not None:
+            cache_key = self.cache.key(source_code, language, PARSER_VERSION)
+            cached = self.cache.get(cache_key, file_path, cache_stats)
+            if cached is not None:
+                return cached
+        
+        try:
             # Parse based on language
             if language == 'python':
                 tree = self.python_parser.parse(source_code)
@@ -68,140 +126,185 @@ class TreeSitterParser:
                 language=language
             )
             
-            # Extract entities
-            classes = self.extract_classes(tree, file_path, language)
-            functions = self.extract_functions(tree, file_path, language)
-            edges = self.extract_edges(tree, file_path, language, classes, functions)
+            # Extract entities and relationships in one pass over the AST
+            classes, functions, edges = self.extract_all(tree, file_path, language)
             
-            return [file_node], classes, functions, edges
+            result = [file_node], classes, functions, edges
+            if self.cache is not None:
+                self.cache.put(cache_key, result)
+            return result
             
         except Exception as e:
             print(f"Error parsing {file_path}: {e}")
             return [], [], [], []
-
-    def extract_classes(self, tree: Tree, file_path: Path, language: str) -> List[ClassNode]:
-        """Extract class definitions from AST."""
+    
+    def extract_all(self, tree: Tree, file_path: Path, language: str
+                    ) -> Tuple[List[ClassNode], List[FunctionNode], List[Edge]]:
+        """
+        Extract classes, functions and all edges in a single walk of the AST.
+        
+        A scope stack of enclosing classes and functions is kept during the
+        walk; every entry records the innermost class and function at that
+        point, so each call site is attributed to its innermost enclosing
+        function and each method to its innermost enclosing class with one
+        lookup, however deeply scopes nest.
+        
+        Returns:
+            Tuple of (class_nodes, function_nodes, edges)
+        """
         classes = []
+        functions = []
+        file_id = f"file:{file_path}"
+        path_str = str(file_path)
         
         if language == 'python':
-            query_str = "(class_definition name: (identifier) @class_name) @class_def"
+            class_types = CLASS_TYPES['python']
+            function_types = FUNCTION_TYPES['python']
+            call_type, name_types = 'call', {'identifier'}
         else:  # javascript
-            query_str = "(class_declaration name: (identifier) @class_name) @class_def"
+            class_types = CLASS_TYPES['javascript']
+            function_types = FUNCTION_TYPES['javascript']
+            call_type, name_types = 'call_expression', {'identifier', 'property_identifier'}
         
-        try:
-            lang = self.python_lang if language == 'python' else self.js_lang
-            query = lang.query(query_str)
-            captures = query.captures(tree.root_node)
+        contains_class = []
+        contains_function = []
+        defines = {}  # class id -> [function ids], in class order
+        call_sites = []  # (caller function, callee name)
+        
+        # Entries are (depth, innermost class, innermost function); popped once the walk leaves their subtree
+        scopes = []
+        cursor = tree.walk()
+        depth = 0
+        
+        while True:
+            node = cursor.node
+            while scopes and scopes[-1][0] >= depth:
+                scopes.pop()
             
-            # Group captures by class definition
-            class_defs = {}
-            for node, capture_name in captures:
-                if capture_name == 'class_def':
-                    class_defs[node.id] = {'node': node}
-                elif capture_name == 'class_name':
-                    # Find parent class_def
-                    parent = node.parent
-                    while parent and parent.type not in ['class_definition', 'class_declaration']:
-                        parent = parent.parent
-                    if parent and parent.id in class_defs:
-                        class_defs[parent.id]['name'] = node.text.decode('utf-8')
+            node_type = node.type
+            if node_type in class_types:
+                class_node = self._class_from_node(node, file_path, path_str)
+                if class_node:
+                    classes.append(class_node)
+                    if self._is_top_level_node(node, depth):
+                        contains_class.append(class_node.id)
+                    defines[class_node.id] = []
+                    scopes.append((depth, class_node, scopes[-1][2] if scopes else None))
+            
+            elif node_type in function_types:
+                func_node = self._function_from_node(node, file_path, path_str, language, name_types)
+                if func_node:
+                    functions.append(func_node)
+                    if self._is_top_level_node(node, depth):
+                        contains_function.append(func_node.id)
+                    enclosing_class = scopes[-1][1] if scopes else None
+                    if enclosing_class:
+                        defines[enclosing_class.id].append(func_node.id)
+                    scopes.append((depth, enclosing_class, func_node))
+            
+            elif node_type == call_type:
+                callee = node.child_by_field_name('function')
+                caller = scopes[-1][2] if scopes else None
+                if caller and callee is not None and callee.type == 'identifier':
+                    call_sites.append((caller, callee.text.decode('utf-8')))
             
-            # Create ClassNode objects
-            for class_id, class_data in class_defs.items():
-                if 'name' in class_data:
-                    node = class_data['node']
-                    class_name = class_data['name']
-                    
-                    class_node = ClassNode(
-                        id=f"class:{file_path}:{class_name}:{node.start_point[0]}",
-                        name=class_name,
-                        start_line=node.start_point[0] + 1,  # Convert to 1-indexed
-                        end_line=node.end_point[0] + 1,
-                        file_path=str(file_path)
+            # Advance to the next node in pre-order
+            if cursor.goto_first_child():
+                depth += 1
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return classes, functions, self._build_edges(
+                        file_id, contains_class, contains_function, defines, call_sites, functions
                     )
-                    classes.append(class_node)
-        
-        except Exception as e:
-            print(f"Error extracting classes from {file_path}: {e}")
-        
-        return classes
+                depth -= 1
     
-    def extract_functions(self, tree: Tree, file_path: Path, language: str) -> List[FunctionNode]:
-        """Extract function definitions from AST."""
-        functions = []
+    def _class_from_node(self, node: Node, file_path: Path, path_str: str) -> Optional[ClassNode]:
+        """Build a ClassNode from a class definition node, or None if it has no name."""
+        name_node = node.child_by_field_name('name')
+        if name_node is None or name_node.type != 'identifier':
+            return None
+        class_name = name_node.text.decode('utf-8')
+        return ClassNode(
+            id=f"class:{file_path}:{class_name}:{node.start_point[0]}",
+            name=class_name,
+            start_line=node.start_point[0] + 1,  # Convert to 1-indexed
+            end_line=node.end_point[0] + 1,
+            file_path=path_str
+        )
+    
+    def _function_from_node(self, node: Node, file_path: Path, path_str: str,
+                            language: str, name_types: set) -> Optional[FunctionNode]:
+        """Build a FunctionNode from a function definition node, or None if it is incomplete."""
+        name_node = node.child_by_field_name('name')
+        params_node = node.child_by_field_name('parameters')
+        if name_node is None or name_node.type not in name_types or params_node is None:
+            return None
         
+        docstring = ''
         if language == 'python':
-            # Query for function definitions
-            query_str = """
-            (function_definition
-                name: (identifier) @func_name
-                parameters: (parameters) @params
-                body: (block) @body) @func_def
-            """
-        else:  # javascript
-            # Query for various function types in JavaScript
-            query_str = """
-            [
-                (function_declaration
-                    name: (identifier) @func_name
-                    parameters: (formal_parameters) @params) @func_def
-                (method_definition
-                    name: (property_identifier) @func_name
-                    parameters: (formal_parameters) @params) @func_def
-            ]
-            """
+            body_node = node.child_by_field_name('body')
+            if body_node is None:
+                return None
+            docstring = self._extract_docstring(body_node, language)
         
-        try:
-            lang = self.python_lang if language == 'python' else self.js_lang
-            query = lang.query(query_str)
-            captures = query.captures(tree.root_node)
-            
-            # Group captures by function definition
-            func_defs = {}
-            for node, capture_name in captures:
-                if capture_name == 'func_def':
-                    func_defs[node.id] = {'node': node, 'params': '', 'docstring': ''}
-                elif capture_name == 'func_name':
-                    # Find parent function
-                    parent = node.parent
-                    while parent and parent.type not in ['function_definition', 'function_declaration', 'method_definition']:
-                        parent = parent.parent
-                    if parent and parent.id in func_defs:
-                        func_defs[parent.id]['name'] = node.text.decode('utf-8')
-                elif capture_name == 'params':
-                    parent = node.parent
-                    while parent and parent.type not in ['function_definition', 'function_declaration', 'method_definition']:
-                        parent = parent.parent
-                    if parent and parent.id in func_defs:
-                        func_defs[parent.id]['params'] = node.text.decode('utf-8')
-                elif capture_name == 'body':
-                    parent = node.parent
-                    if parent and parent.id in func_defs:
-                        # Try to extract docstring (first string in body)
-                        docstring = self._extract_docstring(node, language)
-                        func_defs[parent.id]['docstring'] = docstring
-            
-            # Create FunctionNode objects
-            for func_id, func_data in func_defs.items():
-                if 'name' in func_data:
-                    node = func_data['node']
-                    func_name = func_data['name']
-                    
-                    function_node = FunctionNode(
-                        id=f"func:{file_path}:{func_name}:{node.start_point[0]}",
-                        name=func_name,
-                        args=func_data['params'],
-                        docstring=func_data['docstring'],
-                        start_line=node.start_point[0] + 1,
-                        end_line=node.end_point[0] + 1,
-                        file_path=str(file_path)
-                    )
-                    functions.append(function_node)
-        
-        except Exception as e:
-            print(f"Error extracting functions from {file_path}: {e}")
+        func_name = name_node.text.decode('utf-8')
+        return FunctionNode(
+            id=f"func:{file_path}:{func_name}:{node.start_point[0]}",
+            name=func_name,
+            args=params_node.text.decode('utf-8'),
+            docstring=docstring,
+            start_line=node.start_point[0] + 1,
+            end_line=node.end_point[0] + 1,
+            file_path=path_str
+        )
+    
+    def _is_top_level_node(self, node: Node, depth: int) -> bool:
+        """Check if a definition sits directly in the module, possibly behind a decorator or export."""
+        if depth == 1:
+            return True
+        return depth == 2 and node.parent.type in TOP_LEVEL_WRAPPERS
+    
+    def _build_edges(self, file_id: str, contains_class: List[str], contains_function: List[str],
+                     defines: Dict[str, List[str]], call_sites: List[Tuple[FunctionNode, str]],
+                     functions: List[FunctionNode]) -> List[Edge]:
+        """Turn relationships collected by extract_all into Edge objects."""
+        edges = []
+        for class_id in contains_class:
+            edges.append(Edge(
+                id=f"{file_id}->CONTAINS_CLASS->{class_id}",
+                source=file_id,
+                target=class_id,
+                edge_type="CONTAINS_CLASS"
+            ))
+        for func_id in contains_function:
+            edges.append(Edge(
+                id=f"{file_id}->CONTAINS_FUNCTION->{func_id}",
+                source=file_id,
+                target=func_id,
+                edge_type="CONTAINS_FUNCTION"
+            ))
+        for class_id, func_ids in defines.items():
+            for func_id in func_ids:
+                edges.append(Edge(
+                    id=f"{class_id}->DEFINES->{func_id}",
+                    source=class_id,
+                    target=func_id,
+                    edge_type="DEFINES"
+                ))
         
-        return functions
+        # Callees may be defined after the call site, so resolve names once all functions are known
+        func_by_name = {func.name: func for func in functions}
+        for caller, callee_name in call_sites:
+            callee = func_by_name.get(callee_name)
+            if callee and callee.id != caller.id:
+                edges.append(Edge(
+                    id=f"{caller.id}->CALLS->{callee.id}",
+                    source=caller.id,
+                    target=callee.id,
+                    edge_type="CALLS"
+                ))
+        return edges
     
     def _extract_docstring(self, body_node: Node, language: str) -> str:
         """Extract docstring from function body."""
@@ -223,155 +326,3 @@ class TreeSitterParser:
         except:
             pass
         return ''
-
-    def extract_edges(self, tree: Tree, file_path: Path, language: str, 
-                     classes: List[ClassNode], functions: List[FunctionNode]) -> List[Edge]:
-        """Extract relationships (CONTAINS, DEFINES, CALLS) from AST."""
-        edges = []
-        file_id = f"file:{file_path}"
-        
-        # Create lookup maps
-        class_map = {cls.name: cls for cls in classes}
-        func_map = {func.name: func for func in functions}
-        
-        # 1. CONTAINS edges: File -> Classes and File -> Functions (top-level only)
-        edges.extend(self._extract_contains_edges(tree, file_id, classes, functions, language))
-        
-        # 2. DEFINES edges: Class -> Methods
-        edges.extend(self._extract_defines_edges(tree, classes, functions, language))
-        
-        # 3. CALLS edges: Function -> Function
-        edges.extend(self._extract_calls_edges(tree, functions, language))
-        
-        return edges
-    
-    def _extract_contains_edges(self, tree: Tree, file_id: str, 
-                                classes: List[ClassNode], 
-                                functions: List[FunctionNode],
-                                language: str) -> List[Edge]:
-        """Extract CONTAINS relationships (File -> Class/Function)."""
-        edges = []
-        
-        # Get top-level nodes (direct children of module/program)
-        root = tree.root_node
-        
-        # Find which classes and functions are top-level
-        for cls in classes:
-            # Check if class is at top level
-            if self._is_top_level(root, cls.start_line - 1, language):
-                edge = Edge(
-                    id=f"{file_id}->CONTAINS_CLASS->{cls.id}",
-                    source=file_id,
-                    target=cls.id,
-                    edge_type="CONTAINS_CLASS"
-                )
-                edges.append(edge)
-        
-        for func in functions:
-            # Check if function is at top level (not inside a class)
-            if self._is_top_level(root, func.start_line - 1, language):
-                edge = Edge(
-                    id=f"{file_id}->CONTAINS_FUNCTION->{func.id}",
-                    source=file_id,
-                    target=func.id,
-                    edge_type="CONTAINS_FUNCTION"
-                )
-                edges.append(edge)
-        
-        return edges
-    
-    def _is_top_level(self, root: Node, line: int, language: str) -> bool:
-        """Check if a node at given line is at top level (not nested in class)."""
-        # For simplicity, check if the node is a direct child of module/program
-        # This is a heuristic - in production, we'd track the actual AST structure
-        
-        if language == 'python':
-            target_types = ['class_definition', 'function_definition']
-        else:
-            target_types = ['class_declaration', 'function_declaration', 'method_definition']
-        
-        for child in root.children:
-            if child.type in target_types and child.start_point[0] == line:
-                return True
-        
-        return False
-    
-    def _extract_defines_edges(self, tree: Tree, 
-                              classes: List[ClassNode], 
-                              functions: List[FunctionNode],
-                              language: str) -> List[Edge]:
-        """Extract DEFINES relationships (Class -> Method)."""
-        edges = []
-        
-        # For each class, find methods defined within it
-        for cls in classes:
-            for func in functions:
-                # Check if function is within class line range
-                if (func.start_line > cls.start_line and 
-                    func.end_line <= cls.end_line and
-                    func.file_path == cls.file_path):
-                    edge = Edge(
-                        id=f"{cls.id}->DEFINES->{func.id}",
-                        source=cls.id,
-                        target=func.id,
-                        edge_type="DEFINES"
-                    )
-                    edges.append(edge)
-        
-        return edges
-    
-    def _extract_calls_edges(self, tree: Tree, 
-                            functions: List[FunctionNode],
-                            language: str) -> List[Edge]:
-        """Extract CALLS relationships (Function -> Function)."""
-        edges = []
-        
-        # Build function name lookup
-        func_by_name = {}
-        for func in functions:
-            func_by_name[func.name] = func
-        
-        # Query for call expressions
-        if language == 'python':
-            query_str = "(call function: (identifier) @callee) @call_expr"
-        else:  # javascript
-            query_str = "(call_expression function: (identifier) @callee) @call_expr"
-        
-        try:
-            lang = self.python_lang if language == 'python' else self.js_lang
-            query = lang.query(query_str)
-            captures = query.captures(tree.root_node)
-            
-            # Track calls
-            calls = []
-            for node, capture_name in captures:
-                if capture_name == 'callee':
-                    callee_name = node.text.decode('utf-8')
-                    call_line = node.start_point[0] + 1
-                    calls.append((callee_name, call_line))
-            
-            # Match calls to caller functions
-            for callee_name, call_line in calls:
-                # Find which function contains this call
-                caller_func = None
-                for func in functions:
-                    if func.start_line <= call_line <= func.end_line:
-                        caller_func = func
-                        break
-                
-                # Find callee function
-                callee_func = func_by_name.get(callee_name)
-                
-                if caller_func and callee_func and caller_func.id != callee_func.id:
-                    edge = Edge(
-                        id=f"{caller_func.id}->CALLS->{callee_func.id}",
-                        source=caller_func.id,
-                        target=callee_func.id,
-                        edge_type="CALLS"
-                    )
-                    edges.append(edge)
-        
-        except Exception as e:
-            print(f"Error extracting calls: {e}")
-        
-        return edges
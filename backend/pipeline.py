@@ -0,0 +1,387 @@
+"""
+Streaming Ingestion Pipeline for Code Archaeologist
+Connects file walking, reading, parsing and database writes with bounded queues
+"""
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple, Optional, Iterable, Iterator, Any
+from pydantic import BaseModel
+
+from parser import TreeSitterParser
+from parse_cache import CacheStats, ParseCache
+from database import KuzuDB, FileNode, ClassNode, FunctionNode, Edge
+from progress import ProgressReporter
+
+
+ParseResult = Tuple[List[FileNode], List[ClassNode], List[FunctionNode], List[Edge]]
+
+
+# ========== Parser Process Pool ==========
+
+# Parser owned by each parse-pool worker process, created once by init_parse_worker
+_worker_parser: Optional[TreeSitterParser] = None
+
+
+def init_parse_worker(cache_dir: Optional[str] = None, cache_max_bytes: Optional[int] = None):
+    """Process pool initializer: build a warm parser (sharing the parent's cache directory) for this worker"""
+    global _worker_parser
+    cache = ParseCache(cache_dir, cache_max_bytes) if cache_dir else None
+    _worker_parser = TreeSitterParser(cache=cache)
+
+
+def create_parse_pool(workers: int, parser: Optional[TreeSitterParser] = None) -> ProcessPoolExecutor:
+    """Create a process pool whose workers each hold their own TreeSitterParser"""
+    cache = parser.cache if parser else None
+    initargs = (str(cache.cache_dir), cache.max_bytes) if cache else ()
+    # spawn rather than fork: the parent holds KùzuDB threads and locks
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=init_parse_worker, initargs=initargs)
+
+
+def pack_result(result: ParseResult) -> Tuple[List[Tuple[Any, ...]], ...]:
+    """Flatten parsed models to tuples of field values so they pickle compactly"""
+    return tuple([tuple(model.__dict__.values()) for model in models] for models in result)
+
+
+def unpack_result(packed: Tuple[List[Tuple[Any, ...]], ...]) -> ParseResult:
+    """Rebuild models packed by pack_result (fields were validated in the worker)"""
+    result = []
+    for model_class, rows in zip((FileNode, ClassNode, FunctionNode, Edge), packed):
+        fields = list(model_class.model_fields)
+        result.append([model_class.model_construct(**dict(zip(fields, row))) for row in rows])
+    return tuple(result)
+
+
+def parse_chunk(file_paths: List[str]) -> Tuple[List[Tuple[Optional[tuple], Optional[str]]], Tuple[int, int]]:
+    """
+    Parse a chunk of files inside a pool worker.
+    
+    Returns:
+        One (packed_result, error) pair per file in input order, and the
+        chunk's parse cache (hits, misses)
+    """
+    stats = CacheStats()
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append((pack_result(_worker_parser.parse_file(Path(file_path), stats)), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results, (stats.hits, stats.misses)
+
+
+def parse_source_chunk(sources: List[Tuple[str, bytes]]
+                       ) -> Tuple[List[Tuple[Optional[tuple], Optional[str]]], Tuple[int, int]]:
+    """
+    Parse a chunk of already-read (path, source) pairs inside a pool worker.
+    
+    Returns:
+        One (packed_result, error) pair per file in input order, and the
+        chunk's parse cache (hits, misses)
+    """
+    stats = CacheStats()
+    results = []
+    for file_path, source_code in sources:
+        try:
+            results.append((pack_result(_worker_parser.parse_source(source_code, Path(file_path), stats)), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results, (stats.hits, stats.misses)
+
+
+# ========== Streaming Pipeline ==========
+
+class PipelineStats(BaseModel):
+    """Counters collected while a pipeline runs"""
+    files_discovered: int = 0
+    files_parsed: int = 0
+    nodes_created: int = 0
+    edges_created: int = 0
+    batches_written: int = 0
+    errors: List[str] = []
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class IngestionPipeline:
+    """
+    Staged ingestion: file walker -> reader -> parser -> batched DB writer.
+    
+    The walker, reader and parser run in their own threads and hand work
+    downstream through bounded queues, so a slow database write blocks the
+    parser instead of letting parsed results pile up. Peak memory is bounded
+    by the queue sizes and one write batch, independent of repository size.
+    run_sources replaces the walker and reader with a single feeder stage for
+    contents that do not come from the filesystem.
+    """
+    
+    def __init__(self, db: KuzuDB, parser: TreeSitterParser, queue_size: int = 64,
+                 files_per_batch: int = 100, parse_workers: int = 1, parse_chunk_size: int = 64,
+                 reporter: Optional[ProgressReporter] = None, repo_id: str = ""):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            db: KuzuDB database instance
+            parser: TreeSitterParser used when parsing in-process
+            queue_size: Capacity of each inter-stage queue
+            files_per_batch: Files written per database transaction
+            parse_workers: Number of parser processes; 1 parses in the parser thread
+            parse_chunk_size: Files sent to a parser process per task
+            reporter: Receives discovered, parsed and written counts as they happen
+            repo_id: Repository the written nodes belong to
+        """
+        self.db = db
+        self.parser = parser
+        self.queue_size = queue_size
+        self.files_per_batch = files_per_batch
+        self.parse_workers = parse_workers
+        self.parse_chunk_size = parse_chunk_size
+        self.reporter = reporter or ProgressReporter()
+        self.repo_id = repo_id
+        
+        self._stop = threading.Event()
+        self._failures: List[BaseException] = []
+        self.stats = PipelineStats()
+        # Parse cache hits and misses of the last run only
+        self.cache_stats = CacheStats()
+    
+    def run(self, file_paths: Iterable[Path]) -> PipelineStats:
+        """
+        Stream files through all stages and write them to the database.
+        
+        Args:
+            file_paths: Files to ingest; consumed lazily by the walker stage
+        
+        Returns:
+            PipelineStats for the run
+        
+        Raises:
+            The first exception raised by any stage
+        """
+        path_queue = queue.Queue(maxsize=self.queue_size)
+        source_queue = queue.Queue(maxsize=self.queue_size)
+        return self._execute([
+            ("ingest-walker", self._walk, file_paths, path_queue),
+            ("ingest-reader", self._read, path_queue, source_queue),
+        ], source_queue)
+    
+    def run_sources(self, sources: Iterable[Tuple[Path, bytes]]) -> PipelineStats:
+        """
+        Stream already-loaded file contents through the parse and write stages.
+        
+        Used when contents do not come from the filesystem, e.g. blobs read
+        straight from a git object database.
+        
+        Args:
+            sources: (file_path, source_code) pairs; consumed lazily by the feeder stage
+        
+        Returns:
+            PipelineStats for the run
+        
+        Raises:
+            The first exception raised by any stage
+        """
+        source_queue = queue.Queue(maxsize=self.queue_size)
+        return self._execute([("ingest-feeder", self._feed, sources, source_queue)], source_queue)
+    
+    def _execute(self, producers: List[tuple], source_queue: queue.Queue) -> PipelineStats:
+        """Run producer stages feeding source_queue, the parser stage and the writer"""
+        self._stop.clear()
+        self._failures = []
+        self.stats = PipelineStats()
+        self.cache_stats = CacheStats()
+        
+        parsed_queue = queue.Queue(maxsize=self.queue_size)
+        
+        stages = [
+            threading.Thread(target=self._run_stage, args=(stage, *args), name=name, daemon=True)
+            for name, stage, *args in producers
+        ]
+        stages.append(threading.Thread(target=self._run_stage, args=(self._parse, source_queue, parsed_queue),
+                                       name="ingest-parser", daemon=True))
+        for stage in stages:
+            stage.start()
+        
+        try:
+            self._write(parsed_queue)
+        except BaseException as e:
+            self._failures.append(e)
+            self._stop.set()
+        finally:
+            for stage in stages:
+                stage.join()
+        
+        failures = [f for f in self._failures if not isinstance(f, PipelineStopped)]
+        if failures:
+            raise failures[0]
+        return self.stats
+    
+    def _run_stage(self, stage, *args):
+        """Run a stage thread, stopping the whole pipeline if it fails"""
+        try:
+            stage(*args)
+        except BaseException as e:
+            self._failures.append(e)
+            self._stop.set()
+    
+    def _put(self, q: queue.Queue, item: Any):
+        """Put with backpressure, giving up if the pipeline is stopping"""
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    
+    def _get(self, q: queue.Queue) -> Any:
+        """Get the next item, giving up if the pipeline is stopping"""
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+    
+    def _drain(self, q: queue.Queue) -> Iterator[Any]:
+        """Yield items from a queue until the upstream stage is done"""
+        while True:
+            item = self._get(q)
+            if item is _DONE:
+                return
+            yield item
+    
+    # ========== Stages ==========
+    
+    def _walk(self, file_paths: Iterable[Path], out: queue.Queue):
+        """Walker stage: enumerate files to ingest"""
+        for file_path in file_paths:
+            self.stats.files_discovered += 1
+            self.reporter.discovered(1)
+            self._put(out, file_path)
+        self.reporter.discovered(0, finished=True)
+        self._put(out, _DONE)
+    
+    def _read(self, paths: queue.Queue, out: queue.Queue):
+        """Reader stage: load file contents"""
+        for file_path in self._drain(paths):
+            try:
+                with open(file_path, 'rb') as f:
+                    source_code = f.read()
+            except OSError as e:
+                self.stats.errors.append(f"Error reading {file_path}: {e}")
+                continue
+            self._put(out, (file_path, source_code))
+        self._put(out, _DONE)
+    
+    def _feed(self, sources: Iterable[Tuple[Path, bytes]], out: queue.Queue):
+        """Feeder stage: pass through contents loaded elsewhere"""
+        try:
+            for file_path, source_code in sources:
+                self.stats.files_discovered += 1
+                self.reporter.discovered(1)
+                self._put(out, (file_path, source_code))
+        finally:
+            # Release the producer (e.g. a git cat-file process) even when stopping early
+            close = getattr(sources, 'close', None)
+            if close is not None:
+                close()
+        self.reporter.discovered(0, finished=True)
+        self._put(out, _DONE)
+    
+    def _parse(self, sources: queue.Queue, out: queue.Queue):
+        """Parser stage: turn file contents into nodes and edges"""
+        if self.parse_workers > 1:
+            self._parse_in_pool(sources, out)
+        else:
+            for file_path, source_code in self._drain(sources):
+                try:
+                    self._put(out, (file_path, self.parser.parse_source(source_code, file_path, self.cache_stats),
+                                    None))
+                except PipelineStopped:
+                    raise
+                except Exception as e:
+                    self._put(out, (file_path, None, str(e)))
+        self._put(out, _DONE)
+    
+    def _parse_in_pool(self, sources: queue.Queue, out: queue.Queue):
+        """Parse chunks in worker processes, keeping a bounded window of chunks in flight"""
+        in_flight = deque()
+        
+        def emit_oldest():
+            chunk_paths, future = in_flight.popleft()
+            chunk_results, cache_counts = future.result()
+            self.cache_stats.add(*cache_counts)
+            for file_path, (packed, error) in zip(chunk_paths, chunk_results):
+                result = unpack_result(packed) if error is None else None
+                self._put(out, (file_path, result, error))
+        
+        with create_parse_pool(self.parse_workers, self.parser) as executor:
+            chunk = []
+            for file_path, source_code in self._drain(sources):
+                chunk.append((file_path, source_code))
+                if len(chunk) < self.parse_chunk_size:
+                    continue
+                
+                in_flight.append(([p for p, _ in chunk], executor.submit(
+                    parse_source_chunk, [(str(p), s) for p, s in chunk]
+                )))
+                chunk = []
+                if len(in_flight) >= 2 * self.parse_workers:
+                    emit_oldest()
+            
+            if chunk:
+                in_flight.append(([p for p, _ in chunk], executor.submit(
+                    parse_source_chunk, [(str(p), s) for p, s in chunk]
+                )))
+            while in_flight:
+                emit_oldest()
+    
+    def _write(self, parsed: queue.Queue):
+        """Writer stage (caller thread): insert whole files in batched transactions"""
+        batch = ([], [], [], [])
+        batch_files = 0
+        
+        for file_path, result, error in self._drain(parsed):
+            self.reporter.add(files_parsed=1)
+            if error is not None:
+                self.stats.errors.append(f"Error parsing {file_path}: {error}")
+                continue
+            
+            self.stats.files_parsed += 1
+            for records, new_records in zip(batch, result):
+                records.extend(new_records)
+            batch_files += 1
+            
+            if batch_files >= self.files_per_batch:
+                self._flush(batch)
+                batch = ([], [], [], [])
+                batch_files = 0
+        
+        if batch_files:
+            self._flush(batch)
+    
+    def _flush(self, batch: Tuple[list, list, list, list]):
+        """Write one batch of whole files in a single transaction"""
+        for records in batch[:3]:
+            for node in records:
+                node.repo_id = self.repo_id
+        nodes_inserted, edges_inserted = self.db.insert_subgraph(*batch)
+        self.stats.nodes_created += nodes_inserted
+        self.stats.edges_created += edges_inserted
+        self.stats.batches_written += 1
+        self.reporter.add(nodes=nodes_inserted, edges=edges_inserted, batches=1)
@@ -0,0 +1,114 @@
+"""
+Ingestion Progress Reporting for Code Archaeologist
+Collects per-stage counters while a repository is ingested and emits rate-limited snapshots
+"""
+import threading
+import time
+from typing import Callable, Optional
+from pydantic import BaseModel
+
+
+class IngestionProgress(BaseModel):
+    """Snapshot of a running ingestion"""
+    stage: str  # "queued" | "cloning" | "parsing" | "writing" | "layout" | "aggregating" | "done"
+    files_discovered: int = 0
+    files_total: Optional[int] = None  # known once file discovery has finished
+    files_parsed: int = 0
+    files_per_second: float = 0.0
+    nodes_written: int = 0
+    edges_written: int = 0
+    batch: int = 0  # write transactions committed so far
+    elapsed_seconds: float = 0.0
+    eta_seconds: Optional[float] = None
+
+
+class ProgressReporter:
+    """
+    Thread-safe progress counters with a rate-limited callback.
+
+    Ingestion loops call add() for every file or batch; the callback receives
+    an IngestionProgress at most once per min_interval, plus once on every
+    stage change, so reporting never slows down the hot loops.
+    """
+
+    def __init__(self, callback: Optional[Callable[[IngestionProgress], None]] = None,
+                 min_interval: float = 0.5):
+        """
+        Initialize the reporter.
+
+        Args:
+            callback: Receives progress snapshots (None only collects counters)
+            min_interval: Minimum seconds between two callback invocations
+        """
+        self.callback = callback
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._parse_started: Optional[float] = None
+        self._last_emit = 0.0
+        self._progress = IngestionProgress(stage="queued")
+
+    def stage(self, name: str):
+        """Enter a new stage and report it immediately"""
+        with self._lock:
+            self._progress.stage = name
+            if name == "parsing" and self._parse_started is None:
+                self._parse_started = time.monotonic()
+        self.emit(force=True)
+
+    def discovered(self, count: int, finished: bool = False):
+        """
+        Record files found by discovery.
+
+        Args:
+            count: Newly discovered files
+            finished: Discovery is complete, so the total (and an ETA) is known
+        """
+        with self._lock:
+            self._progress.files_discovered += count
+            if finished:
+                self._progress.files_total = self._progress.files_discovered
+        self.emit()
+
+    def add(self, files_parsed: int = 0, nodes: int = 0, edges: int = 0, batches: int = 0):
+        """Record parsed files and written nodes, edges and batches"""
+        with self._lock:
+            if files_parsed and self._parse_started is None:
+                self._parse_started = time.monotonic()
+            self._progress.files_parsed += files_parsed
+            self._progress.nodes_written += nodes
+            self._progress.edges_written += edges
+            self._progress.batch += batches
+        self.emit()
+
+    def snapshot(self) -> IngestionProgress:
+        """Current progress with derived rate, elapsed time and ETA"""
+        with self._lock:
+            progress = self._progress.model_copy()
+            parse_started = self._parse_started
+        now = time.monotonic()
+        progress.elapsed_seconds = round(now - self._started, 3)
+
+        if parse_started is not None and progress.files_parsed:
+            # Derive the ETA from the unrounded rate: a slow job rounds to 0.0 files/s
+            rate = progress.files_parsed / max(now - parse_started, 1e-6)
+            progress.files_per_second = round(rate, 2)
+            if progress.files_total is not None and rate > 0:
+                remaining = max(progress.files_total - progress.files_parsed, 0)
+                progress.eta_seconds = round(remaining / rate, 1)
+        return progress
+
+    def emit(self, force: bool = False):
+        """Invoke the callback if forced or min_interval has passed since the last call"""
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now
+
+        try:
+            self.callback(self.snapshot())
+        except Exception as e:
+            print(f"⚠️  Progress callback failed: {e}")
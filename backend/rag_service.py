@@ -11,7 +11,65 @@ from langchain_community.graphs import KuzuGraph
 from langchain.chains import GraphCypherQAChain
 from langchain.prompts import PromptTemplate
 
-from database import KuzuDB
+from database import KuzuDB, NODE_TABLE_COLUMNS
+
+
+# MATCH / OPTIONAL MATCH pattern text, up to the next clause keyword
+_MATCH_CLAUSE = re.compile(
+    r'(\bMATCH\b)(.*?)(?=\b(?:WHERE|RETURN|WITH|OPTIONAL|MATCH|UNWIND|ORDER|SKIP|LIMIT|UNION|CREATE|MERGE|SET|DELETE|DETACH)\b|$)',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Node pattern: (variable:Label {properties}) with every part optional
+_NODE_PATTERN = re.compile(r'\(\s*(\w*)\s*((?::\s*\w+\s*)+)?\s*(?:\{(.*?)\})?\s*\)', re.DOTALL)
+
+
+def scope_to_repository(cypher: str) -> str:
+    """
+    Restrict every node a query matches to one repository.
+    
+    Adds a repo_id: $repo_id property to each node pattern of the MATCH
+    clauses, so generated queries only see the repository passed as the
+    repo_id parameter.
+    
+    Args:
+        cypher: Cypher query string
+        
+    Returns:
+        Rewritten query; run it with {"repo_id": ...} parameters
+    """
+    def scope_node(match: re.Match) -> str:
+        variable, label, properties = match.group(1), (match.group(2) or "").strip(), match.group(3)
+        if properties and re.search(r'\brepo_id\s*:', properties):
+            return match.group(0)
+        scoped = "repo_id: $repo_id" + (f", {properties.strip()}" if properties and properties.strip() else "")
+        return f"({variable}{label} {{{scoped}}})"
+    
+    def scope_clause(match: re.Match) -> str:
+        return match.group(1) + _NODE_PATTERN.sub(scope_node, match.group(2))
+    
+    return _MATCH_CLAUSE.sub(scope_clause, cypher)
+
+
+def is_node_value(value) -> bool:
+    """Check whether a result value is a whole node, as Kùzu returns for RETURN n"""
+    return isinstance(value, dict) and ('_label' in value or 'id' in value)
+
+
+def format_node(node: Dict) -> str:
+    """
+    Format a node value as "property: value" pairs.
+    
+    Internal fields (id, _label, _id and its tableID) and empty properties,
+    such as the null columns of other tables in a multi-label match, are skipped.
+    
+    Args:
+        node: Node value from a query result
+        
+    Returns:
+        Comma-separated pairs, or "" if the node has no other properties
+    """
+    return ", ".join(f"{k}: {v}" for k, v in node.items() if k != 'id' and not k.startswith('_') and v)
 
 
 class QueryResponse(BaseModel):
@@ -232,9 +290,9 @@ Relationship Types:
             elif "structure" in question_lower or "overview" in question_lower or "summary" in question_lower:
                 return "MATCH (f:File) OPTIONAL MATCH (f)-[:CONTAINS_CLASS]->(c:Class) OPTIONAL MATCH (f)-[:CONTAINS_FUNCTION]->(fn:Function) RETURN f.path, count(c) AS classes, count(fn) AS functions"
             
-            # Default: show some nodes
+            # Default: show some code nodes (not layout, aggregate or repository records)
             else:
-                return "MATCH (n) RETURN n LIMIT 20"
+                return f"MATCH (n:{':'.join(NODE_TABLE_COLUMNS)}) RETURN n LIMIT 20"
         
         try:
             prompt = self.cypher_prompt.format(
@@ -276,18 +334,21 @@ Relationship Types:
             # Retry with mock mode
             return self.generate_cypher(question)
     
-    def execute_cypher(self, cypher: str) -> Tuple[bool, List[Dict], str]:
+    def execute_cypher(self, cypher: str, parameters: Optional[Dict] = None) -> Tuple[bool, List[Dict], str]:
         """
         Execute a Cypher query against the database.
         
         Args:
             cypher: Cypher query string
+            parameters: Optional query parameters
             
         Returns:
-            Tuple of (success, results, error_message)
+            Tuple of (success, results, error_message); each result row is a
+            dict keyed by its RETURN column (e.g. "c.name")
         """
         try:
-            results = self.db.execute_cypher(cypher)
+            columns = self.db.query_columns(cypher, parameters)
+            results = [dict(zip(columns, values)) for values in zip(*columns.values())]
             return True, results, ""
         except Exception as e:
             error_msg = str(e)
@@ -321,8 +382,12 @@ Relationship Types:
                 for key, value in row.items():
                     if key == 'id' or key.endswith('.id'):
                         node_ids.append(str(value))
-                    elif isinstance(value, dict) and 'id' in value:
-                        node_ids.append(value['id'])
+                    elif is_node_value(value):
+                        if value.get('_label') in NODE_TABLE_COLUMNS:
+                            node_ids.append(value['id'])
+                    # Column values such as c.file_path, like items of list rows
+                    elif isinstance(value, str) and ('/' in value or '_' in value):
+                        node_ids.append(value)
         
         # Remove duplicates while preserving order
         seen = set()
@@ -356,21 +421,25 @@ Relationship Types:
                 for item in row:
                     if isinstance(item, dict):
                         # Format dict items nicely
-                        item_parts = []
-                        for k, v in item.items():
-                            if k not in ['id', '_label'] and v:  # Skip internal fields
-                                item_parts.append(f"{k}: {v}")
-                        if item_parts:
-                            parts.append(", ".join(item_parts))
+                        formatted = format_node(item)
+                        if formatted:
+                            parts.append(formatted)
                     else:
                         parts.append(str(item))
                 formatted_lines.append(f"{i}. {' | '.join(parts)}")
             elif isinstance(row, dict):
-                # Handle dict results
+                # Handle dict results; columns are named after their
+                # RETURN expression, so drop the variable ("c.name" -> "name")
                 parts = []
                 for k, v in row.items():
-                    if k not in ['id', '_label'] and v:  # Skip internal fields
-                        parts.append(f"{k}: {v}")
+                    field = k.split('.', 1)[-1]
+                    if is_node_value(v):
+                        # A whole node returned as one column (RETURN n)
+                        formatted = format_node(v)
+                        if formatted:
+                            parts.append(formatted)
+                    elif field not in ['id', '_label'] and v:  # Skip internal fields
+                        parts.append(f"{field}: {v}")
                 if parts:
                     formatted_lines.append(f"{i}. {', '.join(parts)}")
             else:
@@ -395,10 +464,14 @@ Relationship Types:
         question_lower = question.lower()
         count = len(results)
         
-        # Analyze what type of entities we found
-        has_files = any('path' in str(r) or 'language' in str(r) for r in results)
-        has_classes = any('class' in str(r).lower() for r in results)
-        has_functions = any('function' in str(r).lower() or 'args' in str(r) for r in results)
+        # Analyze what type of entities we found, from the values and the
+        # column names ("f.path" -> "path"; a substring test would also
+        # match "c.file_path")
+        texts = [str(list(r.values())) if isinstance(r, dict) else str(r) for r in results]
+        fields = {key.split('.', 1)[-1] for r in results if isinstance(r, dict) for key in r}
+        has_files = bool(fields & {'path', 'language'}) or any('path' in text or 'language' in text for text in texts)
+        has_classes = any('class' in text.lower() for text in texts)
+        has_functions = 'args' in fields or any('function' in text.lower() or 'args' in text for text in texts)
         
         # Build contextual response
         response_parts = []
@@ -463,13 +536,14 @@ Relationship Types:
             # Use smart fallback
             return self._generate_smart_response(question, results)
     
-    def process_query(self, question: str, max_retries: int = 2) -> QueryResponse:
+    def process_query(self, question: str, max_retries: int = 2, repo_id: Optional[str] = None) -> QueryResponse:
         """
         Process a natural language query end-to-end.
         
         Args:
             question: Natural language question
             max_retries: Maximum number of retries for invalid Cypher
+            repo_id: Only answer from this repository's subgraph
             
         Returns:
             QueryResponse with answer and node IDs
@@ -483,10 +557,13 @@ Relationship Types:
             try:
                 # Generate Cypher query
                 cypher = self.generate_cypher(question)
+                if repo_id is not None:
+                    cypher = scope_to_repository(cypher)
                 print(f"📝 Generated Cypher (attempt {attempt + 1}): {cypher}")
                 
                 # Execute query
-                success, results, error_msg = self.execute_cypher(cypher)
+                parameters = {"repo_id": repo_id} if repo_id is not None else None
+                success, results, error_msg = self.execute_cypher(cypher, parameters)
                 
                 if success:
                     break
@@ -0,0 +1,300 @@
+"""
+Git Mirror Cache for Code Archaeologist
+Keeps bare mirrors of ingested repositories so repeat ingests only fetch new objects
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+# Extra `git clone --mirror` arguments for each kind of mirror
+MIRROR_MODES = {
+    'full': [],
+    'shallow': ['--depth', '1'],
+    'blobless': ['--filter=blob:none'],
+}
+
+
+class GitMirrorCache:
+    """
+    Local cache of bare git mirrors keyed by the full repository URL.
+
+    The first request for a URL runs `git clone --mirror`; later requests run
+    `git fetch --prune` into the existing mirror. Mirrors can be full, shallow
+    (depth 1) or blobless (partial clone, blobs fetched on demand when a
+    worktree checks them out). Working trees are checked out from a mirror
+    with `git worktree`, which shares the mirror's object store instead of
+    copying it, optionally restricted by sparse-checkout patterns. Once the
+    mirrors exceed max_bytes, the least recently used ones are evicted
+    together with their worktrees; mirrors held with in_use are never evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 10 * 1024 ** 3, timeout: int = 300):
+        """
+        Initialize the mirror cache.
+
+        Args:
+            cache_dir: Directory holding the bare mirrors
+            max_bytes: Disk quota for all mirrors
+            timeout: Seconds allowed for a single clone or fetch
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # Number of holders per mirror; guarded by _lock together with eviction
+        self._in_use: Dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def mirror_path(self, repo_url: str, mode: str = 'full') -> Path:
+        """Location of the mirror of a repository URL in the given mode"""
+        digest = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+        suffix = '' if mode == 'full' else f"-{mode}"
+        return self.cache_dir / f"{digest}{suffix}.git"
+
+    def update(self, repo_url: str, mode: str = 'full') -> Path:
+        """
+        Create or refresh the mirror of a repository.
+
+        Args:
+            repo_url: Remote URL (https, ssh, file:// or a local path)
+            mode: Mirror kind, one of MIRROR_MODES
+
+        Returns:
+            Path to the bare mirror
+
+        Raises:
+            ValueError: If mode is unknown
+            RuntimeError: If git fails
+            subprocess.TimeoutExpired: If git takes longer than the timeout
+        """
+        if mode not in MIRROR_MODES:
+            raise ValueError(f"Unknown mirror mode: {mode}")
+
+        mirror = self.mirror_path(repo_url, mode)
+        if mirror.exists():
+            depth = ['--depth', '1'] if mode == 'shallow' else []
+            self._git(['--git-dir', str(mirror), 'fetch', '--prune', '--quiet'] + depth + ['origin'])
+        else:
+            # Clone next to the final location, then rename, so an interrupted
+            # clone never leaves a half-populated mirror behind
+            staging = mirror.with_name(f"{mirror.name}.tmp-{os.getpid()}")
+            shutil.rmtree(staging, ignore_errors=True)
+            try:
+                self._git(['clone', '--mirror', '--quiet'] + MIRROR_MODES[mode] + [repo_url, str(staging)])
+                os.replace(staging, mirror)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        self._touch(mirror)
+        self.evict(keep=mirror)
+        return mirror
+
+    def checkout(self, repo_url: str, dest: Path, commit: str = 'HEAD', mode: str = 'full',
+                 sparse_patterns: Optional[List[str]] = None) -> str:
+        """
+        Check out a commit of a mirrored repository as a worktree.
+
+        An existing worktree of the same mirror at dest is moved to the commit
+        in place; anything else at dest is replaced.
+
+        Args:
+            repo_url: Repository URL (must already be mirrored by update)
+            dest: Working tree directory
+            commit: Commit-ish to check out
+            mode: Mirror kind the worktree is created from
+            sparse_patterns: Non-cone sparse-checkout patterns limiting which
+                files are checked out (and, for blobless mirrors, fetched)
+
+        Returns:
+            The checked out commit SHA
+        """
+        mirror = self.mirror_path(repo_url, mode)
+        sha = self._git(['--git-dir', str(mirror), 'rev-parse', f"{commit}^{{commit}}"]).strip()
+
+        if not self._is_worktree_of(dest, mirror):
+            if dest.exists():
+                shutil.rmtree(dest)
+            self._git(['--git-dir', str(mirror), 'worktree', 'prune'])
+            self._git(['--git-dir', str(mirror), 'worktree', 'add', '--quiet', '--force', '--no-checkout',
+                       '--detach', str(dest), sha])
+
+        # Configure sparse checkout before checking out, so excluded blobs are never fetched
+        if sparse_patterns:
+            self._git(['-C', str(dest), 'sparse-checkout', 'set', '--no-cone'] + sparse_patterns)
+        elif self._is_sparse(dest):
+            self._git(['-C', str(dest), 'sparse-checkout', 'disable'])
+
+        self._git(['-C', str(dest), 'checkout', '--quiet', '--force', '--detach', sha])
+        self._git(['-C', str(dest), 'clean', '--quiet', '-fdx'])
+
+        self._touch(mirror)
+        return sha
+
+    @contextmanager
+    def in_use(self, repo_url: str, mode: str = 'full'):
+        """
+        Protect the mirror of a repository from eviction while the block runs.
+
+        Hold it for as long as the mirror is read, e.g. by worktree checkouts
+        or a GitBlobSource; holders may nest and overlap.
+
+        Args:
+            repo_url: Repository URL
+            mode: Mirror kind, as passed to update
+        """
+        mirror = self.mirror_path(repo_url, mode)
+        with self._lock:
+            self._in_use[mirror] = self._in_use.get(mirror, 0) + 1
+        try:
+            yield mirror
+        finally:
+            with self._lock:
+                self._in_use[mirror] -= 1
+                if self._in_use[mirror] == 0:
+                    del self._in_use[mirror]
+
+    def evict(self, keep: Optional[Path] = None):
+        """
+        Remove least recently used mirrors until the cache fits its quota.
+
+        Mirrors held with in_use are skipped, even if the cache stays over quota.
+
+        Args:
+            keep: Mirror that must not be evicted (the one currently in use)
+        """
+        # Hold the lock throughout, so no mirror is taken into use while it is being removed
+        with self._lock:
+            mirrors = []
+            for mirror in self.cache_dir.glob('*.git'):
+                try:
+                    mirrors.append((mirror.stat().st_mtime, self._dir_size(mirror), mirror))
+                except FileNotFoundError:
+                    continue
+
+            total = sum(size for _, size, _ in mirrors)
+            for _, size, mirror in sorted(mirrors):
+                if total <= self.max_bytes:
+                    break
+                if mirror == keep or mirror in self._in_use:
+                    continue
+                print(f"Evicting cold git mirror {mirror.name} ({size / 1024 ** 2:.1f} MB)")
+                self._remove_mirror(mirror)
+                total -= size
+
+    def size(self) -> int:
+        """Bytes used by all mirrors"""
+        return sum(self._dir_size(mirror) for mirror in self.cache_dir.glob('*.git'))
+
+    # ========== Helpers ==========
+
+    def _git(self, args: List[str]) -> str:
+        """Run git, raising RuntimeError with its stderr on failure"""
+        result = subprocess.run(
+            ['git'] + args,
+            capture_output=True,
+            text=True,
+            timeout=self.timeout
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+        return result.stdout
+
+    def _is_worktree_of(self, dest: Path, mirror: Path) -> bool:
+        """Check whether dest is a worktree created from mirror"""
+        if not (dest / '.git').is_file():
+            return False
+        result = subprocess.run(
+            ['git', '-C', str(dest), 'rev-parse', '--git-common-dir'],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            return False
+        return Path(dest, result.stdout.strip()).resolve() == mirror.resolve()
+
+    def _is_sparse(self, dest: Path) -> bool:
+        """Check whether sparse checkout is enabled in a worktree"""
+        result = subprocess.run(
+            ['git', '-C', str(dest), 'config', '--get', 'core.sparseCheckout'],
+            capture_output=True,
+            text=True
+        )
+        return result.stdout.strip() == 'true'
+
+    def _worktrees(self, mirror: Path) -> List[Path]:
+        """Working trees checked out from a mirror"""
+        try:
+            output = self._git(['--git-dir', str(mirror), 'worktree', 'list', '--porcelain'])
+        except (RuntimeError, subprocess.TimeoutExpired):
+            return []
+        paths = [Path(line[len('worktree '):]) for line in output.splitlines() if line.startswith('worktree ')]
+        return [path for path in paths if path.resolve() != mirror.resolve()]
+
+    def _remove_mirror(self, mirror: Path):
+        """Delete a mirror and the worktrees that depend on it"""
+        for worktree in self._worktrees(mirror):
+            shutil.rmtree(worktree, ignore_errors=True)
+        shutil.rmtree(mirror, ignore_errors=True)
+
+    def _touch(self, mirror: Path):
+        """Mark a mirror as recently used"""
+        now = time.time()
+        os.utime(mirror, (now, now))
+
+    def _dir_size(self, path: Path) -> int:
+        """Total size of the files under a directory"""
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except FileNotFoundError:
+                    pass
+        return total
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """
+    Canonical form of a repository URL, so equivalent spellings share one mirror, lock and repository id.
+
+    Strips surrounding whitespace and trailing slashes, lowercases the scheme
+    and host, and drops a trailing .git from hosted URLs (local paths keep it,
+    since there it names a different directory).
+
+    Args:
+        repo_url: Repository URL as submitted
+
+    Returns:
+        Normalized URL
+    """
+    url = repo_url.strip().rstrip('/')
+    parsed = urlparse(url)
+    if not parsed.netloc:
+        return url
+    if parsed.path.endswith('.git'):
+        parsed = parsed._replace(path=parsed.path[:-len('.git')].rstrip('/'))
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()).geturl()
+
+
+def repo_name_from_url(repo_url: str) -> str:
+    """Last path component of a repository URL without a .git suffix"""
+    name = repo_url.rstrip('/').rsplit('/', 1)[-1]
+    return name[:-len('.git')] if name.endswith('.git') else name
+
+
+def checkout_dir_name(repo_url: str) -> str:
+    """Working tree directory name: the repository name plus a URL hash, so same-named repositories never collide"""
+    return f"{repo_name_from_url(repo_url)}-{hashlib.sha256(repo_url.encode()).hexdigest()[:8]}"
+
+
+def repository_id(repo_url: str) -> str:
+    """Id of a repository's partition of the graph; the same as its checkout directory name"""
+    return checkout_dir_name(repo_url)
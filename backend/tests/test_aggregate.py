@@ -0,0 +1,137 @@
+"""
+Tests for the level-of-detail graph views
+"""
+from aggregate import class_owners, compute_aggregates, expand_aggregate, finer_level, level_of, merge_edges
+from database import EDGE_TYPES, REL_TABLES
+
+REPO = "/repos/r/"
+
+NODES = [
+    {"_label": "File", "id": "file_a", "path": REPO + "pkg/a.py"},
+    {"_label": "File", "id": "file_b", "path": REPO + "b.py"},
+    {"_label": "Class", "id": "cls", "name": "C", "file_path": REPO + "pkg/a.py"},
+    {"_label": "Function", "id": "method", "name": "m", "file_path": REPO + "pkg/a.py"},
+    {"_label": "Function", "id": "free", "name": "g", "file_path": REPO + "pkg/a.py"},
+    {"_label": "Function", "id": "other", "name": "h", "file_path": REPO + "b.py"},
+]
+
+EDGES = [
+    ("CONTAINS_CLASS", "file_a", "cls"),
+    ("CONTAINS_FUNCTION", "file_a", "method"),
+    ("DEFINES", "cls", "method"),
+    ("CONTAINS_FUNCTION", "file_a", "free"),
+    ("CONTAINS_FUNCTION", "file_b", "other"),
+    ("CALLS", "method", "other"),
+    ("CALLS", "free", "other"),
+    ("CALLS", "free", "method"),
+]
+
+
+def test_class_owners():
+    """Methods belong to their class, other functions to their file, by edge or by path"""
+    labels = {node["id"]: node["_label"] for node in NODES}
+    owners = class_owners(labels, EDGES)
+    assert owners == {"file_a": "file_a", "file_b": "file_b", "cls": "cls", "method": "cls",
+                      "free": "file_a", "other": "file_b"}
+
+    labels["stray"] = "Function"
+    assert class_owners(labels, EDGES, {"b.py": "file_b"}, {"stray": "b.py"})["stray"] == "file_b"
+    assert class_owners({"lonely": "Function"}, [])["lonely"] == "lonely"
+
+
+def test_compute_aggregates():
+    """Every level covers all nodes once; edges inside an aggregate vanish and parallel edges are counted"""
+    positions = {node["id"]: (float(i * 10), 0.0) for i, node in enumerate(NODES)}
+    aggregates, edges = compute_aggregates("r", NODES, EDGES, positions)
+    by_id = {aggregate["id"]: aggregate for aggregate in aggregates}
+
+    for level in ("dir", "file", "class"):
+        assert sum(a["size"] for a in aggregates if a["level"] == level) == len(NODES)
+    assert sorted(a["id"] for a in aggregates if a["level"] == "dir") == ["dir:r:.", "dir:r:pkg"]
+
+    cls = by_id["class:cls"]
+    assert (cls["kind"], cls["name"], cls["size"], cls["parent"]) == ("class", "C", 2, "file:file_a")
+    assert cls["x"] == (20.0 + 30.0) / 2
+    assert (by_id["class:file_a"]["kind"], by_id["class:file_a"]["size"]) == ("file", 2)
+    assert (by_id["file:file_a"]["name"], by_id["file:file_a"]["parent"]) == ("a.py", "dir:r:pkg")
+
+    counts = {(edge["level"], edge["type"], edge["source"], edge["target"]): edge["relationships"] for edge in edges}
+    assert counts == {
+        ("dir", "CALLS", "dir:r:pkg", "dir:r:."): 2,
+        ("file", "CALLS", "file:file_a", "file:file_b"): 2,
+        ("class", "CALLS", "class:cls", "class:file_b"): 1,
+        ("class", "CALLS", "class:file_a", "class:file_b"): 1,
+        ("class", "CALLS", "class:file_a", "class:cls"): 1,
+        ("class", "CONTAINS", "class:file_a", "class:cls"): 2,
+    }
+
+
+def test_levels_and_merge_edges():
+    """Level helpers and merging of parallel edges"""
+    assert finer_level("dir") == "file" and finer_level("class") == "function"
+    assert level_of("class:func:a.py:f:1") == "class"
+    assert level_of("func:a.py:f:1") is None
+
+    merged = merge_edges([("CALLS", "a", "b", 2, None), ("CALLS", "a", "b", 3, None), ("CALLS", "a", "a", 1, None),
+                          ("CONTAINS", "a", "b", 1, "CONTAINS_CLASS")])
+    assert merged == [
+        {"type": "CALLS", "source": "a", "target": "b", "relationships": 5, "relation": None},
+        {"type": "CONTAINS", "source": "a", "target": "b", "relationships": 1, "relation": "CONTAINS_CLASS"},
+    ]
+
+
+class FakeDB:
+    """Serves the stored graph and the aggregates compute_aggregates makes of it"""
+
+    def __init__(self, nodes, edges):
+        self.nodes = {node["id"]: node for node in nodes}
+        self.edges = [{"relation": relation, "source": source, "target": target, "type": EDGE_TYPES[relation]}
+                      for relation, source, target in edges]
+        self.aggregates, _ = compute_aggregates("r", nodes, edges)
+
+    def get_aggregates(self, ids=None, **filters):
+        return [aggregate for aggregate in self.aggregates if ids is None or aggregate["id"] in ids]
+
+    def get_nodes_by_id(self, label, ids):
+        return [self.nodes[node_id] for node_id in ids
+                if node_id in self.nodes and self.nodes[node_id]["_label"] == label]
+
+    def get_edges_from(self, label, ids):
+        return [edge for edge in self.edges if edge["source"] in ids and REL_TABLES[edge["relation"]][0] == label]
+
+    def get_edges_to(self, label, ids):
+        return [edge for edge in self.edges if edge["target"] in ids and REL_TABLES[edge["relation"]][1] == label]
+
+
+def test_expand_lifts_outside_functions_to_their_class_level_owner():
+    """Calls leaving an expanded aggregate end at the same aggregates as in the class level view"""
+    nodes = NODES + [{"_label": "File", "id": f"file:{REPO}c.py", "path": REPO + "c.py"},
+                     {"_label": "Function", "id": "stray", "name": "s", "file_path": REPO + "c.py"}]
+    edges = EDGES + [("CALLS", "method", "stray")]
+    level, children, expanded = expand_aggregate(FakeDB(nodes, edges), "class:cls")
+
+    assert level == "function"
+    assert sorted(child["id"] for child in children) == ["cls", "method"]
+    calls = [(edge["source"], edge["target"], edge["relationships"]) for edge in expanded if edge["type"] == "CALLS"]
+    # "other" is contained by file_b, "stray" has no edge and falls back to the file at its path
+    assert calls == [("class:file_a", "method", 1), ("method", f"class:file:{REPO}c.py", 1),
+                     ("method", "class:file_b", 1)]
+    assert ("DEFINES", "cls", "method") in [(edge["type"], edge["source"], edge["target"]) for edge in expanded]
+
+
+def test_expand_counts_parallel_edges():
+    """Expanded edges carry as many relationships as the precomputed aggregated edges"""
+    edges = EDGES + [("CALLS", "method", "other"), ("CALLS", "free", "method")]
+    db = FakeDB(NODES, edges)
+    _, aggregated = compute_aggregates("r", NODES, edges)
+    precomputed = {(edge["source"], edge["target"]): edge["relationships"]
+                   for edge in aggregated if edge["level"] == "class" and edge["type"] == "CALLS"}
+
+    _, _, expanded = expand_aggregate(db, "class:cls")
+    calls = {(edge["source"], edge["target"]): edge["relationships"] for edge in expanded if edge["type"] == "CALLS"}
+    assert calls == {("method", "class:file_b"): precomputed[("class:cls", "class:file_b")],
+                     ("class:file_a", "method"): precomputed[("class:file_a", "class:cls")]}
+    assert calls[("method", "class:file_b")] == 2
+    # DEFINES between two members is counted once, not once per query it comes back from
+    defines = [edge for edge in expanded if edge["type"] == "DEFINES"]
+    assert [(edge["source"], edge["target"], edge["relationships"]) for edge in defines] == [("cls", "method", 1)]
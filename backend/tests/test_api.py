@@ -4,8 +4,11 @@ Tests for FastAPI endpoints
 import pytest
 from fastapi.testclient import TestClient
 from pathlib import Path
+import json
 import tempfile
 import shutil
+import subprocess
+import time
 
 # Import app and initialize services before creating client
 import main
@@ -21,11 +24,15 @@ def client():
     from database import KuzuDB
     from parser import TreeSitterParser
     from ingestion import IngestionService
+    from jobs import JobManager
     from rag_service import RAGService
+    from graph_index import GraphIndexCache
     
     main.db = KuzuDB(str(db_path))
+    main.graph_indexes = GraphIndexCache(main.db)
     main.parser = TreeSitterParser()
-    main.ingestion_service = IngestionService(main.db, main.parser, str(temp_dir / "repos"))
+    main.ingestion_service = IngestionService(main.db, main.parser, str(temp_dir / "repos"), allow_local_repos=True)
+    main.job_manager = JobManager(main.ingestion_service)
     main.rag_service = RAGService(main.db, mock_mode=True)  # Use mock mode for testing
     
     client = TestClient(main.app)
@@ -33,6 +40,7 @@ def client():
     yield client
     
     # Cleanup
+    main.job_manager.shutdown()
     main.db.close()
     shutil.rmtree(temp_dir)
 
@@ -67,6 +75,7 @@ class TestAPIEndpoints:
         assert "parser" in data
         assert "ingestion" in data
         assert "rag" in data
+        assert data["database_config"]["pool_size"] >= 1
     
     def test_graph_endpoint_empty(self, client):
         """Test graph endpoint with empty database"""
@@ -165,3 +174,210 @@ class TestAPIEndpoints:
         assert isinstance(data["response"], str)
         assert isinstance(data["node_ids"], list)
         assert len(data["response"]) > 0
+    
+    def test_ingest_endpoint_queues_job(self, client, temp_dir):
+        """Test that ingestion runs as a background job that can be polled"""
+        remote = temp_dir / "remote"
+        remote.mkdir()
+        (remote / "app.py").write_text("def app():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        
+        response = client.post("/ingest", json={"repo_url": f"file://{remote}"})
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] in ("queued", "in_progress")
+        assert job["job_id"]
+        
+        deadline = time.time() + 30
+        while job["status"] in ("queued", "in_progress") and time.time() < deadline:
+            time.sleep(0.05)
+            job = client.get(f"/jobs/{job['job_id']}").json()
+        
+        assert job["status"] == "success", job["message"]
+        assert job["files_processed"] == 1
+        assert job["job_id"] in [listed["job_id"] for listed in client.get("/jobs").json()]
+        assert job["progress"]["stage"] == "done"
+        
+        # The event stream of a finished job ends with its final status
+        with client.stream("GET", f"/jobs/{job['job_id']}/events") as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+        assert body.startswith("event: done\ndata: ")
+        assert '"status": "success"' in body
+    
+    def test_repository_endpoints(self, client, temp_dir):
+        """Test listing, scoping, reloading and deleting an ingested repository"""
+        remote = temp_dir / "scoped"
+        remote.mkdir()
+        (remote / "scoped.py").write_text("def scoped():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        url = f"file://{remote}"
+        job = client.post("/ingest", json={"repo_url": url}).json()
+        assert main.job_manager.wait(job["job_id"], timeout=30).status == "success"
+        
+        repository = next(repo for repo in client.get("/repositories").json() if repo["url"] == url)
+        assert (repository["files"], repository["functions"]) == (1, 1)
+        graph = client.get("/graph", params={"repo_id": repository["id"]}).json()
+        assert sorted(node["type"] for node in graph["nodes"]) == ["file", "function"]
+        assert [edge["type"] for edge in graph["edges"]] == ["CONTAINS"]
+        
+        response = client.post("/chat", json={"prompt": "What functions are there?", "repo_id": repository["id"]})
+        assert response.status_code == 200
+        
+        response = client.post(f"/repositories/{repository['id']}/reload")
+        assert response.status_code == 202
+        assert main.job_manager.wait(response.json()["job_id"], timeout=30).status == "success"
+        
+        assert client.delete(f"/repositories/{repository['id']}").status_code == 200
+        assert client.get("/graph", params={"repo_id": repository["id"]}).json()["nodes"] == []
+        assert client.delete(f"/repositories/{repository['id']}").status_code == 404
+        assert client.post(f"/repositories/{repository['id']}/reload").status_code == 404
+    
+    def test_graph_is_streamed_in_batches(self, client, temp_dir):
+        """Test that the chunked graph document is valid JSON matching the full graph"""
+        remote = temp_dir / "streamed"
+        remote.mkdir()
+        (remote / "calls.py").write_text("def a():\n    b()\n\ndef b():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        job = client.post("/ingest", json={"repo_url": f"file://{remote}"}).json()
+        assert main.job_manager.wait(job["job_id"], timeout=30).status == "success"
+        
+        chunks = list(main.stream_graph(batch_size=1))
+        graph = json.loads("".join(chunks))
+        assert len(chunks) == len(graph["nodes"]) + len(graph["edges"]) + 3
+        assert graph == client.get("/graph").json()
+        assert {"a", "b"} <= {node["data"]["label"] for node in graph["nodes"]}
+    
+    def test_graph_pages_and_viewport(self, client, temp_dir):
+        """Test that cursor pages cover the streamed graph and filters narrow it"""
+        remote = temp_dir / "paged"
+        (remote / "pkg").mkdir(parents=True)
+        (remote / "pkg" / "calls.py").write_text("class C:\n    def m(self):\n        f()\n\ndef f():\n    g()\n\ndef g():\n    pass\n")
+        (remote / "top.py").write_text("def h():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        url = f"file://{remote}"
+        job = client.post("/ingest", json={"repo_url": url}).json()
+        assert main.job_manager.wait(job["job_id"], timeout=30).status == "success"
+        repo_id = next(repo["id"] for repo in client.get("/repositories").json() if repo["url"] == url)
+        full = client.get("/graph", params={"repo_id": repo_id}).json()
+        
+        nodes, edges, cursor = [], [], None
+        while True:
+            params = {"repo_id": repo_id, "limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/graph", params=params).json()
+            assert len(page["nodes"]) <= 2
+            nodes += page["nodes"]
+            edges += page["edges"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert nodes == full["nodes"]
+        assert sorted(edge["id"] for edge in edges) == sorted(edge["id"] for edge in full["edges"])
+        
+        functions = client.get("/graph", params={"repo_id": repo_id, "label": "function",
+                                                "path_prefix": "pkg/"}).json()
+        assert {node["data"]["name"] for node in functions["nodes"]} == {"m", "f", "g"}
+        assert {edge["type"] for edge in functions["edges"]} == {"CALLS"}
+        
+        first = full["nodes"][0]["position"]
+        visible = client.get("/graph", params={
+            "repo_id": repo_id, "viewport": f"{first['x']},{first['y']},{first['x'] + 1},{first['y'] + 1}"
+        }).json()
+        assert [node["id"] for node in visible["nodes"]] == [full["nodes"][0]["id"]]
+        
+        assert client.get("/graph", params={"viewport": "0,0,1"}).status_code == 400
+        assert client.get("/graph", params={"label": "Module"}).status_code == 400
+        assert client.get("/graph", params={"cursor": "bogus"}).status_code == 400
+    
+    def test_graph_levels_and_expand(self, client, temp_dir):
+        """Test that aggregated views collapse the graph and expand back down to functions"""
+        remote = temp_dir / "levels"
+        (remote / "pkg").mkdir(parents=True)
+        (remote / "pkg" / "shapes.py").write_text(
+            "class Shape:\n    def area(self):\n        return helper()\n\n"
+            "    def draw(self):\n        return helper()\n\ndef helper():\n    pass\n"
+        )
+        (remote / "main.py").write_text("def run():\n    return helper()\n\ndef helper():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        url = f"file://{remote}"
+        job = client.post("/ingest", json={"repo_url": url}).json()
+        assert main.job_manager.wait(job["job_id"], timeout=30).status == "success"
+        repo_id = next(repo["id"] for repo in client.get("/repositories").json() if repo["url"] == url)
+        
+        dirs = client.get("/graph", params={"repo_id": repo_id, "level": "dir"}).json()
+        assert sorted(node["data"]["path"] for node in dirs["nodes"]) == [".", "pkg"]
+        assert all(node["type"] == "directory" for node in dirs["nodes"])
+        assert sum(node["data"]["size"] for node in dirs["nodes"]) == len(
+            client.get("/graph", params={"repo_id": repo_id}).json()["nodes"])
+        
+        files = client.get("/graph", params={"repo_id": repo_id, "level": "file"}).json()
+        assert sorted(node["data"]["label"] for node in files["nodes"]) == ["main.py", "shapes.py"]
+        
+        classes = client.get("/graph", params={"repo_id": repo_id, "level": "class"}).json()
+        shape = next(node for node in classes["nodes"] if node["data"]["label"] == "Shape")
+        assert (shape["type"], shape["data"]["size"]) == ("class", 3)
+        calls = next(edge for edge in classes["edges"] if edge["source"] == shape["id"] and edge["type"] == "CALLS")
+        assert calls["count"] == 2
+        
+        pkg = next(node for node in dirs["nodes"] if node["data"]["path"] == "pkg")
+        expanded = client.get("/graph/expand", params={"node_id": pkg["id"]}).json()
+        assert [node["data"]["label"] for node in expanded["nodes"]] == ["shapes.py"]
+        
+        members = client.get("/graph/expand", params={"node_id": shape["id"]}).json()
+        assert sorted(node["data"]["label"] for node in members["nodes"]) == ["Shape", "area", "draw"]
+        assert {edge["type"] for edge in members["edges"]} == {"CONTAINS", "DEFINES", "CALLS"}
+        # Calls out of the class end at the aggregate of the function they reach
+        outgoing = [edge for edge in members["edges"] if edge["type"] == "CALLS"]
+        assert {edge["target"] for edge in outgoing} <= {node["id"] for node in classes["nodes"]}
+        
+        assert client.get("/graph", params={"level": "file", "limit": 10}).status_code == 400
+        assert client.get("/graph", params={"level": "module"}).status_code == 422
+        assert client.get("/graph/expand", params={"node_id": "file:missing"}).status_code == 404
+        assert client.get("/graph/expand", params={"node_id": "func:x"}).status_code == 404
+    
+    def test_parallel_edges_have_unique_ids(self, client, temp_dir):
+        """Test that every call site keeps its own edge, with an id of its own, in every view"""
+        remote = temp_dir / "parallel"
+        remote.mkdir()
+        (remote / "main.py").write_text("def helper():\n    pass\n\ndef main():\n    helper()\n    helper()\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        url = f"file://{remote}"
+        job = client.post("/ingest", json={"repo_url": url}).json()
+        assert main.job_manager.wait(job["job_id"], timeout=30).status == "success"
+        repo_id = next(repo["id"] for repo in client.get("/repositories").json() if repo["url"] == url)
+        
+        full = client.get("/graph", params={"repo_id": repo_id}).json()
+        calls = [edge["id"] for edge in full["edges"] if edge["type"] == "CALLS"]
+        assert len(calls) == 2
+        assert len({edge["id"] for edge in full["edges"]}) == len(full["edges"])
+        
+        page = client.get("/graph", params={"repo_id": repo_id, "limit": 100}).json()
+        assert sorted(edge["id"] for edge in page["edges"]) == sorted(edge["id"] for edge in full["edges"])
+    
+    def test_env_flag(self, monkeypatch):
+        """Test that boolean settings fall back to their default only when unset"""
+        monkeypatch.delenv("INGEST_STREAMING", raising=False)
+        assert main.env_flag("INGEST_STREAMING", True) is True
+        monkeypatch.setenv("INGEST_STREAMING", "off")
+        assert main.env_flag("INGEST_STREAMING", True) is False
+        monkeypatch.setenv("INGEST_STREAMING", "Yes")
+        assert main.env_flag("INGEST_STREAMING", False) is True
+    
+    def test_unknown_job(self, client):
+        """Test job lookup with an unknown id"""
+        response = client.get("/jobs/does-not-exist")
+        assert response.status_code == 404
+        assert client.get("/jobs/does-not-exist/events").status_code == 404
@@ -6,7 +6,8 @@ import pytest
 from hypothesis import given, strategies as st, settings
 from pathlib import Path
 import shutil
-from database import KuzuDB, FileNode, ClassNode, FunctionNode
+import threading
+from database import KuzuDB, KuzuConfig, ConnectionPool, FileNode, ClassNode, FunctionNode, Edge
 
 
 # Test database path
@@ -339,3 +340,302 @@ def test_calls_relationship(db):
     assert len(result) == 1
     assert result[0]['caller'] == "func_1"
     assert result[0]['callee'] == "func_2"
+
+
+def test_insert_functions_batch(db):
+    """Test batched UNWIND insertion reports per-batch counts"""
+    functions = [
+        FunctionNode(
+            id=f"func_{i}", name=f"f{i}", args="(a, b)", docstring=None if i % 2 else "doc 'quoted'",
+            start_line=i + 1, end_line=i + 3, file_path="src/main.py"
+        )
+        for i in range(5)
+    ]
+    
+    counts = db.insert_functions_batch(functions, batch_size=2)
+    assert counts == [2, 2, 1]
+    
+    result = db.execute_cypher(
+        "MATCH (f:Function {id: 'func_2'}) RETURN f.docstring, f.start_line, f.end_line"
+    )
+    assert result == [["doc 'quoted'", 3, 5]]
+    
+    # A batch with a duplicate primary key is retried row by row
+    extra = FunctionNode(id="func_new", name="g", args="", start_line=1, end_line=2, file_path="src/main.py")
+    counts = db.insert_functions_batch([functions[0], extra], batch_size=2)
+    assert counts == [1]
+    assert len(db.execute_cypher("MATCH (f:Function) RETURN f.id")) == 6
+
+
+def test_insert_edges_batch(db):
+    """Test batched UNWIND relationship creation"""
+    db.insert_files_batch([FileNode(id="file_1", path="src/main.py", language="python")])
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{i}", name=f"f{i}", args="", start_line=1, end_line=2, file_path="src/main.py")
+        for i in range(3)
+    ])
+    
+    counts = db.insert_edges_batch(
+        "CONTAINS_FUNCTION",
+        [("file_1", "func_0"), ("file_1", "func_1"), ("file_1", "missing")],
+        batch_size=10
+    )
+    assert counts == [2]  # the dangling pair is skipped
+    
+    counts = db.insert_edges_batch("CALLS", [("func_0", "func_1"), ("func_1", "func_2")])
+    assert counts == [2]
+    
+    with pytest.raises(ValueError):
+        db.insert_edges_batch("UNKNOWN", [("func_0", "func_1")])
+
+
+
+def test_bulk_load_keeps_edges_to_stored_nodes(db):
+    """Test that edges into nodes stored before the load are inserted, not dropped"""
+    helper = FunctionNode(id="func_helper", name="helper", args="", start_line=1, end_line=2, file_path="src/util.py")
+    db.insert_functions_batch([helper])
+    
+    caller = FunctionNode(id="func_main", name="main", args="", start_line=1, end_line=3, file_path="src/main.py")
+    nodes, edges = db.bulk_load(
+        [FileNode(id="file_main", path="src/main.py", language="python")], [], [caller],
+        [Edge(id="c1", source="file_main", target="func_main", edge_type="CONTAINS_FUNCTION"),
+         Edge(id="c2", source="func_main", target="func_helper", edge_type="CALLS"),
+         Edge(id="c3", source="func_main", target="func_missing", edge_type="CALLS")]
+    )
+    
+    assert (nodes, edges) == (2, 2)
+    result = db.execute_cypher("MATCH (a:Function)-[:CALLS]->(b:Function) RETURN a.id, b.id")
+    assert result == [["func_main", "func_helper"]]
+
+def test_transaction_rolls_back_on_error(db):
+    """Test that a failed explicit transaction leaves no rows behind"""
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.insert_files_batch([FileNode(id="file_1", path="a.py", language="python")])
+            raise RuntimeError("abort")
+    
+    assert db.execute_cypher("MATCH (f:File) RETURN count(f)") == [[0]]
+    
+    with db.transaction():
+        db.insert_files_batch([FileNode(id="file_1", path="a.py", language="python")])
+    assert db.execute_cypher("MATCH (f:File) RETURN count(f)") == [[1]]
+
+
+def test_delete_files_subgraph(db):
+    """Test that deleting files removes their nodes and incident edges and reports counts"""
+    db.insert_files_batch([FileNode(id=f"file_{name}", path=f"{name}.py", language="python") for name in "abc"])
+    db.insert_classes_batch([
+        ClassNode(id=f"class_{name}", name=name.upper(), start_line=1, end_line=5, file_path=f"{name}.py")
+        for name in "ab"
+    ])
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{name}", name=name, args="", start_line=2, end_line=3, file_path=f"{name}.py")
+        for name in "abc"
+    ])
+    db.insert_edges_batch("CONTAINS_CLASS", [("file_a", "class_a"), ("file_b", "class_b")])
+    db.insert_edges_batch("DEFINES", [("class_a", "func_a"), ("class_b", "func_b")])
+    db.insert_edges_batch("CONTAINS_FUNCTION", [("file_c", "func_c")])
+    db.insert_edges_batch("CALLS", [("func_c", "func_a"), ("func_a", "func_b")])
+    
+    # a.py: 3 nodes; its 2 own edges plus both calls touching func_a
+    assert db.delete_file_subgraph("a.py") == (3, 4)
+    assert db.delete_files_subgraph(["b.py", "c.py", "b.py", "missing.py"]) == (5, 3)
+    assert db.delete_files_subgraph([]) == (0, 0)
+    assert db.execute_cypher("MATCH (f:File) RETURN count(f)") == [[0]]
+
+
+def test_connection_pool_reads_alongside_writes(db):
+    """Test that pooled reads run while a write transaction is open and see committed data only"""
+    with db.pool.connection() as first, db.pool.connection() as second:
+        assert first is not second
+    
+    with db.transaction():
+        db.insert_files_batch([FileNode(id="file_1", path="a.py", language="python")])
+        counts = []
+        reader = threading.Thread(target=lambda: counts.append(db.execute_cypher("MATCH (f:File) RETURN count(f)")))
+        reader.start()
+        reader.join(timeout=10)
+        assert counts == [[[0]]]
+    assert db.execute_cypher("MATCH (f:File) RETURN count(f)") == [[1]]
+    
+    pool = ConnectionPool(db.db, size=1, timeout=0.1)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+
+
+def test_kuzu_config_from_env(tmp_path):
+    """Test that database settings are read from the environment and passed to Kùzu"""
+    config = KuzuConfig.from_env({
+        "KUZU_BUFFER_POOL_SIZE": "256MB",
+        "KUZU_MAX_THREADS": "2",
+        "KUZU_READ_ONLY": "false",
+        "KUZU_POOL_SIZE": "3",
+    })
+    assert config == KuzuConfig(buffer_pool_size=256 << 20, max_num_threads=2, read_only=False, pool_size=3)
+    assert KuzuConfig.from_env({}) == KuzuConfig()
+    assert KuzuConfig.from_env({"KUZU_BUFFER_POOL_SIZE": "1073741824"}).buffer_pool_size == 1 << 30
+    with pytest.raises(ValueError):
+        KuzuConfig.from_env({"KUZU_POOL_SIZE": "many"})
+    
+    configured = KuzuDB(str(tmp_path / "graph"), config=config)
+    assert configured.db.buffer_pool_size == 256 << 20
+    assert configured.pool.size == 3
+    assert configured.config.effective()["max_num_threads"] == 2
+
+
+def test_columnar_queries(db):
+    """Test that columnar results match the row-by-row APIs"""
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{i}", name=f"f{i}", args="", start_line=1, end_line=2, file_path="src/main.py",
+                     repo_id="repo")
+        for i in range(2)
+    ])
+    
+    columns = db.query_columns("MATCH (f:Function) RETURN f.id, f.name ORDER BY f.id")
+    assert columns == {"f.id": ["func_0", "func_1"], "f.name": ["f0", "f1"]}
+    assert db.query_columns("MATCH (f:Function) WHERE f.repo_id = 'other' RETURN f.id") == {"f.id": []}
+
+
+def test_iter_nodes_and_edges_in_batches(db):
+    """Test that keyset batches return every node and edge exactly once"""
+    db.insert_files_batch([FileNode(id="file_1", path="src/main.py", language="python")])
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{i}", name=f"f{i}", args="", start_line=1, end_line=2, file_path="src/main.py")
+        for i in range(5)
+    ])
+    db.insert_edges_batch("CONTAINS_FUNCTION", [("file_1", f"func_{i}") for i in range(5)])
+    db.insert_edges_batch("CALLS", [("func_0", "func_1"), ("func_0", "func_2"), ("func_1", "func_2")])
+    
+    nodes = list(db.iter_nodes(batch_size=2))
+    assert [node["id"] for node in nodes] == ["file_1"] + [f"func_{i}" for i in range(5)]
+    assert nodes[1]["_label"] == "Function" and nodes[1]["name"] == "f0"
+    assert [node["id"] for node in db.iter_nodes(["Class"])] == []
+    
+    calls = list(db.iter_edges(["CALLS"], batch_size=2))
+    assert [(edge["source"], edge["target"]) for edge in calls] == [
+        ("func_0", "func_1"), ("func_0", "func_2"), ("func_1", "func_2")
+    ]
+    assert len(list(db.iter_edges(batch_size=1))) == 8
+    
+    with pytest.raises(ValueError):
+        list(db.iter_nodes(["Module"]))
+
+
+def test_generations_per_repository(db):
+    """Test that attributed writes only change their repository's generation and reads change none"""
+    before = {scope: db.generation_of(scope) for scope in (None, "r1", "r2")}
+    with db.repository_writes("r1"):
+        db.insert_files_batch([FileNode(id="file_1", path="src/main.py", language="python", repo_id="r1")])
+    assert db.generation_of(None) > before[None]
+    assert db.generation_of("r1") > before["r1"]
+    assert db.generation_of("r2") == before["r2"]
+    
+    generation = db.generation
+    assert db.count_rows("File") == 1
+    assert db.generation == generation
+    
+    db.insert_files_batch([FileNode(id="file_2", path="src/other.py", language="python")])
+    assert db.generation_of("r2") > before["r2"]
+
+
+def test_iter_edges_keeps_parallel_edges(db):
+    """Test that repeated calls between two functions survive batch boundaries"""
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{i}", name=f"f{i}", args="", start_line=1, end_line=2, file_path="src/main.py")
+        for i in range(3)
+    ])
+    pairs = [("func_0", "func_1")] * 3 + [("func_0", "func_2")] * 2 + [("func_1", "func_2")]
+    db.insert_edges_batch("CALLS", pairs)
+    
+    for batch_size in (1, 2, 3, 4, 100):
+        calls = list(db.iter_edges(["CALLS"], batch_size=batch_size))
+        assert [(edge["source"], edge["target"]) for edge in calls] == pairs
+
+
+def test_nodes_and_edges_by_id(db):
+    """Test point lookups of nodes and their outgoing edges, and the write generation"""
+    generation = db.generation
+    db.insert_files_batch([FileNode(id="file_1", path="src/main.py", language="python")])
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{i}", name=f"f{i}", args="", start_line=1, end_line=2, file_path="src/main.py")
+        for i in range(3)
+    ])
+    db.insert_edges_batch("CONTAINS_FUNCTION", [("file_1", f"func_{i}") for i in range(3)])
+    db.insert_edges_batch("CALLS", [("func_0", "func_1"), ("func_1", "func_2")])
+    assert db.generation > generation
+    
+    nodes = db.get_nodes_by_id("Function", ["func_2", "func_0", "func_0", "missing"])
+    assert sorted(node["id"] for node in nodes) == ["func_0", "func_2"]
+    assert all(node["_label"] == "Function" for node in nodes)
+    
+    edges = db.get_edges_from("Function", ["func_0", "func_1"])
+    assert sorted((edge["source"], edge["target"], edge["type"]) for edge in edges) == [
+        ("func_0", "func_1", "CALLS"), ("func_1", "func_2", "CALLS")
+    ]
+    assert len(db.get_edges_from("File", ["file_1"])) == 3
+    
+    with pytest.raises(ValueError):
+        db.get_nodes_by_id("Module", ["x"])
+
+
+def test_save_and_get_positions(db):
+    """Test that saving positions replaces a repository's layout and leaves others alone"""
+    assert db.save_positions("r1", {"a": (0.0, 1.5), "b": (-20.25, 3e6)})
+    assert db.save_positions("r2", {"c": (7, 8)})
+    assert db.get_positions("r1") == {"a": (0.0, 1.5), "b": (-20.25, 3e6)}
+    
+    assert db.save_positions("r1", {"b": (1.0, 2.0)})
+    assert db.get_positions("r1") == {"b": (1.0, 2.0)}
+    assert db.get_positions() == {"b": (1.0, 2.0), "c": (7.0, 8.0)}
+    assert db.get_positions(ids=["c", "missing"]) == {"c": (7.0, 8.0)}
+    assert db.get_positions("r1", ids=["b", "c"]) == {"b": (1.0, 2.0)}
+
+
+def test_save_and_get_aggregates(db):
+    """Test that aggregates and aggregated edges are stored per repository and filtered by level and parent"""
+    aggregates = [
+        {"id": "dir:r1:.", "level": "dir", "kind": "directory", "name": ".", "path": ".", "parent": "",
+         "size": 3, "x": 1.0, "y": 2.0},
+        {"id": "file:f1", "level": "file", "kind": "file", "name": "a.py", "path": "a.py", "parent": "dir:r1:.",
+         "size": 2, "x": 0.5, "y": 0.0},
+        {"id": "file:f2", "level": "file", "kind": "file", "name": "b.py", "path": "b.py", "parent": "dir:r1:.",
+         "size": 1, "x": 2.0, "y": 6.0},
+    ]
+    edges = [{"id": "CALLS:file:f1->file:f2", "level": "file", "type": "CALLS", "source": "file:f1",
+              "target": "file:f2", "relationships": 4}]
+    assert db.save_aggregates("r1", aggregates, edges)
+    assert db.save_aggregates("r2", [dict(aggregates[0], id="dir:r2:.")], [])
+    
+    stored = db.get_aggregates("r1")
+    assert [aggregate["id"] for aggregate in stored] == ["dir:r1:.", "file:f1", "file:f2"]
+    assert stored[1] == dict(aggregates[1], repo_id="r1")
+    assert [a["id"] for a in db.get_aggregates(level="file", parent="dir:r1:.")] == ["file:f1", "file:f2"]
+    assert [a["id"] for a in db.get_aggregates(ids=["file:f2", "missing"])] == ["file:f2"]
+    assert db.get_aggregate_edges("r1", "file") == [dict(edges[0], repo_id="r1")]
+    assert db.get_aggregate_edges(ids=["file:f2"]) == db.get_aggregate_edges(level="file")
+    assert db.get_aggregate_edges(level="dir") == []
+    
+    assert db.save_aggregates("r1", [], [])
+    assert db.get_aggregates("r1") == [] and db.get_aggregate_edges("r1") == []
+    assert len(db.get_aggregates()) == 1
+
+
+def test_get_edges_to(db):
+    """Test that incoming relationships are found per target table"""
+    db.insert_files_batch([FileNode(id="file_1", path="src/main.py", language="python")])
+    db.insert_classes_batch([ClassNode(id="class_1", name="C", start_line=1, end_line=5, file_path="src/main.py")])
+    db.insert_functions_batch([
+        FunctionNode(id=f"func_{i}", name=f"f{i}", args="", start_line=1, end_line=2, file_path="src/main.py")
+        for i in range(2)
+    ])
+    db.insert_edges_batch("CONTAINS_FUNCTION", [("file_1", "func_0"), ("file_1", "func_1")])
+    db.insert_edges_batch("DEFINES", [("class_1", "func_0")])
+    db.insert_edges_batch("CALLS", [("func_1", "func_0")])
+    
+    edges = db.get_edges_to("Function", ["func_0"])
+    assert sorted((edge["relation"], edge["source"]) for edge in edges) == [
+        ("CALLS", "func_1"), ("CONTAINS_FUNCTION", "file_1"), ("DEFINES", "class_1")
+    ]
+    assert db.get_edges_to("File", ["file_1"]) == []
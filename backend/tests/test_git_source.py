@@ -0,0 +1,106 @@
+"""
+Tests for GitBlobSource
+"""
+import pytest
+import subprocess
+from pathlib import Path
+import tempfile
+import shutil
+
+from git_source import GitBlobSource
+
+
+def git(repo: Path, *args: str) -> str:
+    """Run git in a test repository"""
+    result = subprocess.run(
+        ['git', '-C', str(repo), '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+        check=True, capture_output=True, text=True
+    )
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory"""
+    temp_dir = tempfile.mkdtemp()
+    yield Path(temp_dir)
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def remote(temp_dir):
+    """Repository with code in a subdirectory, a binary file and a symlink"""
+    repo = temp_dir / "remote"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / "pkg" / "core.py").write_text("def core():\n    pass\n")
+    (repo / "main.py").write_text("import pkg\n")
+    (repo / "logo.bin").write_bytes(bytes(range(256)) * 64)
+    (repo / "link.py").symlink_to("main.py")
+    git(repo, 'init', '-q')
+    git(repo, 'config', 'uploadpack.allowfilter', 'true')
+    git(repo, 'add', '-A')
+    git(repo, 'commit', '-q', '-m', 'init')
+    return repo
+
+
+def test_streams_blobs_without_checkout(temp_dir, remote):
+    """Contents come straight from a bare mirror, rooted at the requested directory"""
+    mirror = temp_dir / "mirror.git"
+    subprocess.run(['git', 'clone', '-q', '--mirror', str(remote), str(mirror)], check=True)
+    source = GitBlobSource(mirror, root=temp_dir / "virtual")
+
+    entries = source.list_files()
+    assert [path for path, _ in entries] == ["logo.bin", "main.py", "pkg/core.py"]
+
+    contents = dict(source.iter_sources(entries))
+    assert contents[temp_dir / "virtual" / "pkg" / "core.py"] == b"def core():\n    pass\n"
+    assert contents[temp_dir / "virtual" / "logo.bin"] == (remote / "logo.bin").read_bytes()
+    assert not (temp_dir / "virtual").exists()
+
+
+def test_list_files_filters(temp_dir, remote):
+    """Pathspecs and the include predicate narrow the listing"""
+    source = GitBlobSource(remote)
+
+    assert [path for path, _ in source.list_files(["pkg"])] == ["pkg/core.py"]
+    assert [path for path, _ in source.list_files(include=lambda p: p.endswith('.py'))] == ["main.py", "pkg/core.py"]
+    assert source.commit == git(remote, 'rev-parse', 'HEAD')
+
+
+def test_blobless_mirror_fetches_only_requested_blobs(temp_dir, remote):
+    """Missing blobs of a partial clone are fetched for the requested files only"""
+    mirror = temp_dir / "mirror.git"
+    subprocess.run(['git', 'clone', '-q', '--mirror', '--filter=blob:none', f"file://{remote}", str(mirror)],
+                   check=True)
+    source = GitBlobSource(mirror)
+
+    entries = source.list_files(include=lambda p: p.endswith('.py'))
+    assert len(list(source.iter_sources(entries))) == 2
+
+    missing = git(mirror, 'rev-list', '--objects', '--missing=print', 'HEAD').splitlines()
+    assert f"?{git(remote, 'rev-parse', 'HEAD:logo.bin')}" in missing
+    assert f"?{git(remote, 'rev-parse', 'HEAD:main.py')}" not in missing
+
+
+def test_prefetch_fetches_missing_blobs_of_the_commit(temp_dir, remote):
+    """Prefetching looks at the commit's tree only; blobs of older commits stay missing"""
+    old_blob = git(remote, 'rev-parse', 'HEAD:main.py')
+    (remote / "main.py").write_text("import pkg\npkg.core()\n")
+    git(remote, 'commit', '-q', '-am', 'edit')
+    mirror = temp_dir / "mirror.git"
+    subprocess.run(['git', 'clone', '-q', '--mirror', '--filter=blob:none', f"file://{remote}", str(mirror)],
+                   check=True)
+    source = GitBlobSource(mirror)
+
+    source.prefetch([sha for _, sha in source.list_files(include=lambda p: p.endswith('.py'))])
+
+    missing = git(mirror, 'rev-list', '--objects', '--missing=print', 'HEAD').splitlines()
+    assert f"?{git(remote, 'rev-parse', 'HEAD:main.py')}" not in missing
+    assert f"?{git(remote, 'rev-parse', 'HEAD:pkg/core.py')}" not in missing
+    assert f"?{old_blob}" in missing
+
+
+def test_unknown_commit_raises(remote):
+    """Unresolvable commits surface as RuntimeError"""
+    with pytest.raises(RuntimeError):
+        GitBlobSource(remote, commit="does-not-exist")
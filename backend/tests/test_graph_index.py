@@ -0,0 +1,156 @@
+"""
+Tests for the graph layout index
+"""
+import threading
+import time
+
+import pytest
+
+from graph_index import GraphIndex, GraphIndexCache, SpatialIndex, grid_position, parse_viewport, repository_path
+
+
+def make_index():
+    """Two files, a class and three functions in display order"""
+    return GraphIndex([
+        ("File", "file:a.py", "a.py"),
+        ("File", "file:pkg/b.py", "pkg/b.py"),
+        ("Class", "class:pkg/b.py:C", "pkg/b.py"),
+        ("Function", "func:a.py:f", "a.py"),
+        ("Function", "func:pkg/b.py:g", "pkg/b.py"),
+        ("Function", "func:pkg/b.py:h", "pkg/b.py"),
+    ])
+
+
+class FakeDB:
+    """Counts index builds and lets tests simulate writes"""
+
+    def __init__(self):
+        self.generation = 0  # unattributed writes
+        self.repo_generations = {}
+        self.builds = 0
+        self.blocked = {}  # repo_id -> Event its builds wait for
+
+    def generation_of(self, repo_id=None):
+        return self.generation + self.repo_generations.get(repo_id, 0)
+
+    def iter_nodes(self, repo_id=None):
+        self.builds += 1
+        if repo_id in self.blocked:
+            self.blocked[repo_id].wait(5)
+        yield {"_label": "File", "id": "file:a.py", "path": "/repos/r/a.py", "repo_id": "r"}
+
+    def get_positions(self, repo_id=None):
+        return {}
+
+
+def test_spatial_index_queries_rectangles():
+    """Points on the boundary are included; far away cells are never visited"""
+    spatial = SpatialIndex(cell_size=10)
+    for key, (x, y) in enumerate([(0, 0), (5, 5), (15, 5), (-3, 40), (1e9, 1e9)]):
+        spatial.insert(key, x, y)
+
+    assert spatial.query((0, 0, 5, 5)) == [0, 1]
+    assert spatial.query((-5, -5, 20, 50)) == [0, 1, 2, 3]
+    assert spatial.query((-1e12, -1e12, 1e12, 1e12)) == [0, 1, 2, 3, 4]
+
+    spatial.insert(1, 100, 100)
+    spatial.remove(0)
+    assert spatial.query((0, 0, 5, 5)) == []
+    assert len(spatial) == 4
+
+
+def test_pages_resume_after_cursor():
+    """Pages cover every node exactly once, in display order"""
+    index = make_index()
+
+    pages, cursor = [], None
+    while True:
+        selected, cursor = index.select(cursor=cursor, limit=4)
+        pages.append(selected)
+        if cursor is None:
+            break
+
+    assert pages == [[0, 1, 2, 3], [4, 5]]
+    assert index.select(cursor=index.cursor(5)) == ([], None)
+    # Cursors are keys, so they stay valid for an index rebuilt with new nodes
+    assert index.select(cursor="Class:class:pkg/b.py:B", limit=1) == ([2], index.cursor(2))
+
+
+def test_filters_and_viewport():
+    """Label, path prefix and viewport filters combine"""
+    index = make_index()
+
+    assert index.select(labels=["Function"])[0] == [3, 4, 5]
+    assert index.select(path_prefix="pkg/")[0] == [1, 2, 4, 5]
+    assert index.select(labels=["Function"], path_prefix="pkg/", limit=1) == ([4], index.cursor(4))
+
+    x, y = grid_position(4)
+    assert index.select(viewport=(x, y, x + 1000, y))[0] == [4, 5]
+    assert index.select(viewport=(x, y, x + 1000, y), cursor=index.cursor(4))[0] == [5]
+    assert index.find("Function", "func:pkg/b.py:g") == 4
+    assert index.find("Class", "func:pkg/b.py:g") is None
+
+    with pytest.raises(ValueError):
+        index.select(labels=["Module"])
+    with pytest.raises(ValueError):
+        index.select(cursor="no-separator")
+
+
+def test_stored_positions_override_grid():
+    """Laid-out nodes are indexed at their stored position, the rest on the grid"""
+    index = GraphIndex([("File", "file:a.py", "a.py"), ("File", "file:b.py", "b.py")],
+                       positions={"file:b.py": (-500.0, 2500.0)})
+
+    assert index.positions == [grid_position(0), (-500.0, 2500.0)]
+    assert index.select(viewport=(-600, 2400, -400, 2600))[0] == [1]
+
+
+def test_parse_viewport():
+    """Corners are normalized; malformed rectangles are rejected"""
+    assert parse_viewport("10,20,-5,0.5") == (-5.0, 0.5, 10.0, 20.0)
+    for value in ("1,2,3", "a,b,c,d", "0,0,inf,1"):
+        with pytest.raises(ValueError):
+            parse_viewport(value)
+
+
+def test_repository_path():
+    """Paths are made relative to the repository checkout"""
+    assert repository_path("/data/repos/r-1/src/a.py", "r-1") == "src/a.py"
+    assert repository_path("/legacy/src/a.py", "") == "/legacy/src/a.py"
+
+
+def test_cache_rebuilds_after_writes():
+    """Indexes are reused until the database generation changes"""
+    db = FakeDB()
+    cache = GraphIndexCache(db)
+
+    first = cache.get("r")
+    assert cache.get("r") is first
+    assert first.paths == ["a.py"]
+
+    db.generation += 1
+    assert cache.get("r") is not first
+    assert db.builds == 2
+
+
+def test_cache_is_invalidated_per_repository():
+    """Writes to one repository keep other repositories' indexes; builds do not block other scopes"""
+    db = FakeDB()
+    cache = GraphIndexCache(db)
+    first = cache.get("r")
+
+    db.repo_generations["s"] = 1
+    assert cache.get("r") is first
+
+    db.blocked["slow"] = threading.Event()
+    builder = threading.Thread(target=cache.get, args=("slow",))
+    builder.start()
+    try:
+        while db.builds < 2:
+            time.sleep(0.001)
+        db.repo_generations["r"] = 1
+        assert cache.get("r") is not first
+    finally:
+        db.blocked["slow"].set()
+        builder.join()
+    assert db.builds == 3
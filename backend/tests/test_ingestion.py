@@ -5,10 +5,14 @@ Includes unit tests and property-based tests
 import pytest
 import tempfile
 import shutil
+import subprocess
+import threading
+import time
 from pathlib import Path
 from hypothesis import given, strategies as st, settings
 
 from ingestion import IngestionService, JobStatus
+from repo_cache import checkout_dir_name, repository_id
 from parser import TreeSitterParser
 from database import KuzuDB
 
@@ -140,6 +144,41 @@ class User {
         assert len(functions) >= 2, f"Expected at least 2 functions, got {len(functions)}"
         assert len(errors) == 0, f"Expected no errors, got {errors}"
     
+    def test_parse_repository_parallel_matches_serial(self, db, parser, temp_dir):
+        """Test that process-pool parsing returns exactly the serial result"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), parse_chunk_size=2)
+        test_repo = temp_dir / "test_repo"
+        (test_repo / "pkg").mkdir(parents=True)
+        for i in range(7):
+            (test_repo / "pkg" / f"mod_{i}.py").write_text(
+                f"class Model{i}:\n    def save(self):\n        return helper_{i}()\n\ndef helper_{i}():\n    pass\n"
+            )
+        (test_repo / "app.js").write_text("function main() { return run(); }\nfunction run() {}\n")
+        
+        serial = service.parse_repository(test_repo, workers=1)
+        parallel = service.parse_repository(test_repo, workers=2)
+        
+        for serial_items, parallel_items in zip(serial[:4], parallel[:4]):
+            assert [item.model_dump() for item in parallel_items] == [item.model_dump() for item in serial_items]
+        assert parallel[4] == serial[4]
+    
+    def test_parallel_source_parsing_bounds_loaded_contents(self, db, parser, temp_dir):
+        """Test that loaded contents are only read a bounded window ahead of the parsed results"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), parse_chunk_size=2)
+        read = []
+        
+        def sources():
+            for i in range(40):
+                read.append(i)
+                yield temp_dir / f"mod_{i}.py", f"def f{i}():\n    pass\n".encode()
+        
+        results = service._parse_sources_parallel(sources(), workers=2)
+        first_path, first_result, first_error = next(results)
+        # 2 * workers chunks in flight, plus the chunk being filled
+        assert len(read) <= (2 * 2 + 1) * 2
+        assert (first_path.name, first_error) == ("mod_0.py", None)
+        assert len([first_result] + [result for _, result, _ in results]) == 40
+    
     def test_parse_repository_with_errors(self, service, temp_dir):
         """Test that parsing continues after errors"""
         # Create test repository
@@ -191,6 +230,353 @@ class MyClass:
         all_nodes = service.db.get_all_nodes()
         assert len(all_nodes) == nodes_inserted, "Node count should match"
     
+    def test_insert_into_database_bulk_then_append(self, service, temp_dir):
+        """Test COPY-based first load followed by a row-path append"""
+        first_repo = temp_dir / "first_repo"
+        first_repo.mkdir()
+        (first_repo / "shapes.py").write_text('''
+class Shape:
+    def area(self):
+        return helper()
+
+def helper():
+    """Compute it, "quoted", with a
+    second line."""
+    return 1
+''')
+        
+        files, classes, functions, edges, errors = service.parse_repository(first_repo)
+        success, message, nodes_inserted, edges_inserted = service.insert_into_database(
+            files, classes, functions, edges
+        )
+        
+        assert success, f"Bulk load should succeed: {message}"
+        assert nodes_inserted == len(files) + len(classes) + len(functions)
+        assert edges_inserted == len(edges)
+        
+        # Docstrings survive CSV staging, and empty strings stay empty strings
+        stored = service.db.execute_cypher(
+            "MATCH (f:Function) RETURN f.name, f.docstring ORDER BY f.name"
+        )
+        assert [row[0] for row in stored] == ["area", "helper"]
+        assert stored[0][1] == ""
+        assert stored[1][1] == 'Compute it, "quoted", with a\n    second line.'
+        
+        # Tables are no longer empty, so a second repository goes through batched inserts
+        second_repo = temp_dir / "second_repo"
+        second_repo.mkdir()
+        (second_repo / "extra.py").write_text("def extra():\n    return helper()\n")
+        
+        files2, classes2, functions2, edges2, _ = service.parse_repository(second_repo)
+        success, message, nodes_inserted2, _ = service.insert_into_database(
+            files2, classes2, functions2, edges2
+        )
+        
+        assert success, f"Append should succeed: {message}"
+        assert nodes_inserted2 == len(files2) + len(functions2)
+        assert len(service.db.get_all_nodes()) == nodes_inserted + nodes_inserted2
+    
+    def test_insert_into_database_per_file_transactions(self, db, parser, temp_dir, capsys):
+        """Test the batched insert path writing one transaction per file"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), bulk_load=False, files_per_transaction=1)
+        test_repo = temp_dir / "test_repo"
+        test_repo.mkdir()
+        (test_repo / "a.py").write_text("class A:\n    def run(self):\n        return go()\n\ndef go():\n    pass\n")
+        (test_repo / "b.py").write_text("def other():\n    return go()\n\ndef go():\n    pass\n")
+        
+        files, classes, functions, edges, errors = service.parse_repository(test_repo)
+        groups = list(service._group_by_file(files, classes, functions, edges))
+        assert len(groups) == 2
+        assert sum(len(group[3]) for group in groups) == len(edges)
+        
+        success, message, nodes_inserted, edges_inserted = service.insert_into_database(
+            files, classes, functions, edges
+        )
+        
+        assert success, f"Insertion should succeed: {message}"
+        assert nodes_inserted == len(files) + len(classes) + len(functions)
+        assert edges_inserted == len(edges)
+        assert len(service.db.get_all_edges()) == len(edges)
+        assert "retrying" not in capsys.readouterr().out
+    
+    def test_ingest_streaming_matches_batch_parse(self, db, parser, temp_dir):
+        """Test the streaming pipeline writes the same graph as parse-then-insert"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), streaming=True,
+                                   files_per_transaction=2, pipeline_queue_size=2)
+        test_repo = temp_dir / "test_repo"
+        test_repo.mkdir()
+        for i in range(5):
+            (test_repo / f"mod{i}.py").write_text(f"class C{i}:\n    def run(self):\n        return go{i}()\n\ndef go{i}():\n    pass\n")
+        (test_repo / "bad.py").write_text("def broken(:\n")
+        
+        files, classes, functions, edges, errors = service.parse_repository(test_repo)
+        result = service.ingest_streaming(test_repo)
+        
+        assert result.status == "success", result.message
+        assert result.files_processed == 6
+        assert result.nodes_created == len(files) + len(classes) + len(functions)
+        assert result.edges_created == len(edges)
+        assert len(service.db.get_all_edges()) == len(edges)
+    
+    def test_ingest_incremental_applies_git_diff(self, db, parser, temp_dir):
+        """Test that re-ingesting a new commit only rewrites changed files"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), bulk_load=False)
+        repo = temp_dir / "test_repo"
+        repo.mkdir()
+        
+        def git(*args):
+            subprocess.run(['git', '-C', str(repo), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        
+        def commit():
+            git('add', '-A')
+            git('commit', '-q', '-m', 'change')
+            return service.get_head_commit(repo)
+        
+        (repo / "keep.py").write_text("def keep():\n    pass\n")
+        (repo / "edit.py").write_text("def old_name():\n    pass\n")
+        (repo / "gone.py").write_text("def gone():\n    pass\n")
+        (repo / "move.py").write_text("def moved():\n    pass\n")
+        git('init', '-q')
+        first = commit()
+        assert service.ingest_full(repo).status == "success"
+        
+        (repo / "edit.py").write_text("def new_name():\n    return helper()\n\ndef helper():\n    pass\n")
+        (repo / "gone.py").unlink()
+        (repo / "move.py").rename(repo / "moved.py")
+        (repo / "README.md").write_text("# not code\n")
+        second = commit()
+        
+        deleted, changed = service.diff_commits(repo, first, second)
+        assert sorted(p.name for p in deleted) == ["edit.py", "gone.py", "move.py"]
+        assert sorted(p.name for p in changed) == ["edit.py", "moved.py"]
+        
+        result = service.ingest_incremental(repo, first, second)
+        
+        assert result.status == "success", result.message
+        assert result.files_processed == 2
+        names = {node['name'] for node in db.get_all_nodes() if node['_label'] == 'Function'}
+        assert names == {"keep", "new_name", "helper", "moved"}
+        assert sorted(Path(path).name for path in db.get_file_paths()) == ["edit.py", "keep.py", "moved.py"]
+        assert len(db.get_all_edges()) == 5
+        assert service.diff_commits(repo, "0" * 40, second) is None
+    
+    def test_ingest_repository_from_local_remote(self, db, parser, temp_dir):
+        """Test that repeat ingests fetch into the mirror and update incrementally"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), allow_local_repos=True)
+        remote = temp_dir / "remote"
+        remote.mkdir()
+        
+        def commit(name, content):
+            (remote / name).write_text(content)
+            for args in (['add', '-A'], ['commit', '-q', '-m', name]):
+                subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                                *args], check=True, capture_output=True)
+        
+        subprocess.run(['git', 'init', '-q', str(remote)], check=True)
+        commit("a.py", "def a():\n    pass\n")
+        url = f"file://{remote}"
+        
+        first = service.ingest_repository(url)
+        assert first.status == "success", first.message
+        assert first.files_processed == 1
+        first_positions = db.get_positions(repository_id(url))
+        
+        commit("b.py", "def b():\n    return c()\n\ndef c():\n    pass\n")
+        second = service.ingest_repository(url)
+        
+        assert second.status == "success", second.message
+        assert second.message.startswith("Incrementally updated")
+        assert second.files_processed == 1
+        assert len(db.get_file_paths()) == 2
+        # Every node is laid out, and the unchanged file's block only moves as a whole
+        positions = db.get_positions(repository_id(url))
+        assert set(positions) == {node["id"] for node in db.iter_nodes(repo_id=repository_id(url))}
+        offsets = {(round(positions[node_id][0] - x, 6), round(positions[node_id][1] - y, 6))
+                   for node_id, (x, y) in first_positions.items()}
+        assert len(first_positions) == 2 and len(offsets) == 1
+        assert db.get_repository(repository_id(url))["last_commit"] == service.get_head_commit(
+            service.repo_dir / checkout_dir_name(url))
+    
+    def test_ingest_repository_sparse_strategy(self, db, parser, temp_dir):
+        """Test that the sparse strategy only ingests the requested subdirectories"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), allow_local_repos=True)
+        remote = temp_dir / "remote"
+        (remote / "pkg").mkdir(parents=True)
+        (remote / "tools").mkdir()
+        (remote / "pkg" / "core.py").write_text("def core():\n    pass\n")
+        (remote / "tools" / "build.py").write_text("def build():\n    pass\n")
+        (remote / "setup.py").write_text("def setup():\n    pass\n")
+        subprocess.run(['git', 'init', '-q', str(remote)], check=True)
+        for args in (['config', 'uploadpack.allowfilter', 'true'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        url = f"file://{remote}"
+        
+        result = service.ingest_repository(url, clone_strategy="sparse", sparse_paths=["pkg"])
+        
+        assert result.status == "success", result.message
+        assert result.files_processed == 1
+        assert [Path(path).name for path in db.get_file_paths()] == ["core.py"]
+        assert db.get_repository(repository_id(url))["scope"] == "pkg"
+        
+        # Changing the scope rebuilds instead of applying a diff
+        result = service.ingest_repository(url, clone_strategy="blobless")
+        assert result.status == "success", result.message
+        assert not result.message.startswith("Incrementally updated")
+        assert sorted(Path(path).name for path in db.get_file_paths()) == ["build.py", "core.py", "setup.py"]
+    
+    def test_repositories_are_partitioned(self, db, parser, temp_dir):
+        """Test that repositories can be listed, reloaded and deleted independently"""
+        service = IngestionService(db, parser, str(temp_dir / "repos"), allow_local_repos=True)
+        urls = []
+        for name in ("alpha", "beta"):
+            remote = temp_dir / name
+            remote.mkdir()
+            (remote / f"{name}.py").write_text(f"def {name}():\n    return helper()\n\ndef helper():\n    pass\n")
+            subprocess.run(['git', 'init', '-q', str(remote)], check=True)
+            for args in (['add', '-A'], ['commit', '-q', '-m', 'init']):
+                subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                                *args], check=True, capture_output=True)
+            urls.append(f"file://{remote}")
+            assert service.ingest_repository(urls[-1]).status == "success"
+        alpha, beta = (repository_id(url) for url in urls)
+        
+        repositories = {repository["id"]: repository for repository in db.list_repositories()}
+        assert set(repositories) == {alpha, beta}
+        assert (repositories[alpha]["files"], repositories[alpha]["functions"]) == (1, 2)
+        assert {node["name"] for node in db.get_all_nodes(beta) if node["_label"] == "Function"} == {"beta", "helper"}
+        assert len(db.get_all_edges(alpha)) == 3
+        
+        # A reload rebuilds one repository without touching the other
+        (temp_dir / "alpha" / "alpha.py").write_text("def alpha():\n    pass\n")
+        subprocess.run(['git', '-C', str(temp_dir / "alpha"), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                        'commit', '-q', '-am', 'edit'], check=True, capture_output=True)
+        result = service.ingest_repository(urls[0], reload=True)
+        assert result.status == "success", result.message
+        assert result.message.startswith("Successfully ingested")
+        assert {node["name"] for node in db.get_all_nodes(alpha) if node["_label"] == "Function"} == {"alpha"}
+        assert len(db.get_all_nodes(beta)) == 3
+        
+        assert service.delete_repository(alpha)
+        assert not service.delete_repository(alpha)
+        assert [repository["id"] for repository in db.list_repositories()] == [beta]
+        assert db.get_all_nodes(alpha) == []
+        assert not (service.repo_dir / alpha).exists()
+        assert len(db.get_all_nodes()) == 3
+    
+    def test_ingest_repository_without_checkout(self, db, parser, temp_dir):
+        """Test that reading blobs from the mirror builds the same graph as a checkout"""
+        remote = temp_dir / "remote"
+        (remote / "pkg").mkdir(parents=True)
+        (remote / "pkg" / "core.py").write_text("def core():\n    return helper()\n\ndef helper():\n    pass\n")
+        (remote / "README.md").write_text("# Project\n")
+        subprocess.run(['git', 'init', '-q', str(remote)], check=True)
+        
+        def commit(message):
+            for args in (['add', '-A'], ['commit', '-q', '-m', message]):
+                subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                                *args], check=True, capture_output=True)
+        
+        commit("init")
+        url = f"file://{remote}"
+        
+        service = IngestionService(db, parser, str(temp_dir / "repos"), allow_local_repos=True,
+                                   checkout=False, streaming=True)
+        result = service.ingest_repository(url)
+        
+        assert result.status == "success", result.message
+        assert result.files_processed == 1
+        expected_path = service.repo_dir / checkout_dir_name(url) / "pkg" / "core.py"
+        assert db.get_file_paths() == [str(expected_path)]
+        assert not expected_path.exists()
+        assert (result.nodes_created, result.edges_created) == (3, 3)  # file + 2 functions; CONTAINS x2 + CALLS
+        
+        (remote / "pkg" / "core.py").unlink()
+        (remote / "app.py").write_text("def app():\n    pass\n")
+        commit("move")
+        result = service.ingest_repository(url)
+        
+        assert result.status == "success", result.message
+        assert result.message.startswith("Incrementally updated")
+        assert [Path(path).name for path in db.get_file_paths()] == ["app.py"]
+    
+    def test_ingest_reports_progress(self, db, parser, temp_dir):
+        """Test that ingestion reports every stage and the final counters"""
+        remote = temp_dir / "remote"
+        remote.mkdir()
+        for i in range(3):
+            (remote / f"m{i}.py").write_text(f"def f{i}():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        
+        for streaming in (False, True):
+            events = []
+            service = IngestionService(db, parser, str(temp_dir / f"repos{streaming}"), allow_local_repos=True,
+                                       bulk_load=False, streaming=streaming)
+            result = service.ingest_repository(f"file://{remote}", progress=events.append)
+            
+            assert result.status == "success", result.message
+            stages = [event.stage for event in events]
+            assert stages[0] == "cloning" and stages[-1] == "done"
+            assert "parsing" in stages
+            final = events[-1]
+            assert (final.files_total, final.files_parsed) == (3, 3)
+            assert final.nodes_written == result.nodes_created
+            assert final.edges_written == result.edges_created
+            assert final.batch >= 1
+    
+    def test_concurrent_ingests_of_one_repository_are_serialized(self, db, parser, temp_dir):
+        """Test that simultaneous ingests of the same URL never share the checkout at once"""
+        remote = temp_dir / "remote"
+        remote.mkdir()
+        (remote / "app.py").write_text("def app():\n    pass\n")
+        for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+            subprocess.run(['git', '-C', str(remote), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                            *args], check=True, capture_output=True)
+        service = IngestionService(db, parser, str(temp_dir / "repos"), allow_local_repos=True)
+        url = f"file://{remote}"
+        
+        active = []
+        overlaps = []
+        original = service.clone_repo
+        
+        def tracked_clone(*args, **kwargs):
+            active.append(1)
+            overlaps.append(len(active))
+            try:
+                time.sleep(0.1)
+                return original(*args, **kwargs)
+            finally:
+                active.pop()
+        
+        service.clone_repo = tracked_clone
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(service.ingest_repository(url)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert [result.status for result in results] == ["success"] * 3
+        assert max(overlaps) == 1
+        assert len(db.get_file_paths()) == 1
+        assert not service._repo_locks
+    
+    def test_invalid_clone_strategy(self, service):
+        """Test that unknown strategies and unsafe sparse paths are rejected"""
+        url = "https://github.com/user/repo"
+        assert "Invalid clone strategy" in service.clone_repo(url, "bogus")[2]
+        assert not service.clone_repo(url, "sparse")[0]
+        assert "Invalid sparse paths" in service.clone_repo(url, "sparse", ["../etc"])[2]
+    
+    def test_local_repos_rejected_by_default(self, service, temp_dir):
+        """Test that file:// URLs are only accepted when explicitly allowed"""
+        assert not service.validate_repo_url(f"file://{temp_dir}")
+        assert not service.validate_repo_url(str(temp_dir))
+    
     def test_ingest_repository_invalid_url(self, service):
         """Test ingestion with invalid URL"""
         result = service.ingest_repository("not-a-valid-url")
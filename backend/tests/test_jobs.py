@@ -0,0 +1,142 @@
+"""
+Tests for JobManager
+"""
+import threading
+import time
+
+from ingestion import JobStatus
+from progress import IngestionProgress
+from jobs import JobManager
+
+
+class BlockingIngestionService:
+    """Stand-in for IngestionService whose ingests wait until released"""
+
+    clone_strategy = "full"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def ingest_repository(self, repo_url, clone_strategy=None, sparse_paths=None, progress=None, reload=False):
+        with self._lock:
+            self.calls.append((repo_url, clone_strategy, sparse_paths))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        if progress:
+            progress(IngestionProgress(stage="parsing", files_discovered=3, files_total=3))
+        self.release.wait(timeout=10)
+        with self._lock:
+            self.running -= 1
+        if repo_url.endswith("broken"):
+            raise RuntimeError("disk full")
+        return JobStatus(status="success", message=f"Ingested {repo_url}", files_processed=3,
+                         nodes_created=5, edges_created=4)
+
+
+def wait_for(manager, job_id, timeout=10.0):
+    """Poll until a job has finished"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job.finished_at is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_returns_immediately_and_records_result():
+    """Jobs are queued, run in the background and expose their results"""
+    service = BlockingIngestionService()
+    manager = JobManager(service, max_workers=1)
+
+    job = manager.submit("https://github.com/user/repo", "shallow")
+    assert job.status == "queued"
+    assert manager.get(job.job_id).status in ("queued", "in_progress")
+
+    service.release.set()
+    done = wait_for(manager, job.job_id)
+
+    assert done.status == "success"
+    assert (done.files_processed, done.nodes_created, done.edges_created) == (3, 5, 4)
+    assert done.started_at >= done.created_at
+    assert done.progress.files_total == 3
+    assert service.calls == [("https://github.com/user/repo", "shallow", [])]
+    manager.shutdown()
+
+
+def test_failures_are_reported_as_errors():
+    """Exceptions from the ingestion service mark the job as failed"""
+    service = BlockingIngestionService()
+    service.release.set()
+    manager = JobManager(service)
+
+    done = wait_for(manager, manager.submit("https://github.com/user/broken").job_id)
+
+    assert done.status == "error"
+    assert "disk full" in done.message
+    manager.shutdown()
+
+
+def test_list_jobs_newest_first_and_history_is_bounded():
+    """Only the most recent finished jobs are retained"""
+    service = BlockingIngestionService()
+    service.release.set()
+    manager = JobManager(service, max_history=2)
+
+    job_ids = [manager.submit(f"https://github.com/user/repo{i}").job_id for i in range(4)]
+    for job_id in job_ids[-1:]:
+        wait_for(manager, job_id)
+    manager.shutdown()
+
+    assert [job.job_id for job in manager.list_jobs()] == job_ids[:1:-1]
+    assert manager.get(job_ids[0]) is None
+
+
+def test_concurrent_submissions_for_one_repository_coalesce():
+    """Identical requests attach to the in-flight job instead of ingesting twice"""
+    service = BlockingIngestionService()
+    manager = JobManager(service, max_workers=2)
+
+    first = manager.submit("https://github.com/user/repo")
+    second = manager.submit("https://github.com/user/repo/", "full")
+    spelled = manager.submit(" HTTPS://GitHub.com/user/repo.git/")
+    other_strategy = manager.submit("https://github.com/user/repo", "shallow")
+
+    assert second.job_id == first.job_id == spelled.job_id
+    assert first.repo_url == "https://github.com/user/repo"
+    assert other_strategy.job_id != first.job_id
+
+    service.release.set()
+    done = manager.wait(first.job_id, timeout=10)
+    manager.wait(other_strategy.job_id, timeout=10)
+
+    assert done.status == "success"
+    assert done.requests == 3
+    assert sorted(call[1] for call in service.calls) == ["full", "shallow"]
+    # The ingest, and so its repository lock and id, runs with the normalized URL
+    assert {call[0] for call in service.calls} == {"https://github.com/user/repo"}
+
+    # Once finished, the next submission starts a fresh ingest
+    assert manager.submit("https://github.com/user/repo").job_id != first.job_id
+    manager.shutdown()
+
+
+def test_different_repositories_run_in_parallel():
+    """Jobs for different repositories are not serialized"""
+    service = BlockingIngestionService()
+    manager = JobManager(service, max_workers=2)
+
+    jobs = [manager.submit(f"https://github.com/user/repo{i}") for i in range(2)]
+    deadline = time.time() + 10
+    while service.max_running < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    service.release.set()
+
+    assert service.max_running == 2
+    assert all(manager.wait(job.job_id, timeout=10).status == "success" for job in jobs)
+    manager.shutdown()
+
@@ -0,0 +1,106 @@
+"""
+Tests for the graph layout engine
+"""
+import numpy as np
+
+from layout import (NODE_WIDTH, NODE_HEIGHT, LAYER_GAP, barnes_hut_repulsion, compute_layout, force_layout,
+                    overlapping_pairs, remove_overlaps, tree_layout)
+
+
+def exact_repulsion(points, masses):
+    """O(n^2) reference for barnes_hut_repulsion"""
+    delta = points[:, None, :] - points[None, :, :]
+    distance2 = (delta ** 2).sum(axis=2)
+    np.fill_diagonal(distance2, np.inf)
+    return (masses[None, :, None] * delta / distance2[:, :, None]).sum(axis=1)
+
+
+def block_boxes(positions, nodes):
+    """Bounding box (x0, y0, x1, y1) of some laid-out nodes"""
+    xs = [positions[node][0] for node in nodes]
+    ys = [positions[node][1] for node in nodes]
+    return min(xs), min(ys), max(xs) + NODE_WIDTH, max(ys) + NODE_HEIGHT
+
+
+def test_barnes_hut_matches_exact_repulsion():
+    """The approximation stays close to the exact sum, and closer with a smaller theta"""
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(400, 2)) * 100
+    masses = rng.uniform(0.5, 2, size=400)
+    exact = exact_repulsion(points, masses)
+
+    def median_error(theta):
+        approximate = barnes_hut_repulsion(points, masses, theta=theta)
+        return np.median(np.linalg.norm(approximate - exact, axis=1) / np.linalg.norm(exact, axis=1))
+
+    assert median_error(0.8) < 0.05
+    assert median_error(0.2) < median_error(0.8)
+
+
+def test_force_layout_pulls_connected_points_together():
+    """Connected points end up closer than unconnected ones"""
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(-500, 500, size=(6, 2))
+    edges = np.array([(0, 1), (1, 2), (3, 4), (4, 5)])
+    result = force_layout(positions, np.ones(6), edges, np.ones(4), distance=100.0)
+
+    def gap(a, b):
+        return np.hypot(*(result[a] - result[b]))
+
+    assert max(gap(0, 1), gap(3, 4)) < min(gap(0, 3), gap(2, 5))
+    # Fixed points (zero temperature) never move
+    fixed = force_layout(positions, np.ones(6), edges, np.ones(4), 100.0, temperature=np.zeros(6))
+    assert np.array_equal(fixed, positions)
+
+
+def test_remove_overlaps():
+    """Overlapping boxes are pushed apart; the sweep finds every overlapping pair"""
+    centers = np.array([(0.0, 0.0), (10.0, 0.0), (10.0, 5.0), (500.0, 0.0)])
+    sizes = np.full((4, 2), 100.0)
+    a, b = overlapping_pairs(centers, sizes / 2)
+    assert sorted(zip(a.tolist(), b.tolist())) == [(0, 1), (0, 2), (1, 2)]
+
+    result = remove_overlaps(centers, sizes, gap=10.0)
+    assert len(overlapping_pairs(result, sizes / 2 + 5.0)[0]) == 0
+
+
+def test_tree_layout_places_children_below_parent():
+    """Children sit one layer down, wrapped into rows, with the parent centered above them"""
+    children = {"file": ["cls", "f"], "cls": [f"m{i}" for i in range(12)]}
+    positions, width, height = tree_layout("file", children)
+
+    assert set(positions) == {"file", "cls", "f", *children["cls"]}
+    assert positions["file"][1] == 0
+    assert positions["cls"][1] == positions["f"][1] == NODE_HEIGHT + LAYER_GAP
+    assert all(positions[m][1] > positions["cls"][1] for m in children["cls"])
+    # Twelve methods do not fit in one row
+    assert len({positions[m][1] for m in children["cls"]}) > 1
+    assert positions["file"][0] + NODE_WIDTH / 2 == width / 2
+    assert all(0 <= x <= width - NODE_WIDTH and 0 <= y <= height - NODE_HEIGHT for x, y in positions.values())
+
+
+def test_compute_layout_separates_files_and_is_incremental():
+    """Files become non-overlapping blocks; a relayout keeps placed blocks and adds new ones nearby"""
+    nodes, edges = [], []
+    for f in range(20):
+        nodes.append(f"file{f}")
+        for g in range(3):
+            nodes.append(f"func{f}_{g}")
+            edges.append(("CONTAINS_FUNCTION", f"file{f}", f"func{f}_{g}"))
+        edges.append(("CALLS", f"func{f}_0", f"func{(f + 1) % 20}_1"))
+
+    positions = compute_layout(nodes, edges)
+    assert set(positions) == set(nodes)
+    boxes = [block_boxes(positions, [f"file{f}"] + [f"func{f}_{g}" for g in range(3)]) for f in range(20)]
+    for i, a in enumerate(boxes):
+        for b in boxes[i + 1:]:
+            assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1]
+
+    assert compute_layout(nodes, edges) == positions  # deterministic
+
+    nodes += ["new", "new_f"]
+    edges += [("CONTAINS_FUNCTION", "new", "new_f"), ("CALLS", "new_f", "func0_0")]
+    updated = compute_layout(nodes, edges, positions)
+    moved = [np.hypot(updated[n][0] - positions[n][0], updated[n][1] - positions[n][1]) for n in positions]
+    assert np.median(moved) == 0
+    assert compute_layout([], []) == {}
@@ -0,0 +1,105 @@
+"""
+Tests for ParseCache
+"""
+import os
+import pytest
+from pathlib import Path
+import tempfile
+import shutil
+
+from parse_cache import CacheStats, ParseCache
+from parser import TreeSitterParser, PARSER_VERSION
+
+
+SOURCE = b'''class Greeter:
+    def greet(self):
+        """Say hello"""
+        return fmt()
+
+def fmt():
+    pass
+'''
+
+
+@pytest.fixture
+def cache_dir():
+    """Create temporary cache directory"""
+    temp_dir = tempfile.mkdtemp()
+    yield Path(temp_dir)
+    shutil.rmtree(temp_dir)
+
+
+def dump(result):
+    """Convert a parse result to plain data for comparison"""
+    return [[model.model_dump() for model in models] for models in result]
+
+
+def test_cached_result_matches_parse(cache_dir):
+    """A cache hit returns exactly what parsing would, re-keyed for the new path"""
+    parser = TreeSitterParser(cache=ParseCache(str(cache_dir)))
+    stats = CacheStats()
+
+    parser.parse_source(SOURCE, Path("repo_a/greeter.py"), stats)
+    cached = parser.parse_source(SOURCE, Path("fork_b/greeter.py"), stats)
+
+    assert stats.misses == 1
+    assert stats.hits == 1
+    assert dump(cached) == dump(TreeSitterParser().parse_source(SOURCE, Path("fork_b/greeter.py")))
+
+
+def test_key_depends_on_language_and_version(cache_dir):
+    """Keys change with content, language and parser version"""
+    cache = ParseCache(str(cache_dir))
+    key = cache.key(SOURCE, 'python', PARSER_VERSION)
+
+    assert key == cache.key(SOURCE, 'python', PARSER_VERSION)
+    assert key != cache.key(SOURCE + b"\n", 'python', PARSER_VERSION)
+    assert key != cache.key(SOURCE, 'javascript', PARSER_VERSION)
+    assert key != cache.key(SOURCE, 'python', PARSER_VERSION + "-next")
+
+
+def test_corrupt_entry_is_a_miss(cache_dir):
+    """Unreadable entries are discarded instead of failing the parse"""
+    parser = TreeSitterParser(cache=ParseCache(str(cache_dir)))
+    stats = CacheStats()
+    parser.parse_source(SOURCE, Path("greeter.py"), stats)
+    for entry in cache_dir.glob('*/*.bin'):
+        entry.write_bytes(b"not a cache entry")
+
+    files, classes, functions, edges = parser.parse_source(SOURCE, Path("greeter.py"), stats)
+
+    assert len(functions) == 2
+    assert stats.hits == 0
+    assert stats.misses == 2
+
+
+def test_eviction_keeps_recently_used(cache_dir):
+    """Entries beyond the size budget are evicted least recently used first"""
+    cache = ParseCache(str(cache_dir))
+    parser = TreeSitterParser(cache=cache)
+    sources = [SOURCE.replace(b"fmt", f"fmt{i}".encode()) for i in range(4)]
+    for i, source in enumerate(sources):
+        parser.parse_source(source, Path(f"m{i}.py"))
+        entry = cache._entry_path(cache.key(source, 'python', PARSER_VERSION))
+        os.utime(entry, (1000 + i, 1000 + i))
+
+    entry_size = cache.size() // 4
+    cache.evict(target_bytes=entry_size * 2)
+    stats = CacheStats()
+    parser.parse_source(sources[3], Path("m3.py"), stats)
+
+    assert len(list(cache_dir.glob('*/*.bin'))) <= 2
+    assert stats.hits == 1
+
+
+def test_stats_are_counted_per_caller(cache_dir):
+    """Two jobs sharing one cache each see only their own hits and misses"""
+    parser = TreeSitterParser(cache=ParseCache(str(cache_dir)))
+    first, second = CacheStats(), CacheStats()
+
+    parser.parse_source(SOURCE, Path("repo_a/greeter.py"), first)
+    parser.parse_source(SOURCE, Path("repo_b/greeter.py"), second)
+    parser.parse_source(SOURCE, Path("repo_b/other.py"), second)
+
+    assert (first.hits, first.misses) == (0, 1)
+    assert (second.hits, second.misses) == (2, 0)
@@ -197,7 +197,62 @@ def main():
         assert isinstance(functions, list)
         assert isinstance(edges, list)
 
-    
+    def test_extract_all_uses_innermost_scope(self, parser):
+        """Test that edge extraction picks innermost classes and callers."""
+        source = b"""class Outer:
+    class Inner:
+        def method(self):
+            def local():
+                helper()
+            return local
+
+def helper():
+    pass
+"""
+        tree = parser.python_parser.parse(source)
+        classes, functions, edges = parser.extract_all(tree, Path("scopes.py"), 'python')
+
+        by_name = {f.name: f.id for f in functions}
+        inner_id = next(c.id for c in classes if c.name == "Inner")
+        defines = {(e.source, e.target) for e in edges if e.edge_type == "DEFINES"}
+        calls = {(e.source, e.target) for e in edges if e.edge_type == "CALLS"}
+
+        assert defines == {(inner_id, by_name["method"]), (inner_id, by_name["local"])}
+        assert calls == {(by_name["local"], by_name["helper"])}
+
+    def test_calls_attributed_to_innermost_function(self, parser, temp_dir):
+        """Test that single-pass extraction uses the innermost enclosing scope."""
+        code = '''import functools
+
+def helper():
+    pass
+
+@functools.cache
+def outer():
+    def inner():
+        helper()
+    return inner
+
+class Outer:
+    class Inner:
+        def method(self):
+            pass
+'''
+        test_file = temp_dir / "scopes.py"
+        test_file.write_text(code)
+
+        files, classes, functions, edges = parser.parse_file(test_file)
+        by_name = {f.name: f.id for f in functions}
+        class_ids = {c.name: c.id for c in classes}
+        calls = {(e.source, e.target) for e in edges if e.edge_type == "CALLS"}
+        contains = {e.target for e in edges if e.edge_type == "CONTAINS_FUNCTION"}
+        defines = {(e.source, e.target) for e in edges if e.edge_type == "DEFINES"}
+
+        assert calls == {(by_name["inner"], by_name["helper"])}
+        assert contains == {by_name["helper"], by_name["outer"]}
+        assert defines == {(class_ids["Inner"], by_name["method"])}
+
+
     # ========== Property-Based Tests ==========
     
     @settings(max_examples=100)
@@ -0,0 +1,59 @@
+"""
+Tests for ProgressReporter
+"""
+import time
+
+from progress import ProgressReporter
+
+
+def test_callbacks_are_rate_limited_except_stage_changes():
+    """Counter updates are throttled; stage changes always report"""
+    events = []
+    reporter = ProgressReporter(events.append, min_interval=60)
+
+    reporter.stage("parsing")
+    for _ in range(100):
+        reporter.add(files_parsed=1)
+    reporter.stage("writing")
+
+    assert [event.stage for event in events] == ["parsing", "writing"]
+    assert events[-1].files_parsed == 100
+
+
+def test_rate_and_eta():
+    """Throughput and ETA are derived once the total is known"""
+    reporter = ProgressReporter()
+    reporter.stage("parsing")
+    reporter.discovered(10, finished=True)
+    time.sleep(0.05)
+    reporter.add(files_parsed=5, nodes=7, edges=3, batches=1)
+
+    progress = reporter.snapshot()
+    assert progress.files_total == 10
+    assert progress.files_per_second > 0
+    assert 0 < progress.eta_seconds <= 5 / progress.files_per_second + 0.1
+    assert (progress.nodes_written, progress.edges_written, progress.batch) == (7, 3, 1)
+
+
+def test_eta_of_slow_job():
+    """A rate that rounds to zero still yields an ETA instead of dividing by zero"""
+    events = []
+    reporter = ProgressReporter(events.append, min_interval=0)
+    reporter.discovered(10, finished=True)
+    reporter.add(files_parsed=1)
+    reporter._parse_started = time.monotonic() - 1000
+
+    reporter.emit(force=True)
+    progress = events[-1]
+    assert progress.files_per_second == 0.0
+    assert 8000 < progress.eta_seconds < 10000
+
+def test_failing_callback_does_not_break_ingestion():
+    """Exceptions from the callback are reported and swallowed"""
+    def fail(progress):
+        raise ValueError("listener gone")
+
+    reporter = ProgressReporter(fail)
+    reporter.stage("parsing")
+    reporter.add(files_parsed=1)
+    assert reporter.snapshot().files_parsed == 1
@@ -7,7 +7,7 @@ import tempfile
 import shutil
 
 from database import KuzuDB, FileNode, ClassNode, FunctionNode
-from rag_service import RAGService, QueryResponse
+from rag_service import RAGService, QueryResponse, scope_to_repository
 
 
 @pytest.fixture
@@ -210,6 +210,46 @@ class TestRAGService:
         assert isinstance(result.node_ids, list)
         assert len(result.response) > 0
     
+    def test_whole_nodes_are_formatted(self, populated_db):
+        """Test that the fallback query returns code nodes, printed by their properties"""
+        populated_db.upsert_repository("r1", "https://example.com/r1", "r1", "abc")
+        populated_db.save_positions("", {"test_file.py": (1.0, 2.0)})
+        rag = RAGService(populated_db, mock_mode=True)
+        
+        cypher = rag.generate_cypher("Tell me something")
+        success, results, _ = rag.execute_cypher(cypher)
+        assert success
+        node_ids = rag.extract_node_ids(results)
+        assert "test_file.py:Calculator" in node_ids
+        assert "r1" not in node_ids
+        
+        text = rag._format_results_detailed(results)
+        assert "name: Calculator" in text
+        assert "_label" not in text and "tableID" not in text and "None" not in text
+    
+    def test_scope_to_repository(self):
+        """Test that every matched node pattern is restricted to the repository"""
+        assert scope_to_repository("MATCH (c:Class)-[:DEFINES]->(fn:Function) WHERE c.name = 'A' RETURN count(fn)") == (
+            "MATCH (c:Class {repo_id: $repo_id})-[:DEFINES]->(fn:Function {repo_id: $repo_id}) "
+            "WHERE c.name = 'A' RETURN count(fn)"
+        )
+        assert scope_to_repository("MATCH (n) RETURN n LIMIT 20") == "MATCH (n {repo_id: $repo_id}) RETURN n LIMIT 20"
+        assert scope_to_repository("MATCH (n:File:Class) RETURN n") == "MATCH (n:File:Class {repo_id: $repo_id}) RETURN n"
+        assert scope_to_repository("MATCH (f:File {path: 'a.py'}) RETURN f") == (
+            "MATCH (f:File {repo_id: $repo_id, path: 'a.py'}) RETURN f"
+        )
+    
+    def test_process_query_scoped_to_repository(self, populated_db):
+        """Test that a repository-scoped query ignores other repositories"""
+        rag = RAGService(populated_db, mock_mode=True)
+        
+        result = rag.process_query("What classes are in the codebase?", repo_id="")
+        assert "$repo_id" in result.cypher_query
+        assert result.node_ids == ["test_file.py"]
+        
+        result = rag.process_query("What classes are in the codebase?", repo_id="other-repo")
+        assert result.node_ids == []
+    
     def test_process_query_with_retry(self, db):
         """Test query processing with retry on failure"""
         rag = RAGService(db, mock_mode=True)
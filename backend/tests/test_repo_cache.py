@@ -0,0 +1,178 @@
+"""
+Tests for GitMirrorCache
+"""
+import pytest
+import subprocess
+from pathlib import Path
+import tempfile
+import shutil
+
+from repo_cache import GitMirrorCache, checkout_dir_name, normalize_repo_url, repo_name_from_url
+
+
+def git(repo: Path, *args: str) -> str:
+    """Run git in a test repository"""
+    result = subprocess.run(
+        ['git', '-C', str(repo), '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+        check=True, capture_output=True, text=True
+    )
+    return result.stdout.strip()
+
+
+def commit_file(repo: Path, name: str, content: str) -> str:
+    """Write a file, commit it and return the new commit SHA"""
+    (repo / name).write_text(content)
+    git(repo, 'add', '-A')
+    git(repo, 'commit', '-q', '-m', f"update {name}")
+    return git(repo, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory"""
+    temp_dir = tempfile.mkdtemp()
+    yield Path(temp_dir)
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def remote(temp_dir):
+    """Local repository used as the remote"""
+    repo = temp_dir / "remote" / "project"
+    repo.mkdir(parents=True)
+    git(repo, 'init', '-q')
+    commit_file(repo, "main.py", "def main():\n    pass\n")
+    return repo
+
+
+def test_fetch_updates_existing_mirror_and_worktree(temp_dir, remote):
+    """Repeat updates fetch into the mirror and move the worktree in place"""
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    url = f"file://{remote}"
+    dest = temp_dir / "checkouts" / checkout_dir_name(url)
+
+    mirror = cache.update(url)
+    first = cache.checkout(url, dest)
+    assert (dest / "main.py").exists()
+
+    second = commit_file(remote, "util.py", "def util():\n    pass\n")
+    assert cache.update(url) == mirror
+    assert cache.checkout(url, dest) == second
+    assert (dest / "util.py").exists()
+
+    # The previous commit stays available for diffing
+    assert git(dest, 'rev-parse', f"{first}^{{commit}}") == first
+
+
+def test_same_name_repositories_do_not_collide(temp_dir, remote):
+    """Mirrors and checkouts are keyed by the full URL, not the repository name"""
+    other = temp_dir / "other" / "project"
+    other.mkdir(parents=True)
+    git(other, 'init', '-q')
+    commit_file(other, "other.py", "x = 1\n")
+
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    url_a, url_b = f"file://{remote}", f"file://{other}"
+
+    assert repo_name_from_url(url_a) == repo_name_from_url(url_b) == "project"
+    assert checkout_dir_name(url_a) != checkout_dir_name(url_b)
+    assert cache.update(url_a) != cache.update(url_b)
+
+
+
+def test_normalize_repo_url():
+    """Equivalent spellings of a hosted URL normalize alike; local paths keep their name"""
+    for url in ("https://github.com/user/repo", " https://GitHub.com/user/repo/", "https://github.com/user/repo.git/"):
+        assert normalize_repo_url(url) == "https://github.com/user/repo"
+    assert normalize_repo_url("file:///srv/repo.git/") == "file:///srv/repo.git"
+    assert normalize_repo_url("/srv/project.git") == "/srv/project.git"
+
+def test_eviction_removes_cold_mirrors(temp_dir, remote):
+    """Over quota, the least recently used mirror and its worktree are removed"""
+    other = temp_dir / "other" / "project2"
+    other.mkdir(parents=True)
+    git(other, 'init', '-q')
+    commit_file(other, "other.py", "x = 1\n")
+
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    cold_url, hot_url = f"file://{remote}", f"file://{other}"
+    cold = cache.update(cold_url)
+    cold_checkout = temp_dir / "checkouts" / "cold"
+    cache.checkout(cold_url, cold_checkout)
+
+    cache.max_bytes = cache.size() // 2 + 1
+    hot = cache.update(hot_url)
+
+    assert hot.exists()
+    assert not cold.exists()
+    assert not cold_checkout.exists()
+
+
+def test_failed_clone_raises(temp_dir):
+    """Git errors surface as RuntimeError and leave no mirror behind"""
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    url = f"file://{temp_dir / 'missing'}"
+
+    with pytest.raises(RuntimeError):
+        cache.update(url)
+    assert not list((temp_dir / "mirrors").iterdir())
+
+
+def test_blobless_sparse_checkout_only_materializes_matching_files(temp_dir, remote):
+    """A blobless mirror with sparse patterns checks out (and fetches) only matching files"""
+    git(remote, 'config', 'uploadpack.allowfilter', 'true')
+    (remote / "pkg").mkdir()
+    (remote / "pkg" / "core.py").write_text("def core():\n    pass\n")
+    (remote / "docs").mkdir()
+    (remote / "docs" / "guide.md").write_text("# Guide\n")
+    commit_file(remote, "README.md", "# Project\n")
+
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    url = f"file://{remote}"
+    dest = temp_dir / "checkouts" / checkout_dir_name(url)
+
+    mirror = cache.update(url, mode='blobless')
+    assert mirror == cache.mirror_path(url, 'blobless')
+    cache.checkout(url, dest, mode='blobless', sparse_patterns=['/pkg/**/*.py'])
+
+    assert (dest / "pkg" / "core.py").exists()
+    assert not (dest / "main.py").exists()
+    assert not (dest / "docs").exists()
+    assert not (dest / "README.md").exists()
+
+    # Blobs outside the sparse patterns were never fetched
+    readme_blob = git(remote, 'rev-parse', 'HEAD:README.md')
+    missing = git(mirror, 'rev-list', '--objects', '--missing=print', 'HEAD').splitlines()
+    assert f"?{readme_blob}" in missing
+
+    # Dropping the patterns restores a full working tree
+    cache.checkout(url, dest, mode='blobless')
+    assert (dest / "README.md").exists()
+
+
+def test_unknown_mode_rejected(temp_dir, remote):
+    """Only the modes in MIRROR_MODES are accepted"""
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    with pytest.raises(ValueError):
+        cache.update(f"file://{remote}", mode='bogus')
+
+
+def test_eviction_skips_mirrors_in_use(temp_dir, remote):
+    """A mirror held by another job survives eviction even over quota"""
+    other = temp_dir / "other" / "project2"
+    other.mkdir(parents=True)
+    git(other, 'init', '-q')
+    commit_file(other, "other.py", "x = 1\n")
+
+    cache = GitMirrorCache(str(temp_dir / "mirrors"))
+    busy_url, hot_url = f"file://{remote}", f"file://{other}"
+    with cache.in_use(busy_url) as busy:
+        assert cache.update(busy_url) == busy
+        cache.max_bytes = cache.size() // 2 + 1
+        hot = cache.update(hot_url)
+        assert busy.exists() and hot.exists()
+
+    # Released, the cold mirror is evicted again
+    cache.evict(keep=hot)
+    assert not busy.exists()
+    assert hot.exists()
@@ -1,6 +1,6 @@
 'use client';
 
-import React, { useCallback, useEffect } from 'react';
+import React, { useCallback, useEffect, useRef } from 'react';
 import ReactFlow, {
   Node,
   Edge,
@@ -11,9 +11,10 @@ import ReactFlow, {
   ConnectionMode,
   Panel,
   BackgroundVariant,
+  Viewport as FlowViewport,
 } from 'reactflow';
 import 'reactflow/dist/style.css';
-import { GraphNode, GraphEdge } from '@/types';
+import { GraphNode, GraphEdge, Viewport } from '@/types';
 import { FileNode, ClassNode, FunctionNode } from './CustomNodes';
 
 interface GraphCanvasProps {
@@ -22,8 +23,12 @@ interface GraphCanvasProps {
   highlightedNodes?: Set<string>;
   onNodeClick?: (nodeId: string) => void;
   onNodeHover?: (nodeId: string | null) => void;
+  onViewportChange?: (viewport: Viewport) => void;
 }
 
+// Extra canvas fetched around the visible area, as a fraction of its size
+const VIEWPORT_MARGIN = 0.5;
+
 const nodeTypes = {
   file: FileNode,
   class: ClassNode,
@@ -36,9 +41,11 @@ export default function GraphCanvas({
   highlightedNodes = new Set(),
   onNodeClick,
   onNodeHover,
+  onViewportChange,
 }: GraphCanvasProps) {
   const [nodes, setNodes, onNodesChange] = useNodesState([]);
   const [edges, setEdges, onEdgesChange] = useEdgesState([]);
+  const containerRef = useRef<HTMLDivElement>(null);
 
   // Convert graph data to ReactFlow format
   useEffect(() => {
@@ -102,8 +109,28 @@ export default function GraphCanvas({
     onNodeHover?.(null);
   }, [onNodeHover]);
 
+  // Report the visible canvas rectangle (plus a margin) once panning or zooming stops
+  const handleMoveEnd = useCallback(
+    (_event: MouseEvent | TouchEvent | null, viewport: FlowViewport) => {
+      const container = containerRef.current;
+      if (!onViewportChange || !container) return;
+
+      const width = container.clientWidth / viewport.zoom;
+      const height = container.clientHeight / viewport.zoom;
+      const x0 = -viewport.x / viewport.zoom;
+      const y0 = -viewport.y / viewport.zoom;
+      onViewportChange({
+        x0: x0 - width * VIEWPORT_MARGIN,
+        y0: y0 - height * VIEWPORT_MARGIN,
+        x1: x0 + width * (1 + VIEWPORT_MARGIN),
+        y1: y0 + height * (1 + VIEWPORT_MARGIN),
+      });
+    },
+    [onViewportChange]
+  );
+
   return (
-    <div className="w-full h-full">
+    <div ref={containerRef} className="w-full h-full">
       <ReactFlow
         nodes={nodes}
         edges={edges}
@@ -112,6 +139,7 @@ export default function GraphCanvas({
         onNodeClick={handleNodeClick}
         onNodeMouseEnter={handleNodeMouseEnter}
         onNodeMouseLeave={handleNodeMouseLeave}
+        onMoveEnd={handleMoveEnd}
         nodeTypes={nodeTypes}
         connectionMode={ConnectionMode.Loose}
         fitView
@@ -1,12 +1,15 @@
 'use client';
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import GraphCanvas from './components/GraphCanvas';
 import ChatSidebar from './components/ChatSidebar';
 import CodeInspector from './components/CodeInspector';
 import IngestionPanel from './components/IngestionPanel';
 import { getGraph } from '@/lib/api';
-import { GraphNode, GraphEdge } from '@/types';
+import { GraphNode, GraphEdge, Viewport } from '@/types';
+
+// Nodes requested per /graph page
+const GRAPH_PAGE_SIZE = 500;
 
 export default function Home() {
   const [nodes, setNodes] = useState<GraphNode[]>([]);
@@ -16,13 +19,15 @@ export default function Home() {
   const [showIngestion, setShowIngestion] = useState(true);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const viewportRequest = useRef(0);
 
   const loadGraph = async () => {
     setLoading(true);
     setError(null);
 
     try {
-      const graphData = await getGraph();
+      // Start with the first page; panning and zooming then load what is visible
+      const graphData = await getGraph({ limit: GRAPH_PAGE_SIZE });
       setNodes(graphData.nodes);
       setEdges(graphData.edges);
       
@@ -40,6 +45,20 @@ export default function Home() {
     loadGraph();
   }, []);
 
+  const loadViewport = async (viewport: Viewport) => {
+    const request = ++viewportRequest.current;
+
+    try {
+      const graphData = await getGraph({ viewport, limit: GRAPH_PAGE_SIZE });
+      // Drop responses overtaken by a later pan or zoom
+      if (request !== viewportRequest.current) return;
+      setNodes(graphData.nodes);
+      setEdges(graphData.edges);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load graph');
+    }
+  };
+
   const handleNodeHighlight = (nodeIds: string[]) => {
     setHighlightedNodes(new Set(nodeIds));
   };
@@ -167,6 +186,7 @@ export default function Home() {
               highlightedNodes={highlightedNodes}
               onNodeClick={handleNodeClick}
               onNodeHover={(nodeId) => handleNodeHighlight(nodeId ? [nodeId] : [])}
+              onViewportChange={loadViewport}
             />
           )}
         </div>
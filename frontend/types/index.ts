@@ -4,7 +4,10 @@
 
 // ========== Graph Types ==========
 
-export type NodeType = 'file' | 'class' | 'function';
+export type NodeType = 'file' | 'class' | 'function' | 'directory';
+
+// Level of detail of GET /graph; coarser levels return precomputed aggregates
+export type GraphLevel = 'dir' | 'file' | 'class' | 'function';
 export type EdgeType = 'CONTAINS' | 'DEFINES' | 'CALLS';
 
 export interface GraphNode {
@@ -33,6 +36,7 @@ export interface GraphEdge {
   source: string;
   target: string;
   type: EdgeType;
+  count?: number; // relationships an aggregated edge stands for
 }
 
 export interface GraphData {
@@ -40,6 +44,29 @@ export interface GraphData {
   edges: GraphEdge[];
 }
 
+export interface GraphPage extends GraphData {
+  nextCursor?: string | null;
+}
+
+// Rectangle of the canvas, in flow coordinates
+export interface Viewport {
+  x0: number;
+  y0: number;
+  x1: number;
+  y1: number;
+}
+
+// Query parameters of GET /graph; without any of them the whole graph is returned
+export interface GraphQuery {
+  repoId?: string;
+  labels?: NodeType[];
+  pathPrefix?: string;
+  viewport?: Viewport;
+  cursor?: string;
+  limit?: number;
+  level?: GraphLevel;
+}
+
 // ========== Chat Types ==========
 
 export interface Message {
@@ -58,13 +85,52 @@ export interface ChatState {
 
 // ========== Ingestion Types ==========
 
+export type CloneStrategy = 'full' | 'shallow' | 'blobless' | 'sparse';
+
+export interface IngestRequest {
+  repoUrl: string;
+  cloneStrategy?: CloneStrategy;
+  sparsePaths?: string[];
+}
+
 export interface IngestionJob {
-  status: 'success' | 'error' | 'in_progress';
+  status: 'queued' | 'in_progress' | 'success' | 'error';
   message: string;
   jobId?: string;
+  repoUrl?: string;
   filesProcessed: number;
   nodesCreated: number;
   edgesCreated: number;
+  cacheHits?: number;
+  cacheMisses?: number;
+  createdAt?: number;
+  startedAt?: number;
+  finishedAt?: number;
+  progress?: IngestionProgress;
+}
+
+export interface IngestionProgress {
+  stage: 'queued' | 'cloning' | 'parsing' | 'writing' | 'layout' | 'aggregating' | 'done';
+  filesDiscovered: number;
+  filesTotal?: number;
+  filesParsed: number;
+  filesPerSecond: number;
+  nodesWritten: number;
+  edgesWritten: number;
+  batch: number;
+  elapsedSeconds: number;
+  etaSeconds?: number;
+}
+
+export interface Repository {
+  id: string;
+  url: string;
+  name: string;
+  lastCommit: string;
+  scope: string;
+  files: number;
+  classes: number;
+  functions: number;
 }
 
 // ========== UI State Types ==========